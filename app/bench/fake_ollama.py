@@ -0,0 +1,170 @@
+"""
+Offline stand-in for an Ollama server, used by the benchmark harness.
+
+Serves `/api/generate` (streaming and non-streaming), `/api/embeddings` and
+`/api/tags` with a configurable model load time, time to first token and token
+rate, so LLM-bound code can be measured without a GPU:
+
+    python -m bench.fake_ollama --port 11500 --ttft-ms 150 --tokens-per-second 40
+"""
+import argparse
+import hashlib
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+# Words the fake model cycles through when "generating"
+VOCABULARY = (
+    "a glowing dragon stands on a cliff at sunset with wings spread wide "
+    "under a violet sky lit by lightning in cinematic detail"
+).split()
+
+# Dimension of the fake embeddings
+EMBEDDING_DIM = 768
+
+
+class FakeOllama:
+    """
+    FakeOllama answers Ollama API calls with synthetic text at a fixed pace.
+
+    Attributes:
+        ttft (float): Seconds before the first token of a generation.
+        tokens_per_second (float): Pace of the generated tokens.
+        load_time (float): Seconds added to the first request of each model.
+        tokens (int): Tokens generated when the request sets no `num_predict`.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, ttft: float = 0.1, tokens_per_second: float = 50.0, load_time: float = 0.0, tokens: int = 64):
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.load_time = load_time
+        self.tokens = tokens
+        self._loaded = set()
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    # ----------------------------------------------------------------------
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+        """Starts serving in a background thread and returns the server."""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    fake._reply(self, {"models": [{"name": model} for model in sorted(fake._loaded)]})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path == "/api/generate":
+                    fake._generate(self, body)
+                elif self.path == "/api/embeddings":
+                    fake._reply(self, {"embedding": fake._embedding(body.get("prompt", ""))})
+                else:
+                    self.send_error(404)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="fake-ollama", daemon=True).start()
+        logging.info(f"Fake Ollama listening on http://{host}:{server.server_port}")
+        return server
+
+    # ----------------------------------------------------------------------
+    def _generate(self, handler: BaseHTTPRequestHandler, body: Dict):
+        with self._lock:
+            self.requests += 1
+            cold = body.get("model") not in self._loaded
+            self._loaded.add(body.get("model"))
+        start = time.time()
+        delay = self.ttft + (self.load_time if cold else 0.0)
+        count = int((body.get("options") or {}).get("num_predict") or self.tokens)
+        if not body.get("prompt"):
+            # An empty prompt only loads the model
+            time.sleep(delay)
+            self._reply(handler, self._final(body, [], start, 0))
+            return
+
+        words = [VOCABULARY[i % len(VOCABULARY)] + " " for i in range(min(count, self.tokens))]
+        if not body.get("stream", True):
+            time.sleep(delay + len(words) / self.tokens_per_second)
+            self._reply(handler, {**self._final(body, words, start, len(words)), "response": "".join(words)})
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/x-ndjson")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+        time.sleep(delay)
+        for word in words:
+            self._chunk(handler, {"model": body.get("model"), "response": word, "done": False})
+            time.sleep(1.0 / self.tokens_per_second)
+        self._chunk(handler, self._final(body, [], start, len(words)))
+        handler.wfile.write(b"0\r\n\r\n")
+
+    def _final(self, body: Dict, words, start: float, count: int) -> Dict:
+        elapsed = time.time() - start
+        return {
+            "model": body.get("model"),
+            "response": "".join(words),
+            "done": True,
+            "total_duration": int(elapsed * 1e9),
+            "prompt_eval_count": len(str(body.get("prompt", "")).split()),
+            "eval_count": count,
+            "eval_duration": int(count / self.tokens_per_second * 1e9),
+            "context": [1, 2, 3],
+        }
+
+    @staticmethod
+    def _chunk(handler: BaseHTTPRequestHandler, data: Dict):
+        line = json.dumps(data).encode("utf-8") + b"\n"
+        handler.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+        handler.wfile.flush()
+
+    @staticmethod
+    def _reply(handler: BaseHTTPRequestHandler, data: Dict):
+        payload = json.dumps(data).encode("utf-8")
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    @staticmethod
+    def _embedding(text: str) -> Optional[list]:
+        if not text:
+            return []
+        seed = hashlib.sha256(text.encode("utf-8")).digest()
+        return [(seed[i % len(seed)] - 128) / 128.0 for i in range(EMBEDDING_DIM)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stand-in for an Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--ttft-ms", type=float, default=100.0, help="Time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--load-ms", type=float, default=0.0, help="Extra latency of the first call per model")
+    parser.add_argument("--tokens", type=int, default=64, help="Tokens generated per request")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    fake = FakeOllama(args.ttft_ms / 1000, args.tokens_per_second, args.load_ms / 1000, args.tokens)
+    server = fake.serve(args.host, args.port)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Offline stand-in for an Openfabric app, used by the benchmark harness.
+
+Serves `/manifest`, `/schema?type=input|output` and `/resource?reid=...` over
+HTTP, and the socket.io `/app` namespace the SDK proxy talks to: every `execute`
+is acknowledged with a `progress` event and, after the configured latency,
+answered with a `response` whose output references a generated resource.
+
+Runs on the same gevent stack as the SDK server, in its own process:
+
+    python -m bench.fake_openfabric --port 9101 --latency-ms 500 --resource-kb 256
+
+The app is then reachable by `Stub` under the app ID `http://127.0.0.1:9101`.
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import hashlib
+import json
+import logging
+import time
+import uuid
+import zlib
+from urllib.parse import parse_qs
+
+import gevent
+import socketio
+from gevent import pywsgi
+from geventwebsocket.handler import WebSocketHandler
+
+INPUT_SCHEMA = {
+    "type": "object",
+    "properties": {"prompt": {"type": "string"}},
+}
+
+OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {"result": {"type": "string", "format": "binary"}},
+}
+
+
+class FakeApp:
+    """
+    FakeApp emulates the execution protocol of a remote Openfabric app.
+
+    Attributes:
+        latency (float): Seconds between an `execute` and its `response`.
+        resource_size (int): Size in bytes of every generated resource.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, name: str, latency: float = 0.5, resource_size: int = 256 * 1024):
+        self.name = name
+        self.latency = latency
+        self.resource_size = resource_size
+        self.sio = socketio.Server(async_mode="gevent", cors_allowed_origins="*")
+        self.sio.on("execute", self._execute, namespace="/app")
+        self.sio.on("restore", self._restore, namespace="/app")
+        self.sio.on("delete", lambda sid, qid: None, namespace="/app")
+        self._responses = {}
+
+    # ----------------------------------------------------------------------
+    def wsgi(self):
+        """Returns the WSGI application serving both HTTP and socket.io."""
+        return socketio.WSGIApp(self.sio, self._http)
+
+    def _http(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        query = parse_qs(environ.get("QUERY_STRING", ""))
+        if path == "/manifest":
+            body = json.dumps({"name": self.name, "version": "1.0.0", "sdk": "0.3.0"}).encode()
+            content_type = "application/json"
+        elif path == "/schema":
+            schema = INPUT_SCHEMA if query.get("type", ["input"])[0] == "input" else OUTPUT_SCHEMA
+            body = json.dumps(schema).encode()
+            content_type = "application/json"
+        elif path == "/resource":
+            body = self._resource(query.get("reid", [""])[0])
+            content_type = "application/octet-stream"
+        else:
+            start_response("404 Not Found", [("Content-Length", "0")])
+            return [b""]
+        start_response("200 OK", [("Content-Type", content_type), ("Content-Length", str(len(body)))])
+        return [body]
+
+    # ----------------------------------------------------------------------
+    def _execute(self, sid, data, access=True):
+        request = json.loads(zlib.decompress(data))
+        header = request.get("header", {})
+        ray = {"rid": header.get("rid"), "uid": header.get("uid"), "qid": uuid.uuid4().hex, "status": "RUNNING"}
+        self.sio.emit("progress", ray, to=sid, namespace="/app")
+        gevent.spawn(self._respond, sid, ray, request.get("body"))
+
+    def _respond(self, sid, ray, body):
+        gevent.sleep(self.latency)
+        reid = hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()
+        response = {"output": {"result": reid}, "ray": {**ray, "status": "COMPLETED", "finished": time.time()}}
+        self._responses[ray["qid"]] = response
+        self.sio.emit("response", response, to=sid, namespace="/app")
+
+    def _restore(self, sid, qid):
+        response = self._responses.get(qid)
+        if response is not None:
+            self.sio.emit("restore", response, to=sid, namespace="/app")
+
+    def _resource(self, reid: str) -> bytes:
+        seed = hashlib.sha256(reid.encode()).digest()
+        return (seed * (self.resource_size // len(seed) + 1))[:self.resource_size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stand-in for an Openfabric app")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9101)
+    parser.add_argument("--name", default="fake-app")
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="Execution time of every request")
+    parser.add_argument("--resource-kb", type=int, default=256, help="Size of every generated resource")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    app = FakeApp(args.name, args.latency_ms / 1000, args.resource_kb * 1024)
+    logging.info(f"Fake Openfabric app {args.name} listening on http://{args.host}:{args.port}")
+    pywsgi.WSGIServer((args.host, args.port), app.wsgi(), handler_class=WebSocketHandler, log=None).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
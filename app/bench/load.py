@@ -0,0 +1,299 @@
+"""
+Load-testing benchmark for the `execute` pipeline.
+
+Starts a fake Ollama server and two fake Openfabric apps (text-to-image and
+image-to-3D) in subprocesses, configures the app against them, then drives
+`Engine.prepare` at a fixed rate in-process through the same store, task queue
+and worker pool that `ignite.py` installs. Rays are executed the way the app
+executes them by default (ENGINE_EXECUTION=inprocess): `main.execute` runs on
+the pool threads. Dispatch through the SDK App and its worker subprocess
+(ENGINE_EXECUTION=sdk) is not measured; the report says so in `execution`.
+Reports p50/p95/p99 latency, queue wait vs execution time, throughput and
+memory as JSON:
+
+    cd app
+    python -m bench.load --qps 10 --duration 30 --out bench/results/main.json
+    python -m bench.load --qps 10 --duration 30 --baseline bench/results/main.json
+
+With `--baseline`, the run is compared against an earlier result and the process
+exits with status 1 when p95 latency or throughput regress beyond `--tolerance`.
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Format version of the result files; bumped when fields change meaning
+RESULT_VERSION = 1
+
+# Seconds to wait for a stand-in server to accept connections
+STARTUP_TIMEOUT = 15.0
+
+# Seconds between checks for finished rays
+COMPLETION_POLL = 0.005
+
+
+class Completions:
+    """
+    Completions watches the rays of a run and records when each one finishes,
+    polling every COMPLETION_POLL seconds (the resolution of the latencies).
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, engine):
+        self.engine = engine
+        self.completed: Dict[str, float] = {}
+        self.failed: Dict[str, str] = {}
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+        threading.Thread(target=self._watch, name="bench-completions", daemon=True).start()
+
+    # ----------------------------------------------------------------------
+    def add(self, qid: str) -> None:
+        with self._lock:
+            self._pending.append(qid)
+
+    def wait(self, count: int, timeout: float) -> None:
+        deadline = time.time() + timeout
+        while len(self.completed) < count and time.time() < deadline:
+            time.sleep(COMPLETION_POLL)
+
+    def _watch(self):
+        from openfabric_pysdk.context import RayStatus
+        while True:
+            now = time.time()
+            with self._lock:
+                pending, self._pending = self._pending, []
+            for qid in pending:
+                ray = self.engine.ray(qid)
+                if not ray.finished:
+                    with self._lock:
+                        self._pending.append(qid)
+                    continue
+                if ray.status == RayStatus.FAILED:
+                    self.failed[qid] = str(ray.status)
+                self.completed[qid] = now
+            time.sleep(COMPLETION_POLL)
+
+
+# --------------------------------------------------------------------------
+def start_server(module: str, port: int, *args: str) -> subprocess.Popen:
+    """Starts a stand-in server from the bench package and waits until it listens."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", module, "--port", str(port), *args],
+        cwd=APP_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError(f"{module} exited with status {process.returncode}")
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{module} did not start on port {port}")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process in MiB."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    """Summarizes durations (seconds) as milliseconds."""
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    ms = np.asarray(values) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "mean": float(ms.mean()), "max": float(ms.max())}
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+# --------------------------------------------------------------------------
+def run(args: argparse.Namespace) -> Dict:
+    """Runs one benchmark and returns its result document."""
+    ollama_port, image_port, model_port = free_port(), free_port(), free_port()
+    servers = [
+        start_server("bench.fake_ollama", ollama_port, "--ttft-ms", str(args.ttft_ms),
+                     "--tokens-per-second", str(args.tokens_per_second), "--tokens", str(args.tokens)),
+        start_server("bench.fake_openfabric", image_port, "--name", "text-to-image",
+                     "--latency-ms", str(args.app_latency_ms), "--resource-kb", str(args.resource_kb)),
+        start_server("bench.fake_openfabric", model_port, "--name", "image-to-3d",
+                     "--latency-ms", str(args.app_latency_ms), "--resource-kb", str(args.resource_kb * 4)),
+    ]
+    try:
+        # Stores, caches and memories are created under the working directory
+        os.chdir(tempfile.mkdtemp(prefix="bench-"))
+        sys.path.insert(0, APP_DIR)
+
+        from core.store import install as install_store
+        from core.task_queue import install as install_task_queue
+        from core.engine_pool import install as install_engine_pool, metrics
+        install_store()
+        install_task_queue()
+        install_engine_pool(args.workers, args.workers, "inprocess")
+        from openfabric_pysdk.engine import engine
+
+        import main
+        from ontology_dc8f06af066e4a7880a5938933236037.config import ConfigClass
+        main.config({'super-user': ConfigClass(
+            app_ids=[f"http://127.0.0.1:{image_port}", f"http://127.0.0.1:{model_port}"],
+            llm_endpoint=f"http://127.0.0.1:{ollama_port}/api/generate",
+            response_cache=args.cache,
+            memory=args.memory,
+        )}, None)
+
+        app = Completions(engine)
+        submitted: Dict[str, float] = {}
+        total = int(args.qps * args.duration)
+        rss_samples = []
+        start = time.time()
+        for i in range(total):
+            delay = start + i / args.qps - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            data = json.dumps({"prompt": f"benchmark prompt {i % args.unique_prompts}", "stream": args.stream})
+            submitted_at = time.time()
+            qid = engine.prepare(None, data, uid=f"bench-{i % args.users}")
+            submitted[qid] = submitted_at
+            app.add(qid)
+            if i % max(1, int(args.qps)) == 0:
+                rss_samples.append(rss_mb())
+        app.wait(total, args.drain)
+        elapsed = time.time() - start
+
+        latencies = [app.completed[qid] - at for qid, at in submitted.items() if qid in app.completed]
+        timings = [metrics.ray(qid) for qid in submitted]
+        timings = [t for t in timings if t is not None]
+        rss_samples.append(rss_mb())
+        return {
+            "version": RESULT_VERSION,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "params": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+            # Rays run main.execute on the engine pool threads, not through the SDK App's subprocess
+            "execution": "inprocess",
+            "results": {
+                "requests": total,
+                "completed": len(latencies),
+                "failed": len(app.failed),
+                "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+                "latency_ms": percentiles(latencies),
+                "queue_wait_ms": percentiles([t["queue_wait"] for t in timings if t["queue_wait"] is not None]),
+                "execution_ms": percentiles([t["execution"] for t in timings]),
+                "rss_peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                "rss_mean_mb": float(np.mean(rss_samples)),
+            },
+        }
+    finally:
+        for server in servers:
+            server.terminate()
+
+
+def compare(result: Dict, baseline: Dict, tolerance: float) -> bool:
+    """Prints the change against a baseline; returns False on a regression."""
+    current, previous = result["results"], baseline["results"]
+    ok = True
+    checks = [
+        ("latency p50 (ms)", current["latency_ms"]["p50"], previous["latency_ms"]["p50"], False),
+        ("latency p95 (ms)", current["latency_ms"]["p95"], previous["latency_ms"]["p95"], True),
+        ("latency p99 (ms)", current["latency_ms"]["p99"], previous["latency_ms"]["p99"], False),
+        ("throughput (rps)", current["throughput_rps"], previous["throughput_rps"], True),
+        ("rss peak (MiB)", current["rss_peak_mb"], previous["rss_peak_mb"], False),
+    ]
+    for name, now, before, gated in checks:
+        if now is None or not before:
+            continue
+        change = (now - before) / before
+        worse = change < -tolerance if name.startswith("throughput") else change > tolerance
+        flag = " REGRESSION" if worse and gated else ""
+        print(f"{name:<18} {before:>10.1f} -> {now:>10.1f} ({change:+.1%}){flag}")
+        ok = ok and not (worse and gated)
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load-testing benchmark for the execute() pipeline")
+    parser.add_argument("--qps", type=float, default=5.0, help="Requests submitted per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of load")
+    parser.add_argument("--drain", type=float, default=120.0, help="Seconds to wait for outstanding requests")
+    parser.add_argument("--workers", type=int, default=4, help="Engine workers and in-flight limit")
+    parser.add_argument("--users", type=int, default=4, help="Distinct UIDs the requests are spread over")
+    parser.add_argument("--unique-prompts", type=int, default=1000, help="Distinct prompts (lower hits the caches)")
+    parser.add_argument("--stream", action="store_true", help="Stream the LLM expansion")
+    parser.add_argument("--cache", action="store_true", help="Enable the LLM response cache")
+    parser.add_argument("--memory", action="store_true", help="Enable long-term memory")
+    parser.add_argument("--ttft-ms", type=float, default=100.0)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--tokens", type=int, default=48)
+    parser.add_argument("--app-latency-ms", type=float, default=300.0)
+    parser.add_argument("--resource-kb", type=int, default=256)
+    parser.add_argument("--out", help="Result file (default: bench/results/<timestamp>.json)")
+    parser.add_argument("--baseline", help="Earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    out = os.path.abspath(args.out or os.path.join(
+        APP_DIR, "bench", "results", datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + ".json"
+    ))
+
+    result = run(args)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps(result["results"], indent=2))
+    print(f"Results written to {out}")
+
+    ok = compare(result, baseline, args.tolerance) if baseline else True
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    status = 2
+    try:
+        status = main()
+    except SystemExit as e:
+        status = e.code if isinstance(e.code, int) else int(e.code is not None)
+    except BaseException:
+        logging.exception("Benchmark failed")
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        # The SDK engine worker is not a daemon thread; exit without joining it, also on errors
+        os._exit(status)
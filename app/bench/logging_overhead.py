@@ -0,0 +1,105 @@
+"""
+Logging overhead benchmark.
+
+Replays the per-request log lines of the hot path (a Stub call with its input
+and resolved output, LLM and pipeline progress lines) many times, once in the
+plain mode (eager f-strings with full payloads, formatted and written on the
+calling thread) and once in the structured mode (lazy `%s` arguments wrapped in
+`payload`, sampled and written through the queue). Each mode runs in its own
+process; caller-side latency per request and total CPU time are reported as JSON:
+
+    cd app
+    python -m bench.logging_overhead --requests 5000 --payload-kb 256
+"""
+import argparse
+import base64
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from typing import Dict
+
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _replay(mode: str, requests: int, payload_kb: int) -> Dict:
+    from core import logs
+
+    handler = logging.FileHandler(os.devnull)
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    if mode == "structured":
+        logs.install("structured")
+
+    image = base64.b64encode(os.urandom(payload_kb * 1024 * 3 // 4)).decode("ascii")
+    data = {"prompt": "a glowing dragon on a cliff at sunset " * 8}
+    result = {"result": image}
+
+    durations = []
+    cpu = time.process_time()
+    for i in range(requests):
+        start = time.perf_counter()
+        if mode == "structured":
+            logging.info("Calling app %s with fields: %s and UID: %s", "text-to-image", logs.payload(data), i,
+                         extra=logs.SAMPLED)
+            logging.info("Received result for %s with fields: %s", "text-to-image", logs.payload(result),
+                         extra=logs.SAMPLED)
+            logging.info("Generating response for prompt: %s", logs.payload(data["prompt"], 50), extra=logs.SAMPLED)
+            logging.info("Pipeline stage %s finished in %.2f seconds", "text_to_image", 0.5, extra=logs.SAMPLED)
+        else:
+            logging.info(f"Calling app text-to-image with fields: {data} and UID: {i}")
+            logging.info(f"Received result for text-to-image with fields: {result}")
+            logging.info(f"Generating response for prompt: '{data['prompt'][:50]}...'")
+            logging.info(f"Pipeline stage text_to_image finished in {0.5:.2f} seconds")
+        durations.append(time.perf_counter() - start)
+    caller = time.process_time() - cpu
+    logs.shutdown()
+    total = time.process_time() - cpu
+
+    samples = np.array(durations) * 1e6
+    return {
+        "mode": mode,
+        "requests": requests,
+        "payload_kb": payload_kb,
+        "caller_us_p50": float(np.percentile(samples, 50)),
+        "caller_us_p99": float(np.percentile(samples, 99)),
+        "caller_cpu_s": caller,
+        "total_cpu_s": total,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the cost of plain and structured logging on the hot path")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--payload-kb", type=int, default=256, help="Size of the logged app output")
+    parser.add_argument("--mode", choices=("plain", "structured"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(_replay(args.mode, args.requests, args.payload_kb)))
+        return
+
+    results = {}
+    for mode in ("plain", "structured"):
+        output = subprocess.run(
+            [sys.executable, "-m", "bench.logging_overhead", "--mode", mode,
+             "--requests", str(args.requests), "--payload-kb", str(args.payload_kb)],
+            cwd=APP_DIR, check=True, capture_output=True, text=True
+        ).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+    plain, structured = results["plain"], results["structured"]
+    results["speedup"] = {
+        "caller_p50": plain["caller_us_p50"] / structured["caller_us_p50"],
+        "total_cpu": plain["total_cpu_s"] / structured["total_cpu_s"],
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Shared work queue scaling benchmark.
+
+Starts 1, 2, 4, ... worker processes on a fresh work queue, submits the same
+number of jobs to it and measures how long the workers take to drain it. The
+execute callback is CPU-bound on purpose (marshmallow schema round trips and
+JSON encoding of a batch-sized response, the parts of `execute` that hold the
+GIL), so the result shows how throughput scales with processes rather than with
+the latency of the backends. Reports jobs per second and the speedup over one
+worker as JSON:
+
+    cd app
+    python -m bench.shared_queue --jobs 400 --workers 1 2 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+from core.work_queue import JobStatus, Worker, WorkQueue
+
+# Seconds to wait for every job of a run to finish
+RUN_TIMEOUT = 600
+
+
+def execute(model) -> None:
+    """A CPU-bound stand-in for `main.execute`: builds and round-trips a batch response."""
+    from ontology_dc8f06af066e4a7880a5938933236037.output import (
+        BatchItemResult, OutputClass, OutputClassSchema
+    )
+
+    schema = OutputClassSchema()
+    response = OutputClass(message=model.request.prompt, items=[
+        BatchItemResult(index=i, status="completed", message=model.request.prompt * 4,
+                        stage_timings={"expand": 0.1 * i, "text_to_image": 0.2 * i})
+        for i in range(model.request.max_tokens)
+    ])
+    for _ in range(5):
+        response = schema.load(json.loads(json.dumps(schema.dump(response))))
+    model.response.message = response.message
+    model.response.items = response.items
+
+
+def _work(path: str, ready) -> None:
+    import logging
+    logging.disable(logging.INFO)
+    with ready.get_lock():
+        ready.value += 1
+    Worker(WorkQueue(path), execute).run()
+
+
+def run(workers: int, jobs: int, items: int) -> Dict:
+    """Drains `jobs` jobs with `workers` processes and returns the throughput."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "work.db")
+        queue = WorkQueue(path)
+        ready = multiprocessing.Value("i", 0)
+        processes = [multiprocessing.Process(target=_work, args=(path, ready), daemon=True) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        while ready.value < workers:
+            time.sleep(0.01)
+        # Let the workers finish importing and reach their idle poll
+        time.sleep(1.0)
+
+        data = json.dumps({"prompt": "a glowing dragon on a cliff at sunset", "max_tokens": items})
+        start = time.time()
+        for index in range(jobs):
+            queue.submit(f"job-{index}", "bench", data, None)
+        deadline = start + RUN_TIMEOUT
+        while time.time() < deadline:
+            stats = queue.stats()
+            if stats.get(JobStatus.DONE, 0) + stats.get(JobStatus.FAILED, 0) >= jobs:
+                break
+            time.sleep(0.02)
+        elapsed = time.time() - start
+        stats = queue.stats()
+
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+    return {
+        "workers": workers,
+        "jobs": jobs,
+        "done": stats.get(JobStatus.DONE, 0),
+        "failed": stats.get(JobStatus.FAILED, 0),
+        "seconds": elapsed,
+        "jobs_per_second": jobs / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how shared-queue throughput scales with worker processes")
+    parser.add_argument("--jobs", type=int, default=400)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--items", type=int, default=50, help="Batch items in each job's response")
+    args = parser.parse_args()
+
+    results: List[Dict] = [run(workers, args.jobs, args.items) for workers in args.workers]
+    base = results[0]["jobs_per_second"] / results[0]["workers"]
+    for result in results:
+        result["speedup"] = result["jobs_per_second"] / results[0]["jobs_per_second"]
+        result["efficiency"] = result["jobs_per_second"] / (base * result["workers"])
+    print(json.dumps({"cpus": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import base64
+import binascii
+import hmac
+import json
+import logging
+import os
+import urllib.parse
+from typing import Any, Dict, List, Optional
+
+from core.blob_store import CHUNK_SIZE, Blob, BlobStore, BlobTooLarge, TooManyUploads, blob_store, is_digest
+from core.deadline import Deadline
+
+# Prefix of attachment handles; the rest is the SHA-256 of the content
+HANDLE_PREFIX = "blob:"
+
+# Largest attachment accepted through the upload routes
+MAX_ATTACHMENT_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", 64 * 1024 ** 2))
+
+# Inline attachments shorter than this are left in the request as they are
+INLINE_LIMIT = 1024
+
+# Leading bytes of the image formats vision models accept
+_IMAGE_SIGNATURES = (b"\x89PNG\r\n\x1a\n", b"\xff\xd8\xff", b"GIF87a", b"GIF89a")
+
+# Front-end serving /attachments, for workers on hosts that do not share its blob store
+ATTACHMENT_URL = os.getenv("ATTACHMENT_URL")
+
+# Shared secret callers present to the /attachments routes; the routes are not served without one
+ATTACHMENT_SECRET = os.getenv("ATTACHMENT_SECRET")
+
+# Hosts (comma separated) that http(s) attachments may be downloaded from; URLs are refused when empty
+URL_HOSTS = frozenset(host.strip().lower() for host in os.getenv("ATTACHMENT_URL_HOSTS", "").split(",") if host.strip())
+
+
+def handle(blob: Blob) -> str:
+    """Returns the handle a request uses to reference a stored attachment."""
+    return f"{HANDLE_PREFIX}{blob.digest}"
+
+
+def is_handle(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith(HANDLE_PREFIX) and is_digest(value[len(HANDLE_PREFIX):])
+
+
+# --------------------------------------------------------------------------
+def ingest(value: str, store: BlobStore = blob_store) -> str:
+    """
+    Moves an inline attachment to the blob store and returns its handle. Handles,
+    URLs and short values are returned unchanged.
+
+    A `data:` URI is stored decoded, with its media type. Other long values are
+    stored decoded if they are base64, and as UTF-8 text otherwise.
+    """
+    if is_handle(value) or _is_url(value) or len(value) < INLINE_LIMIT:
+        return value
+    return handle(_store_inline(value, store))
+
+
+def externalize(data: str, store: BlobStore = blob_store) -> str:
+    """
+    Rewrites a serialized InputClass so its inline attachments are replaced by
+    handles, keeping the ray input small however large the attachments are, and
+    pins every referenced blob so it is not evicted while the ray waits.
+    Input that has no attachments, or cannot be parsed, is returned unchanged.
+    """
+    if not isinstance(data, str) or '"attachments"' not in data:
+        return data
+    try:
+        request = json.loads(data)
+    except ValueError:
+        return data
+    attachments = request.get("attachments") if isinstance(request, dict) else None
+    if not attachments:
+        return data
+    ingested = [ingest(value, store) if isinstance(value, str) else value for value in attachments]
+    store.pin([value[len(HANDLE_PREFIX):] for value in ingested if is_handle(value)])
+    if ingested == attachments:
+        return data
+    request["attachments"] = ingested
+    return json.dumps(request)
+
+
+# --------------------------------------------------------------------------
+def open_attachment(value: str, store: BlobStore = blob_store, deadline: Optional[Deadline] = None) -> Blob:
+    """
+    Returns the content of an attachment as a Blob, whose `view` is a read-only
+    memory map: a handle is looked up in the store (or fetched from ATTACHMENT_URL
+    when it is not stored locally), a URL on an ATTACHMENT_URL_HOSTS host is
+    downloaded to the store without following redirects, and an inline value is
+    stored first.
+
+    Raises:
+        KeyError: If a handle references content that is not (or no longer) stored.
+        ValueError: If a URL points to a host that is not allow-listed.
+    """
+    if is_handle(value):
+        digest = value[len(HANDLE_PREFIX):]
+        blob = store.get(digest)
+        if blob is None and ATTACHMENT_URL:
+            blob = store.fetch(
+                f"{ATTACHMENT_URL.rstrip('/')}/attachments/{digest}", deadline=deadline, headers=_credentials()
+            )
+            if blob.digest != digest:
+                raise KeyError(f"Attachment {value} was served with different content")
+        if blob is None:
+            raise KeyError(f"Attachment {value} is not stored; upload it again")
+        return blob
+    if _is_url(value):
+        host = urllib.parse.urlsplit(value).hostname
+        if not host or host.lower() not in URL_HOSTS:
+            raise ValueError(f"Attachments are not downloaded from {host or value}; upload the content instead")
+        return store.fetch(value, deadline=deadline, allow_redirects=False)
+    return _store_inline(value, store)
+
+
+def open_attachments(
+    values: Optional[List[str]], store: BlobStore = blob_store, deadline: Optional[Deadline] = None
+) -> List[Blob]:
+    return [open_attachment(value, store, deadline) for value in values or []]
+
+
+def is_image(blob: Blob) -> bool:
+    """Whether a blob holds a PNG, JPEG, GIF or WebP image, judged by its first bytes."""
+    view = blob.view()
+    head = bytes(view[:12])
+    view.release()
+    return head.startswith(_IMAGE_SIGNATURES) or (head[:4] == b"RIFF" and head[8:12] == b"WEBP")
+
+
+# --------------------------------------------------------------------------
+def install() -> None:
+    """
+    Makes `Engine.prepare` move inline attachments to the blob store before the
+    input is written, so rays of clients that still send attachments in the
+    request body reference them by handle too.
+    """
+    from openfabric_pysdk.engine import engine as instance
+    engine_class = type(instance)
+    original = engine_class.prepare
+
+    def prepare(self, app, data, *args, **kwargs):
+        return original(self, app, externalize(data), *args, **kwargs)
+
+    engine_class.prepare = prepare
+
+
+def install_routes(webserver: Any, store: BlobStore = blob_store, secret: Optional[str] = ATTACHMENT_SECRET) -> None:
+    """
+    Serves attachment uploads on the SDK's Flask web server:
+
+    - `POST /attachments` streams the request body into the store.
+    - `POST /attachments/uploads`, then `PUT /attachments/uploads/<id>?offset=N`
+      per part and `POST /attachments/uploads/<id>/commit?sha256=...` upload in parts.
+    - `HEAD /attachments/<sha256>` tells whether content is already stored, so a
+      client can reuse `blob:<sha256>` without uploading; `GET` downloads it.
+
+    Uploads answer with the `handle` to put in `InputClass.attachments`. Generated
+    images and 3D models come back in `OutputClass.image` / `model_3d` as handles
+    too: callers download them with `GET /attachments/<sha256>`.
+
+    Uploads must carry `Authorization: Bearer <secret>`; without a secret they are
+    not served, and attachments can only be sent inline. Downloads are always
+    served: the SHA-256 in the path is only known to callers that were given the
+    handle (or already have the content).
+    """
+    from flask import jsonify, request, send_file
+
+    def content(digest: str):
+        blob = store.get(digest)
+        if blob is None:
+            return jsonify({"error": f"Unknown attachment: {digest}"}), 404
+        return send_file(blob.path, mimetype=blob.content_type or "application/octet-stream")
+
+    webserver.add_url_rule("/attachments/<digest>", "attachments_content", content, methods=["GET", "HEAD"])
+    if not secret:
+        logging.warning("ATTACHMENT_SECRET not set, attachment uploads disabled")
+        return
+    expected = f"Bearer {secret}".encode("utf-8")
+
+    def authorized(route):
+        def call(*args, **kwargs):
+            if not hmac.compare_digest(request.headers.get("Authorization", "").encode("utf-8"), expected):
+                return jsonify({"error": "Unauthorized"}), 401
+            return route(*args, **kwargs)
+        return call
+
+    def body():
+        return iter(lambda: request.stream.read(CHUNK_SIZE), b"")
+
+    def stored(blob: Blob):
+        return jsonify({"handle": handle(blob), "sha256": blob.digest, "size": blob.size}), 201
+
+    def upload():
+        try:
+            return stored(store.write(body(), request.mimetype or None, MAX_ATTACHMENT_BYTES))
+        except BlobTooLarge as e:
+            return jsonify({"error": str(e)}), 413
+
+    def begin():
+        try:
+            return jsonify({"upload": store.begin_upload(request.args.get("content_type"))}), 201
+        except TooManyUploads as e:
+            return jsonify({"error": str(e)}), 429
+
+    def append(upload_id: str):
+        try:
+            size = store.append(upload_id, request.args.get("offset", 0, type=int), body(), MAX_ATTACHMENT_BYTES)
+        except KeyError as e:
+            return jsonify({"error": str(e)}), 404
+        except BlobTooLarge as e:
+            return jsonify({"error": str(e)}), 413
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 409
+        return jsonify({"size": size})
+
+    def commit(upload_id: str):
+        try:
+            return stored(store.finish(upload_id, request.args.get("sha256")))
+        except KeyError as e:
+            return jsonify({"error": str(e)}), 404
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 422
+
+    webserver.add_url_rule("/attachments", "attachments_upload", authorized(upload), methods=["POST"])
+    webserver.add_url_rule("/attachments/uploads", "attachments_begin", authorized(begin), methods=["POST"])
+    webserver.add_url_rule(
+        "/attachments/uploads/<upload_id>", "attachments_append", authorized(append), methods=["PUT"]
+    )
+    webserver.add_url_rule(
+        "/attachments/uploads/<upload_id>/commit", "attachments_commit", authorized(commit), methods=["POST"]
+    )
+    logging.info("Attachment uploads served at /attachments")
+
+
+# --------------------------------------------------------------------------
+def _is_url(value: str) -> bool:
+    return value.startswith(("http://", "https://"))
+
+
+def _credentials() -> Optional[Dict[str, str]]:
+    return {"Authorization": f"Bearer {ATTACHMENT_SECRET}"} if ATTACHMENT_SECRET else None
+
+
+def _store_inline(value: str, store: BlobStore) -> Blob:
+    if value.startswith("data:") and "," in value:
+        header, _, encoded = value.partition(",")
+        media_type = header[len("data:"):].split(";")[0] or None
+        if header.endswith(";base64"):
+            return store.put(base64.b64decode(encoded), media_type)
+        return store.put(urllib.parse.unquote_to_bytes(encoded), media_type)
+    try:
+        return store.put(base64.b64decode(value, validate=True))
+    except (binascii.Error, ValueError):
+        return store.put(value.encode("utf-8"), "text/plain")
@@ -0,0 +1,445 @@
+import collections
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence
+
+import requests
+from marshmallow import Schema, fields
+
+from core.deadline import Deadline
+from core.metrics import RESOURCE_BYTES
+
+# Default location of the blob store, next to the other caches
+BLOB_PATH = f"{os.getcwd()}/cache/blobs"
+
+# Bytes kept on disk before the least recently used blobs are evicted
+DEFAULT_MAX_BYTES = int(os.getenv("BLOB_STORE_MAX_BYTES", 2 * 1024 ** 3))
+
+# Size of the chunks read from the network while downloading a resource
+CHUNK_SIZE = 1024 * 1024
+
+# Seconds to wait for the server between chunks of a download
+FETCH_TIMEOUT = 60
+
+# Seconds after which an upload that received no part is abandoned
+UPLOAD_IDLE = float(os.getenv("BLOB_UPLOAD_IDLE_SECONDS", 3600))
+
+# Chunked uploads open at the same time
+MAX_UPLOADS = int(os.getenv("BLOB_MAX_UPLOADS", 64))
+
+# Seconds a blob referenced by a prepared ray is kept from eviction
+PIN_SECONDS = float(os.getenv("BLOB_PIN_SECONDS", 3600))
+
+
+class BlobTooLarge(ValueError):
+    """Raised when streamed content grows past the size allowed for it."""
+
+
+class TooManyUploads(RuntimeError):
+    """Raised when MAX_UPLOADS chunked uploads are already open."""
+
+
+class Blob:
+    """
+    Blob is a lightweight handle to a stored resource. It carries only the digest,
+    size and path; the content is read through a read-only memory map, so it is
+    never copied into a Python string.
+
+    Attributes:
+        digest (str): SHA-256 of the content.
+        size (int): Size of the content in bytes.
+        path (str): File holding the content.
+        content_type (Optional[str]): MIME type reported when the resource was fetched.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, digest: str, size: int, path: str, content_type: Optional[str] = None):
+        self.digest = digest
+        self.size = size
+        self.path = path
+        self.content_type = content_type
+
+    # ----------------------------------------------------------------------
+    def view(self) -> memoryview:
+        """Returns a read-only view of the content, backed by a memory map."""
+        if self.size == 0:
+            return memoryview(b"")
+        with open(self.path, "rb") as f:
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __repr__(self) -> str:
+        return f"Blob({self.digest[:12]}, {self.size} bytes, {self.content_type})"
+
+
+class Upload:
+    """A chunked upload in progress: the part file and the running hash of its content."""
+
+    def __init__(self, directory: str, content_type: Optional[str]):
+        self.id = uuid.uuid4().hex
+        self.path = os.path.join(directory, f"{self.id}.upload")
+        self.content_type = content_type
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.touched = time.time()
+        self.lock = threading.Lock()
+        open(self.path, "wb").close()
+
+
+class BlobStore:
+    """
+    BlobStore keeps downloaded Openfabric resources on disk, addressed by the
+    SHA-256 of their content. Downloads are streamed to a temporary file while
+    hashing, so a resource is never held in memory; identical content is stored
+    once. The store is bounded by size and evicts least recently used blobs.
+
+    Content can also arrive in parts through `begin_upload`, `append` and `finish`;
+    the hash is updated as the parts are written, so completing an upload does
+    not read the content back. Parts of open uploads count against the disk
+    budget, and at most `max_uploads` uploads are open at a time.
+
+    Blobs referenced by rays that are still waiting can be pinned; eviction skips
+    them until the pin expires. Pins are kept in memory by the process that set
+    them, so a ray that waits longer than its pin may find an attachment evicted
+    under disk pressure and fail asking for it to be uploaded again.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, path: str = BLOB_PATH, max_bytes: int = DEFAULT_MAX_BYTES, max_uploads: int = MAX_UPLOADS):
+        """
+        Args:
+            path (str): Directory holding the blobs.
+            max_bytes (int): Disk budget, shared by blobs and open uploads; older
+                blobs are evicted beyond it.
+            max_uploads (int): Chunked uploads open at the same time.
+        """
+        self._path = path
+        self._max_bytes = max_bytes
+        self._max_uploads = max_uploads
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self._sizes: "collections.OrderedDict[str, int]" = collections.OrderedDict()
+        self._total = 0
+        self._uploads: Dict[str, Upload] = {}
+        self._uploading = 0
+        self._pins: Dict[str, float] = {}
+
+        os.makedirs(path, exist_ok=True)
+        entries = []
+        stale = time.time() - UPLOAD_IDLE
+        for root, _, files in os.walk(path):
+            for name in files:
+                stat = os.stat(os.path.join(root, name))
+                if len(name) == 64:
+                    entries.append((stat.st_atime, name, stat.st_size))
+                elif name.endswith(".upload") and stat.st_mtime < stale:
+                    os.unlink(os.path.join(root, name))
+        for _, digest, size in sorted(entries):
+            self._sizes[digest] = size
+            self._total += size
+
+    # ----------------------------------------------------------------------
+    def fetch(
+        self,
+        url: str,
+        timeout: float = FETCH_TIMEOUT,
+        deadline: Optional[Deadline] = None,
+        headers: Optional[Dict[str, str]] = None,
+        allow_redirects: bool = True
+    ) -> Blob:
+        """
+        Streams a resource to the store and returns its handle. The URL is fetched
+        as given; callers only pass URLs of servers they trust (configured apps,
+        ATTACHMENT_URL or allow-listed hosts), never one taken from a request
+        unchecked.
+
+        Args:
+            url (str): The resource URL.
+            timeout (float): Seconds to wait for the server between chunks.
+            deadline (Optional[Deadline]): When the download must be done; it is
+                abandoned once the deadline passes.
+            headers (Optional[Dict[str, str]]): Extra request headers, e.g. credentials.
+            allow_redirects (bool): Whether redirects to other URLs are followed.
+
+        Returns:
+            Blob: The handle of the stored content.
+
+        Raises:
+            DeadlineExceeded: If the download ran past the deadline.
+        """
+        deadline = deadline or Deadline()
+        with self._session.get(
+            url, stream=True, timeout=deadline.timeout(timeout), headers=headers, allow_redirects=allow_redirects
+        ) as response:
+            response.raise_for_status()
+
+            def chunks() -> Iterator[bytes]:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    deadline.check("resource download")
+                    yield chunk
+
+            blob = self.write(chunks(), response.headers.get("Content-Type"))
+        RESOURCE_BYTES.observe(blob.size)
+        return blob
+
+    # ----------------------------------------------------------------------
+    def put(self, data: bytes, content_type: Optional[str] = None) -> Blob:
+        """Stores content that is already in memory and returns its handle."""
+        with tempfile.NamedTemporaryFile(dir=self._path, suffix=".part", delete=False) as f:
+            f.write(data)
+        return self._commit(f.name, hashlib.sha256(data).hexdigest(), len(data), content_type)
+
+    def write(self, chunks: Iterable[bytes], content_type: Optional[str] = None, max_bytes: Optional[int] = None) -> Blob:
+        """
+        Streams content to the store while hashing it and returns its handle; only
+        one chunk is held in memory at a time.
+
+        Raises:
+            BlobTooLarge: If the content is larger than `max_bytes`.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=self._path, suffix=".part", delete=False) as f:
+            try:
+                for chunk in chunks:
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise BlobTooLarge(f"Content exceeds {max_bytes} bytes")
+                    digest.update(chunk)
+                    f.write(chunk)
+            except BaseException:
+                f.close()
+                os.unlink(f.name)
+                raise
+        return self._commit(f.name, digest.hexdigest(), size, content_type)
+
+    # ----------------------------------------------------------------------
+    def begin_upload(self, content_type: Optional[str] = None) -> str:
+        """
+        Starts a chunked upload and returns its ID, for `append` and `finish`.
+
+        Raises:
+            TooManyUploads: If `max_uploads` uploads are already open.
+        """
+        with self._lock:
+            self._expire_uploads()
+            if len(self._uploads) >= self._max_uploads:
+                raise TooManyUploads(f"{len(self._uploads)} uploads already open")
+            upload = Upload(self._path, content_type)
+            self._uploads[upload.id] = upload
+        return upload.id
+
+    def append(self, upload_id: str, offset: int, chunks: Iterable[bytes], max_bytes: Optional[int] = None) -> int:
+        """
+        Appends the next part of an upload. `offset` must be the size received so
+        far, so a part that is sent twice is rejected instead of stored twice.
+
+        Returns:
+            int: The size received so far.
+
+        Raises:
+            KeyError: If the upload is unknown or expired.
+            ValueError: If `offset` is not the size received so far.
+            BlobTooLarge: If the upload grows past `max_bytes`, or the open uploads
+                past the disk budget.
+        """
+        upload = self._upload(upload_id)
+        with upload.lock:
+            if offset != upload.size:
+                raise ValueError(f"Expected offset {upload.size}, got {offset}")
+            with open(upload.path, "ab") as f:
+                for chunk in chunks:
+                    if max_bytes is not None and upload.size + len(chunk) > max_bytes:
+                        f.truncate(upload.size)
+                        raise BlobTooLarge(f"Content exceeds {max_bytes} bytes")
+                    self._reserve(len(chunk))
+                    try:
+                        f.write(chunk)
+                    except BaseException:
+                        self._release(len(chunk))
+                        f.truncate(upload.size)
+                        raise
+                    upload.digest.update(chunk)
+                    upload.size += len(chunk)
+            upload.touched = time.time()
+            return upload.size
+
+    def finish(self, upload_id: str, expected: Optional[str] = None) -> Blob:
+        """
+        Completes an upload and stores its content under its SHA-256.
+
+        Args:
+            upload_id (str): The upload ID.
+            expected (Optional[str]): SHA-256 announced by the client; the upload is
+                discarded if the content does not match it.
+
+        Raises:
+            KeyError: If the upload is unknown or expired.
+            ValueError: If the content does not match `expected`.
+        """
+        upload = self._upload(upload_id)
+        with upload.lock:
+            with self._lock:
+                if self._uploads.pop(upload_id, None) is None:
+                    raise KeyError(f"Unknown upload: {upload_id}")
+                self._uploading -= upload.size
+            digest = upload.digest.hexdigest()
+            if expected is not None and expected.lower() != digest:
+                os.unlink(upload.path)
+                raise ValueError(f"Content hash {digest} does not match {expected}")
+            return self._commit(upload.path, digest, upload.size, upload.content_type)
+
+    # ----------------------------------------------------------------------
+    def pin(self, digests: Sequence[str], seconds: float = PIN_SECONDS) -> None:
+        """Keeps the given blobs from being evicted for `seconds`."""
+        if not digests:
+            return
+        now = time.time()
+        with self._lock:
+            self._pins = {digest: until for digest, until in self._pins.items() if until > now}
+            for digest in digests:
+                self._pins[digest] = max(self._pins.get(digest, 0.0), now + seconds)
+
+    # ----------------------------------------------------------------------
+    def get(self, digest: str) -> Optional[Blob]:
+        """
+        Returns the handle of a stored blob, or None if it is missing or evicted.
+        Blobs written by other processes sharing the directory are found on disk.
+        """
+        if not is_digest(digest):
+            return None
+        path = self._file(digest)
+        with self._lock:
+            size = self._sizes.get(digest)
+            if size is None:
+                try:
+                    size = os.stat(path).st_size
+                except FileNotFoundError:
+                    return None
+                self._sizes[digest] = size
+                self._total += size
+            self._sizes.move_to_end(digest)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return Blob(digest, size, path)
+
+    # ----------------------------------------------------------------------
+    def resolve(self, url: str, data: Any, schema: Schema, deadline: Optional[Deadline] = None) -> Any:
+        """
+        Replaces the resource references (`reid`s) in an app output with blob
+        handles, downloading each referenced resource to the store.
+
+        Args:
+            url (str): URL template of the resources, with a `{reid}` placeholder.
+            data (Any): The output returned by the app.
+            schema (Schema): The app's output schema, used to find resource fields.
+            deadline (Optional[Deadline]): When the downloads must be done.
+
+        Returns:
+            Any: The output with every resource field holding a `Blob`.
+        """
+        if not isinstance(data, dict):
+            return data
+        resolved = dict(data)
+        for name, field in schema.fields.items():
+            key = field.data_key or name
+            if resolved.get(key) is not None:
+                resolved[key] = self._resolve_field(url, resolved[key], field, deadline)
+        return resolved
+
+    def _resolve_field(self, url: str, value: Any, field: fields.Field, deadline: Optional[Deadline]) -> Any:
+        if _is_resource(field):
+            return self.fetch(url.format(reid=value), deadline=deadline) if isinstance(value, str) else value
+        if isinstance(field, fields.List) and isinstance(value, list):
+            return [self._resolve_field(url, item, field.inner, deadline) for item in value]
+        if isinstance(field, fields.Nested) and isinstance(value, dict):
+            return self.resolve(url, value, field.schema, deadline)
+        return value
+
+    # ----------------------------------------------------------------------
+    def _file(self, digest: str) -> str:
+        return os.path.join(self._path, digest[:2], digest)
+
+    def _upload(self, upload_id: str) -> "Upload":
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+        if upload is None:
+            raise KeyError(f"Unknown upload: {upload_id}")
+        return upload
+
+    def _reserve(self, size: int):
+        with self._lock:
+            if self._uploading + size > self._max_bytes:
+                raise BlobTooLarge(f"Open uploads exceed the store budget of {self._max_bytes} bytes")
+            self._uploading += size
+            self._evict()
+
+    def _release(self, size: int):
+        with self._lock:
+            self._uploading -= size
+
+    def _expire_uploads(self):
+        cutoff = time.time() - UPLOAD_IDLE
+        for upload_id, upload in list(self._uploads.items()):
+            if upload.touched < cutoff:
+                del self._uploads[upload_id]
+                self._uploading -= upload.size
+                try:
+                    os.unlink(upload.path)
+                except FileNotFoundError:
+                    pass
+                logging.info(f"Upload {upload_id} expired after {upload.size} bytes")
+
+    def _commit(self, temp: str, digest: str, size: int, content_type: Optional[str]) -> Blob:
+        path = self._file(digest)
+        with self._lock:
+            if digest in self._sizes:
+                os.unlink(temp)
+                self._sizes.move_to_end(digest)
+                logging.info(f"Blob {digest[:12]} already stored, deduplicated {size} bytes")
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp, path)
+                self._sizes[digest] = size
+                self._total += size
+                self._evict(keep=digest)
+        return Blob(digest, size, path, content_type)
+
+    def _evict(self, keep: Optional[str] = None):
+        # Least recently used first; pinned blobs and the one just stored are skipped
+        now = time.time()
+        for digest in list(self._sizes):
+            if self._total + self._uploading <= self._max_bytes:
+                break
+            if digest == keep or self._pins.get(digest, 0.0) > now:
+                continue
+            size = self._sizes.pop(digest)
+            self._total -= size
+            try:
+                os.unlink(self._file(digest))
+            except FileNotFoundError:
+                pass
+            logging.info(f"Blob {digest[:12]} evicted ({size} bytes)")
+
+
+def is_digest(value: str) -> bool:
+    """Whether `value` is a SHA-256 hex digest, as blobs are named."""
+    return len(value) == 64 and all(c in "0123456789abcdef" for c in value)
+
+
+def _is_resource(field: fields.Field) -> bool:
+    # The SDK marks resource outputs with its own `Resource` field type
+    return any(cls.__name__ == "Resource" for cls in type(field).__mro__)
+
+
+blob_store = BlobStore()
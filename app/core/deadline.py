@@ -0,0 +1,88 @@
+import collections
+import threading
+import time
+from typing import Optional
+
+# Latest durations kept to estimate the hedging delay
+WINDOW = 200
+
+# Durations needed before the p95 is trusted; no hedging happens before
+MIN_SAMPLES = 20
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request runs past its deadline."""
+
+
+class CallCancelled(Exception):
+    """Raised inside a call whose result is no longer wanted, e.g. the losing half of a hedge."""
+
+
+class Deadline:
+    """
+    Deadline is the absolute point in time by which a request must finish. It is
+    created once per request and handed down to every stage, which derives its
+    own timeouts from the time remaining instead of using a fixed one.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, seconds: Optional[float] = None):
+        """
+        Args:
+            seconds (Optional[float]): Time allowed from now; None or <= 0 means no deadline.
+        """
+        self.at = time.monotonic() + seconds if seconds and seconds > 0 else None
+
+    # ----------------------------------------------------------------------
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None without a deadline."""
+        return None if self.at is None else max(0.0, self.at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.at is not None and time.monotonic() >= self.at
+
+    def check(self, stage: str) -> None:
+        """
+        Raises:
+            DeadlineExceeded: If the deadline has passed.
+        """
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline exceeded during {stage}")
+
+    def timeout(self, cap: Optional[float] = None) -> Optional[float]:
+        """
+        Returns the time remaining, bounded by `cap`, for use as an I/O timeout.
+
+        Raises:
+            DeadlineExceeded: If the deadline has passed; HTTP clients reject a zero timeout.
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return cap
+        if remaining <= 0:
+            raise DeadlineExceeded("Deadline exceeded before an I/O call")
+        return remaining if cap is None else min(cap, remaining)
+
+
+class LatencyTracker:
+    """
+    LatencyTracker keeps the latest durations of a call and estimates their
+    95th percentile, which is used as the delay before a hedged duplicate is sent.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, window: int = WINDOW):
+        self._lock = threading.Lock()
+        self._samples = collections.deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        """Returns the 95th percentile, or None until MIN_SAMPLES were recorded."""
+        with self._lock:
+            if len(self._samples) < MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
@@ -0,0 +1,266 @@
+import collections
+import importlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from core.metrics import EXECUTION, QUEUE_WAIT
+
+# Worker threads draining the engine queue (the SDK's own worker counts as one)
+WORKERS = int(os.getenv("ENGINE_WORKERS", 4))
+
+# Executions allowed to run at once, including synchronous API calls
+MAX_IN_FLIGHT = int(os.getenv("ENGINE_MAX_IN_FLIGHT", WORKERS))
+
+# Per-ray timings kept for inspection
+HISTORY_SIZE = 1024
+
+# Where rays execute: "inprocess" runs the app's callbacks on the pool threads;
+# "sdk" hands them to the SDK App, whose single worker subprocess runs one at a time
+EXECUTION_MODE = os.getenv("ENGINE_EXECUTION", "inprocess")
+
+# The app's callbacks, as module:function, for in-process execution
+EXECUTE_CALLBACK = os.getenv("ENGINE_EXECUTE", "main:execute")
+CONFIG_CALLBACK = os.getenv("ENGINE_CONFIG", "main:config")
+
+
+class PoolMetrics:
+    """
+    PoolMetrics records, per ray, how long it waited in the queue and how long
+    its execution took, plus running totals, so queueing delay can be told apart
+    from slow executions.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, size: int = HISTORY_SIZE):
+        self._size = size
+        self._lock = threading.Lock()
+        self._rays: "collections.OrderedDict[str, Dict[str, float]]" = collections.OrderedDict()
+        self.in_flight = 0
+        self.executed = 0
+        self.queue_wait_seconds = 0.0
+        self.execution_seconds = 0.0
+
+    # ----------------------------------------------------------------------
+    def started(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self, qid: str, queue_wait: Optional[float], execution: float) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.executed += 1
+            self.queue_wait_seconds += queue_wait or 0.0
+            self.execution_seconds += execution
+            self._rays[qid] = {"queue_wait": queue_wait, "execution": execution}
+            while len(self._rays) > self._size:
+                self._rays.popitem(last=False)
+        if queue_wait is not None:
+            QUEUE_WAIT.observe(queue_wait)
+        EXECUTION.observe(execution)
+        wait = f"{queue_wait:.3f}s" if queue_wait is not None else "n/a"
+        logging.info("Openfabric - ray %s waited %s in queue, executed in %.3fs", qid, wait, execution)
+
+    # ----------------------------------------------------------------------
+    def ray(self, qid: str) -> Optional[Dict[str, float]]:
+        """Returns the queue wait and execution time of a recent ray."""
+        with self._lock:
+            return self._rays.get(qid)
+
+    def stats(self) -> Dict[str, float]:
+        """Returns the in-flight count and the mean queue wait and execution time."""
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "executed": self.executed,
+                "mean_queue_wait": self.queue_wait_seconds / self.executed if self.executed else 0.0,
+                "mean_execution": self.execution_seconds / self.executed if self.executed else 0.0,
+            }
+
+
+metrics = PoolMetrics()
+
+
+class InProcessExecutor:
+    """
+    InProcessExecutor runs the app's execute callback in this process, on the
+    calling pool thread, the way the SDK's worker subprocess runs it: the input
+    is read from the engine store, `execute` fills in the response and drives the
+    ray, and the output and final ray are written back.
+
+    Configurations are applied by the config callback on a thread of its own, so
+    the web server does not import the app while it starts; executions wait for
+    a configuration that is being applied.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, execute: str = EXECUTE_CALLBACK, configure: str = CONFIG_CALLBACK):
+        """
+        Args:
+            execute (str): The execute callback as module:function.
+            configure (str): The config callback as module:function, '' for none.
+        """
+        self._execute = execute
+        self._configure = configure
+        self._condition = threading.Condition()
+        self._pending: Optional[Tuple[Dict[str, Any], Any]] = None
+        self._applying = False
+        if configure:
+            threading.Thread(target=self._apply_configs, name="engine-config", daemon=True).start()
+
+    # ----------------------------------------------------------------------
+    def configure(self, config: Dict[str, Any], state: Any) -> None:
+        """Schedules a configuration; the latest one wins."""
+        with self._condition:
+            self._pending = (config, state)
+            self._condition.notify_all()
+
+    def execute(self, engine: Any, qid: str) -> Any:
+        """
+        Executes a ray and returns its response.
+
+        Returns:
+            Any: The OutputClass, or None if the ray has no input.
+        """
+        from openfabric_pysdk.context import MessageType, RaySchema, RayStatus
+        from ontology_dc8f06af066e4a7880a5938933236037.input import InputClassSchema
+        from ontology_dc8f06af066e4a7880a5938933236037.output import OutputClass, OutputClassSchema
+        from core.work_queue import WorkModel
+
+        with self._condition:
+            while self._pending is not None or self._applying:
+                self._condition.wait()
+
+        ray = engine.ray(qid)
+        data = engine.read(qid, 'in')
+        if data is None:
+            return None
+        ray.status = RayStatus.RUNNING
+        model = WorkModel(None, OutputClass(), ray)
+        try:
+            model.request = InputClassSchema().load(json.loads(data) if isinstance(data, str) else data)
+            _resolve(self._execute)(model)
+            ray.status = RayStatus.COMPLETED
+        except Exception as e:
+            logging.exception("Openfabric - execution of %s failed", qid)
+            ray.message(MessageType.ERROR, str(e) or type(e).__name__)
+            ray.status = RayStatus.FAILED
+        engine.write(qid, 'out', OutputClassSchema().dump(model.response))
+        ray.complete()
+        engine.write(qid, 'ray', ray, RaySchema().dump)
+        engine.flush(qid)
+        return model.response
+
+    # ----------------------------------------------------------------------
+    def _apply_configs(self):
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+                (config, state), self._pending = self._pending, None
+                self._applying = True
+            try:
+                _resolve(self._configure)(config, state)
+            except Exception:
+                logging.exception("Openfabric - configuration could not be applied")
+            finally:
+                with self._condition:
+                    self._applying = False
+                    self._condition.notify_all()
+
+
+def install(workers: int = WORKERS, max_in_flight: int = MAX_IN_FLIGHT, execution: str = EXECUTION_MODE) -> None:
+    """
+    Turns the SDK engine's single worker into a pool. `workers - 1` extra threads
+    drain the same queue under the engine's condition variable, and every
+    execution goes through a semaphore bounding how many run at once. With the
+    indexed task queue installed, the queue serves lanes round-robin, so the pool
+    picks up one ray per lane in turn. A lane is the ray's uid when that user has
+    a stored configuration, and its sid otherwise (the REST API makes up a new uid
+    for every request, a socket keeps its sid).
+
+    With `execution="inprocess"` the pool threads run the app's execute callback
+    themselves (InProcessExecutor), so up to `max_in_flight` rays really execute
+    at once. With "sdk" they hand each ray to the SDK App, which runs them one at
+    a time in its worker subprocess, so only the dispatch is parallel. Rays handed
+    to the shared work queue are dispatched either way.
+
+    The workers are OS threads started before the gevent monkey patching done by
+    the Flask stack; `execute` blocks on real locks and sockets, which would stall
+    the gevent hub if it ran inside a greenlet.
+
+    Must run after `core.task_queue.install`, which imports the engine, and after
+    `core.work_queue.install`.
+    """
+    from openfabric_pysdk.engine import engine as instance
+    from openfabric_pysdk.loader import state_config
+    from core.work_queue import shared_queue
+    engine_class = type(instance)
+    task = instance._Engine__task
+    limiter = threading.BoundedSemaphore(max(1, max_in_flight))
+    original = engine_class.process
+    executor = InProcessExecutor() if execution == "inprocess" and shared_queue() is None else None
+
+    if hasattr(task, "uid_of"):
+        def lane_of(qid: str) -> Optional[str]:
+            ray = instance.ray(qid)
+            return ray.uid if ray.uid and state_config.exists(ray.uid) else ray.sid
+
+        task.uid_of = lane_of
+
+    if executor is not None:
+        from openfabric_pysdk.app import App
+        configure = App.config_callback_function
+
+        def config_callback_function(self, config):
+            configure(self, config)
+            executor.configure(config, self.state)
+
+        App.config_callback_function = config_callback_function
+
+    def process(self, qid):
+        gevent = sys.modules.get("gevent")
+        if executor is not None and gevent is not None and isinstance(gevent.getcurrent(), gevent.Greenlet):
+            # Synchronous API calls run in web server greenlets; execute on a real thread meanwhile
+            return gevent.get_hub().threadpool.apply(process, (self, qid))
+        queue_wait = task.queue_wait(qid) if hasattr(task, "queue_wait") else None
+        with limiter:
+            metrics.started()
+            start = time.time()
+            try:
+                return executor.execute(self, qid) if executor is not None else original(self, qid)
+            finally:
+                metrics.finished(qid, queue_wait, time.time() - start)
+
+    def work():
+        lock: threading.Condition = engine_class._Engine__lock
+        while True:
+            with lock:
+                while not (instance._Engine__running and not task.empty()):
+                    lock.wait()
+                try:
+                    qid = task.next()
+                except Exception:
+                    continue
+            try:
+                process(instance, qid)
+            except Exception as e:
+                logging.error(f"Openfabric - execution of {qid} failed: {e}")
+
+    engine_class.process = process
+    for index in range(1, max(1, workers)):
+        threading.Thread(target=work, name=f"engine-worker-{index}", daemon=True).start()
+    logging.info(
+        f"Openfabric - engine pool with {max(1, workers)} workers, {max(1, max_in_flight)} in flight, "
+        f"executing {'in process' if executor is not None else 'through the SDK app'}"
+    )
+
+
+def _resolve(name: str) -> Callable:
+    """Resolves a module:function reference; the module is imported on first use."""
+    module, _, function = name.partition(":")
+    return getattr(importlib.import_module(module), function)
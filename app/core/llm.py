@@ -0,0 +1,526 @@
+import base64
+import json
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Generator, List, Optional, Sequence, TypeVar
+
+import requests
+
+from core import logs, metrics
+from core.batcher import GenerationBatcher
+from core.blob_store import Blob
+from core.deadline import CallCancelled, Deadline, DeadlineExceeded
+from core.response_cache import ResponseCache
+from core.router import Backend, EndpointRouter
+from ontology_dc8f06af066e4a7880a5938933236037.config import ConfigClass
+
+# Token usage fields returned with every finished generation
+USAGE_FIELDS = ("tokens_used", "prompt_tokens", "tokens_per_second")
+
+# Threads running the two attempts of hedged generations
+_hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge")
+
+T = TypeVar("T")
+
+
+class LLMClient:
+    """
+    LLMClient is a thin client for locally hosted Ollama-compatible endpoints. It
+    sends every request through a shared `requests.Session`, so the underlying
+    keep-alive connection pool is reused across prompts, and through an
+    `EndpointRouter`, which picks the least loaded healthy host and lets a failed
+    call be retried on another one.
+
+    Attributes:
+        endpoint (str): The primary generate endpoint URL.
+        router (EndpointRouter): Chooses the host of every call.
+        default_model (str): Model used when the request does not name one.
+        max_tokens (int): Default `num_predict` limit for a generation.
+        session (requests.Session): The HTTP session used for every call.
+        cache (Optional[ResponseCache]): Response cache consulted before the backend.
+        batcher (Optional[GenerationBatcher]): Groups concurrent generations per model.
+        keep_alive (str): How long Ollama keeps a model loaded after a request.
+        timeout (Optional[float]): Seconds a generation may take when the caller sets
+            no deadline.
+        hedging (bool): Whether a generation slower than the recent p95 is duplicated
+            on another host.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(
+        self,
+        config: ConfigClass,
+        session: Optional[requests.Session] = None,
+        cache: Optional[ResponseCache] = None,
+        batcher: Optional[GenerationBatcher] = None,
+        router: Optional[EndpointRouter] = None
+    ):
+        """
+        Initializes the client from a user configuration.
+
+        Args:
+            config (ConfigClass): The user configuration holding endpoint and model defaults.
+            session (Optional[requests.Session]): A pooled session to reuse. A private one
+                is created when omitted.
+            cache (Optional[ResponseCache]): A response cache to use; caching is off when omitted.
+            batcher (Optional[GenerationBatcher]): A micro-batcher shared by the clients of
+                the endpoint; generations are sent directly when omitted.
+            router (Optional[EndpointRouter]): A router shared by the clients of the same
+                endpoint pool. A private one over the configured endpoints is created when
+                omitted.
+        """
+        self.endpoint = config.llm_endpoint
+        self.timeout = config.timeout
+        self.default_model = config.default_model
+        self.max_tokens = config.max_response_tokens
+        self.session = session or requests.Session()
+        self.cache = cache
+        self.cache_sampled = config.cache_sampled_responses
+        self.batcher = batcher
+        self.keep_alive = config.keep_alive
+        self.hedging = config.hedging
+        self.router = router or EndpointRouter(config.llm_endpoints or [config.llm_endpoint], self.session, 0)
+        logging.info(f"LLMClient initialized with endpoints: {[b.base for b in self.router.backends]}")
+
+    # ----------------------------------------------------------------------
+    def _payload(
+        self,
+        prompt: str,
+        model: Optional[str],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        stream: bool,
+        context: Optional[List[int]] = None,
+        images: Optional[List[Blob]] = None
+    ) -> Dict:
+        payload = {
+            "model": model or self.default_model,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+            "options": {
+                "temperature": 0.7 if temperature is None else temperature,
+                "num_predict": max_tokens or self.max_tokens
+            }
+        }
+        if context:
+            # Continues an earlier conversation without re-evaluating it
+            payload["context"] = context
+        if images:
+            # Encoded straight from the blobs' memory maps, for vision models
+            payload["images"] = [base64.b64encode(image.view()).decode("ascii") for image in images]
+        return payload
+
+    # ----------------------------------------------------------------------
+    def _route(
+        self,
+        model: str,
+        call: Callable[[Backend], T],
+        measure: bool = True,
+        deadline: Optional[Deadline] = None,
+        avoid: Sequence[Backend] = ()
+    ) -> T:
+        """
+        Runs `call` on the best host serving `model`, moving on to the next best
+        host when it fails. Hosts in `avoid` are tried last.
+
+        Raises:
+            DeadlineExceeded: If the deadline passed before a host answered.
+            Exception: The last failure when every host failed.
+        """
+        error: Optional[Exception] = None
+        for backend in self.router.candidates(model, avoid):
+            if deadline is not None:
+                deadline.check("LLM call")
+            try:
+                with self.router.track(backend, measure):
+                    return call(backend)
+            except (DeadlineExceeded, CallCancelled):
+                raise
+            except Exception as e:
+                logging.warning(f"LLM backend {backend.base} failed: {e}")
+                error = e
+        raise error or Exception(f"No LLM endpoint serves model {model}")
+
+    def _post(self, url: str, payload: Dict, deadline: Optional[Deadline] = None, **kwargs) -> requests.Response:
+        try:
+            response = self.session.post(
+                url,
+                json=payload,
+                headers={"Content-Type": "application/json"},
+                timeout=deadline.timeout(self.timeout) if deadline is not None else self.timeout,
+                **kwargs
+            )
+        except requests.Timeout as e:
+            # Cut short by the caller's deadline rather than by a slow host
+            if deadline is not None and deadline.expired():
+                raise DeadlineExceeded(f"Deadline exceeded waiting for {url}") from e
+            raise
+        response.raise_for_status()
+        return response
+
+    # ----------------------------------------------------------------------
+    def embed(self, text: str, model: Optional[str] = None, deadline: Optional[Deadline] = None) -> Optional[List[float]]:
+        """
+        Returns the embedding of a text from the `/api/embeddings` endpoint served
+        next to the generate endpoint, or None if it is unavailable or `deadline`
+        passes first.
+        """
+        model = model or self.default_model
+        payload = {"model": model, "prompt": text, "keep_alive": self.keep_alive}
+        try:
+            return self._route(
+                model,
+                lambda backend: self._post(backend.url("embeddings"), payload, deadline).json().get("embedding"),
+                False,
+                deadline
+            )
+        except Exception as e:
+            logging.warning(f"Embedding request failed: {e}")
+            return None
+
+    # ----------------------------------------------------------------------
+    def warm_up(self, model: Optional[str] = None) -> bool:
+        """
+        Loads a model into memory on every host serving it, without generating
+        anything, so the first real prompt does not pay the model load. The model
+        then stays resident for `keep_alive`.
+
+        Returns:
+            bool: Whether the model is loaded on every host.
+        """
+        model = model or self.default_model
+        payload = {"model": model, "prompt": "", "stream": False, "keep_alive": self.keep_alive}
+        loaded = True
+        for backend in self.router.backends:
+            if not backend.serves(model):
+                continue
+            try:
+                start_time = time.time()
+                with self.router.track(backend, measure=False):
+                    self._post(backend.url("generate"), payload)
+                logging.info(f"Model {model} warmed up on {backend.base} in {time.time() - start_time:.2f} seconds")
+            except Exception as e:
+                logging.warning(f"Warm-up of model {model} on {backend.base} failed: {e}")
+                loaded = False
+        return loaded
+
+    # ----------------------------------------------------------------------
+    def _cache_key(
+        self,
+        prompt: str,
+        model: Optional[str],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        context: Optional[List[int]] = None,
+        images: Optional[List[Blob]] = None
+    ) -> Optional[str]:
+        """Returns the response cache key, or None when the request must not be cached."""
+        if self.cache is None or context or images:
+            return None
+        payload = self._payload(prompt, model, temperature, max_tokens, False)
+        options = payload["options"]
+        if options["temperature"] > 0 and not self.cache_sampled:
+            return None
+        return ResponseCache.key(payload["model"], prompt, options["temperature"], options["num_predict"])
+
+    # ----------------------------------------------------------------------
+    def generate(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        stream: bool = False,
+        deadline: Optional[Deadline] = None,
+        context: Optional[List[int]] = None,
+        images: Optional[List[Blob]] = None
+    ) -> Optional[Dict]:
+        """
+        Generate text from the LLM. Identical requests are answered from the response
+        cache, concurrent identical requests share a single backend call, and the
+        remaining ones are micro-batched per model when a batcher is set.
+
+        Every wait is bounded by `deadline` (by default `timeout` from now); a
+        generation that cannot finish in time is abandoned and None is returned.
+        `context` continues the conversation it was returned with; such requests
+        bypass the response cache, as do requests with `images` (attachments sent
+        to vision models). The result carries the new `context`.
+        """
+        deadline = deadline or Deadline(self.timeout)
+
+        def backend() -> Optional[Dict]:
+            if self.batcher is None:
+                return self._generate(prompt, model, temperature, max_tokens, stream, deadline, context, images)
+            return self.batcher.submit(
+                model or self.default_model,
+                lambda: self._generate(prompt, model, temperature, max_tokens, stream, deadline, context, images),
+                deadline.remaining()
+            )
+
+        try:
+            key = self._cache_key(prompt, model, temperature, max_tokens, context, images)
+            if key is None:
+                return backend()
+
+            result = self.cache.get_or_generate(key, backend, deadline.remaining())
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug("Response cache stats: %s", self.cache.stats(), extra=logs.SAMPLED)
+            return result
+        except DeadlineExceeded as e:
+            logging.error(f"LLM request abandoned: {e}")
+            metrics.DEADLINE_EXCEEDED.labels("llm").inc()
+            return None
+
+    # ----------------------------------------------------------------------
+    def _generate(
+        self,
+        prompt: str,
+        model: Optional[str],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        stream: bool,
+        deadline: Deadline,
+        context: Optional[List[int]] = None,
+        images: Optional[List[Blob]] = None
+    ) -> Optional[Dict]:
+        if stream:
+            # Aggregate the incremental path so both modes return the same shape
+            result = None
+            for result in self._stream(prompt, model, temperature, max_tokens, deadline, context, images):
+                pass
+            return result if result is not None and result["done"] else None
+
+        # Log first 50 characters of the prompt
+        logging.info("Generating response for prompt: %s", logs.payload(prompt, 50), extra=logs.SAMPLED)
+
+        payload = self._payload(prompt, model, temperature, max_tokens, False, context, images)
+
+        def send(backend: Backend, cancelled: Optional[threading.Event] = None) -> Dict[str, Any]:
+            logging.info("Sending request to LLM API at %s", backend.base, extra=logs.SAMPLED)
+            if cancelled is not None:
+                return self._collect(backend, {**payload, "stream": True}, deadline, cancelled)
+            return self._post(backend.url("generate"), payload, deadline).json()
+
+        try:
+            start_time = time.time()
+            data = self._hedged(payload["model"], send, deadline)
+            generation_time = time.time() - start_time
+            logging.info("LLM API response received in %.2f seconds", generation_time, extra=logs.SAMPLED)
+            metrics.LLM_LATENCY.labels(payload["model"]).observe(generation_time)
+            metrics.record_generation(data, payload["model"])
+
+            return {
+                "response": data.get("response"),
+                "model": data.get("model"),
+                "generation_time": generation_time,
+                "context": data.get("context"),
+                **self._usage(data)
+            }
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logging.error(f"LLM request failed: {e}")
+            return None
+
+    def _hedged(self, model: str, call: Callable[..., T], deadline: Deadline) -> T:
+        """
+        Routes a call and, with hedging on, sends a duplicate to the next best host
+        when the first attempt is still running after the pool's p95 latency. The
+        first successful answer wins.
+
+        Both attempts of a hedge are called with a shared `threading.Event`, set once
+        the hedge is decided, so the losing one stops reading and closes its
+        connection instead of running on until its HTTP timeout.
+        """
+        delay = self.router.latency.p95() if self.hedging else None
+        if delay is None or (deadline.remaining() is not None and deadline.remaining() <= delay):
+            return self._route(model, call, deadline=deadline)
+
+        used: List[Backend] = []
+        cancelled = threading.Event()
+
+        def first(backend: Backend) -> T:
+            used.append(backend)
+            return call(backend, cancelled)
+
+        def second(backend: Backend) -> T:
+            return call(backend, cancelled)
+
+        try:
+            primary = _hedge_pool.submit(self._route, model, first, True, deadline)
+            done, _ = wait([primary], timeout=delay)
+            if done:
+                return primary.result()
+
+            logging.info(f"LLM call slower than p95 ({delay:.2f}s), sending a hedged request")
+            hedge = _hedge_pool.submit(self._route, model, second, True, deadline, list(used))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = wait(pending, timeout=deadline.remaining(), return_when=FIRST_COMPLETED)
+                if not done:
+                    raise DeadlineExceeded("Deadline exceeded waiting for a hedged LLM call")
+                for future in done:
+                    if future.exception() is None:
+                        metrics.HEDGES.labels("llm", "primary" if future is primary else "hedge").inc()
+                        return future.result()
+            return primary.result()
+        finally:
+            cancelled.set()
+
+    def _collect(self, backend: Backend, payload: Dict, deadline: Deadline, cancelled: threading.Event) -> Dict:
+        """
+        Runs a streaming generation and returns the final chunk with the whole
+        `response`, like a non-streaming call would. Reading stops, and the
+        connection is closed so the backend stops generating, once `cancelled` is set.
+
+        Raises:
+            CallCancelled: If `cancelled` was set before the generation finished.
+        """
+        parts = []
+        if cancelled.is_set():
+            raise CallCancelled(f"LLM call on {backend.base} no longer needed")
+        with self._post(backend.url("generate"), payload, deadline, stream=True) as response:
+            for line in response.iter_lines():
+                if cancelled.is_set():
+                    raise CallCancelled(f"LLM call on {backend.base} no longer needed")
+                deadline.check("LLM call")
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise Exception(data["error"])
+                parts.append(data.get("response", ""))
+                if data.get("done"):
+                    return {**data, "response": "".join(parts)}
+        raise Exception(f"LLM stream from {backend.base} ended before the generation was done")
+
+    # ----------------------------------------------------------------------
+    @staticmethod
+    def _usage(data: Dict) -> Dict:
+        """
+        Token usage as counted by the backend: `tokens_used` (generated tokens),
+        `prompt_tokens` and `tokens_per_second`. Counts are None when the backend
+        does not report them.
+        """
+        tokens = data.get("eval_count")
+        duration = data.get("eval_duration")
+        return {
+            "tokens_used": tokens,
+            "prompt_tokens": data.get("prompt_eval_count"),
+            "tokens_per_second": tokens / (duration / 1e9) if tokens and duration else None
+        }
+
+    # ----------------------------------------------------------------------
+    def generate_stream(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        deadline: Optional[Deadline] = None,
+        context: Optional[List[int]] = None,
+        images: Optional[List[Blob]] = None
+    ) -> Generator[Dict, None, None]:
+        """
+        Generate text from the LLM incrementally. Ollama answers a streaming request
+        with one JSON object per line; each is parsed as soon as it arrives. The
+        stream is cut off when `deadline` (by default `timeout` from now) passes.
+
+        Yields:
+            Dict: `delta` (the new text), `model`, `done` and `time_to_first_token`.
+            The final chunk also carries the full `response`, `generation_time` and
+            the token usage and `context`, matching the shape returned by `generate`.
+            A cached answer is replayed as a single final chunk.
+        """
+        key = self._cache_key(prompt, model, temperature, max_tokens, context, images)
+        cached = self.cache.get(key) if key is not None else None
+        if cached is not None:
+            logging.info("Streaming response served from cache")
+            yield {**cached, "delta": cached["response"], "done": True, "time_to_first_token": 0.0}
+            return
+
+        for chunk in self._stream(
+            prompt, model, temperature, max_tokens, deadline or Deadline(self.timeout), context, images
+        ):
+            if chunk["done"] and key is not None:
+                self.cache.put(key, {k: chunk[k] for k in ("response", "model", "generation_time", *USAGE_FIELDS)})
+            yield chunk
+
+    # ----------------------------------------------------------------------
+    def _stream(
+        self,
+        prompt: str,
+        model: Optional[str],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        deadline: Deadline,
+        context: Optional[List[int]] = None,
+        images: Optional[List[Blob]] = None
+    ) -> Generator[Dict, None, None]:
+        # Log first 50 characters of the prompt
+        logging.info("Streaming response for prompt: %s", logs.payload(prompt, 50), extra=logs.SAMPLED)
+
+        payload = self._payload(prompt, model, temperature, max_tokens, True, context, images)
+
+        for backend in self.router.candidates(payload["model"]):
+            started = False
+            try:
+                deadline.check("LLM stream")
+                with self.router.track(backend):
+                    for chunk in self._stream_from(backend, payload, deadline):
+                        started = True
+                        yield chunk
+                return
+            except DeadlineExceeded as e:
+                logging.error(f"LLM stream abandoned: {e}")
+                metrics.DEADLINE_EXCEEDED.labels("llm").inc()
+                return
+            except Exception as e:
+                if started:
+                    # Text was already delivered; a retry would repeat it
+                    logging.error(f"LLM stream failed: {e}")
+                    return
+                logging.warning(f"LLM backend {backend.base} failed before streaming: {e}")
+        logging.error("LLM stream failed: no endpoint could serve the request")
+
+    def _stream_from(self, backend: Backend, payload: Dict, deadline: Deadline) -> Generator[Dict, None, None]:
+        start_time = time.time()
+        time_to_first_token = None
+        parts = []
+        with self._post(backend.url("generate"), payload, deadline, stream=True) as response:
+            for line in response.iter_lines():
+                deadline.check("LLM stream")
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise Exception(data["error"])
+
+                delta = data.get("response", "")
+                if delta and time_to_first_token is None:
+                    time_to_first_token = time.time() - start_time
+                    logging.info("LLM first token received in %.2f seconds", time_to_first_token, extra=logs.SAMPLED)
+                    metrics.LLM_TTFT.labels(payload["model"]).observe(time_to_first_token)
+                parts.append(delta)
+
+                chunk = {
+                    "delta": delta,
+                    "model": data.get("model"),
+                    "done": bool(data.get("done")),
+                    "time_to_first_token": time_to_first_token
+                }
+                if chunk["done"]:
+                    chunk["response"] = "".join(parts)
+                    chunk["generation_time"] = time.time() - start_time
+                    chunk["context"] = data.get("context")
+                    chunk.update(self._usage(data))
+                    logging.info("LLM stream completed in %.2f seconds", chunk["generation_time"], extra=logs.SAMPLED)
+                    metrics.LLM_LATENCY.labels(payload["model"]).observe(chunk["generation_time"])
+                    metrics.record_generation(data, payload["model"])
+                yield chunk
+                if chunk["done"]:
+                    return
+
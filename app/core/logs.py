@@ -0,0 +1,195 @@
+import atexit
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+# "plain" keeps the handlers as configured; "structured" logs JSON lines through a queue
+LOG_MODE = os.getenv("LOG_MODE", "plain")
+
+# Characters of a payload written to the log before it is truncated
+PAYLOAD_LIMIT = int(os.getenv("LOG_PAYLOAD_LIMIT", 256))
+
+# Characters of a whole log message in structured mode
+MESSAGE_LIMIT = int(os.getenv("LOG_MESSAGE_LIMIT", 2048))
+
+# In structured mode, an INFO/DEBUG line logged with `extra=SAMPLED` is only
+# written once every LOG_SAMPLE_EVERY times per template (1 writes them all)
+SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", 10))
+
+# Marks a line as repetitive, e.g. `logging.info("...", x, extra=SAMPLED)`; only
+# marked lines are sampled, so request lifecycle lines always reach every handler
+SAMPLED = {"sample": True}
+
+# Records buffered for the writer thread; records beyond it are dropped, not waited on
+QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+
+# Templates tracked by the sampler before its counters are reset
+SAMPLER_TEMPLATES = 4096
+
+# Attributes every LogRecord has; anything else was passed with `extra=`
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "sample"}
+
+
+class Payload:
+    """
+    Payload wraps a value for logging as a `%s` argument. Nothing is rendered
+    unless the record is actually written; then dicts are summarized by their keys,
+    sequences by their length, and long text is cut to `limit` characters plus
+    its length and a short hash, so large prompts, schemas or resources never end
+    up in the log.
+    """
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value: Any, limit: int = PAYLOAD_LIMIT):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        value = self.value
+        if isinstance(value, dict):
+            return f"{{keys: {list(value)}}}"
+        if isinstance(value, (list, tuple)):
+            return f"[{type(value).__name__} of {len(value)}]"
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return f"<{len(value)} bytes>"
+        return clip(str(value), self.limit)
+
+    __repr__ = __str__
+
+
+def payload(value: Any, limit: int = PAYLOAD_LIMIT) -> Payload:
+    """Returns a lazily rendered, size-bounded view of `value` for log arguments."""
+    return Payload(value, limit)
+
+
+def clip(text: str, limit: int = PAYLOAD_LIMIT) -> str:
+    """Cuts `text` to `limit` characters, noting what was left out."""
+    if len(text) <= limit:
+        return text
+    digest = hashlib.sha1(text.encode("utf-8", "replace")).hexdigest()[:12]
+    return f"{text[:limit]}... (+{len(text) - limit} chars, sha1:{digest})"
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line: `ts`, `level`, `logger`,
+    `thread`, `msg` (bounded by MESSAGE_LIMIT), the fields passed with `extra=`
+    and `exc` when an exception is attached.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": clip(record.getMessage(), MESSAGE_LIMIT),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value if isinstance(value, (int, float, bool, type(None))) else str(Payload(value))
+        if record.exc_info:
+            entry["exc"] = clip(self.formatException(record.exc_info), MESSAGE_LIMIT)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets every record through except INFO/DEBUG records marked repetitive with
+    `extra=SAMPLED`: of those, only every `every`-th one sharing the same logger
+    and message template is written. Lines logged with `%s` arguments share
+    their template; the first occurrence is always written. Unmarked lines, such
+    as the start and end of each execution, are never dropped.
+    """
+
+    def __init__(self, every: int = SAMPLE_EVERY):
+        super().__init__()
+        self.every = max(1, every)
+        self._seen: Dict[Tuple[str, str], int] = {}
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.every == 1 or record.levelno >= logging.WARNING or not getattr(record, "sample", False):
+            return True
+        key = (record.name, str(record.msg))
+        # Races between threads only shift which occurrence is kept
+        count = self._seen.get(key, 0)
+        if len(self._seen) >= SAMPLER_TEMPLATES:
+            self._seen.clear()
+        self._seen[key] = count + 1
+        if count % self.every == 0:
+            return True
+        self.dropped += 1
+        return False
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the writer thread without formatting them and without ever
+    blocking the caller: when the queue is full the record is dropped and counted.
+    """
+
+    def __init__(self, records: queue.Queue):
+        super().__init__(records)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens on the writer thread; the queue never leaves the process
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_lock = threading.Lock()
+
+
+def install(mode: str = LOG_MODE) -> None:
+    """
+    Switches the root logger to structured mode: its current handlers (console,
+    the SDK's log publisher, ...) are moved behind a bounded queue drained by a
+    writer thread, format records as JSON lines, and INFO/DEBUG lines marked
+    with `extra=SAMPLED` are sampled. In plain mode nothing changes.
+
+    Args:
+        mode (str): "structured" or "plain".
+    """
+    global _listener
+    if mode != "structured":
+        return
+    with _lock:
+        if _listener is not None:
+            return
+        root = logging.getLogger()
+        handlers = list(root.handlers) or [logging.StreamHandler()]
+        formatter = StructuredFormatter()
+        for handler in handlers:
+            handler.setFormatter(formatter)
+            root.removeHandler(handler)
+
+        handler = QueueHandler(queue.Queue(QUEUE_SIZE))
+        handler.addFilter(SamplingFilter())
+        root.addHandler(handler)
+        _listener = logging.handlers.QueueListener(handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown)
+    logging.info("Structured logging enabled (payload limit %d, sampling 1/%d)", PAYLOAD_LIMIT, SAMPLE_EVERY)
+
+
+def shutdown() -> None:
+    """Writes out the queued records and stops the writer thread."""
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
@@ -0,0 +1,294 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from core.deadline import Deadline
+from core.logs import SAMPLED
+
+# Default location of the long-term memory
+MEMORY_PATH = f"{os.getcwd()}/memory"
+
+# Vectors are scanned newest-first in blocks of this many rows
+SCAN_BLOCK = 65536
+
+# Candidates fetched from the full-text index before merging with vector hits
+FTS_CANDIDATES = 50
+
+# Returns the embedding of a text, or None; called with a `deadline` keyword that bounds the call
+Embedder = Callable[..., Optional[List[float]]]
+
+
+class MemoryStore:
+    """
+    MemoryStore is the long-term memory of past generations. Each memory keeps the
+    user prompt, the expanded prompt, the model output and references to generated
+    assets in SQLite (WAL mode) with an FTS5 index over the text columns.
+
+    Embeddings are kept in a float16 NumPy file memory-mapped next to the database,
+    one row per memory. Recall merges full-text hits with a newest-first vector scan
+    of the user's rows that stops once the retrieval budget is spent, so latency
+    stays bounded however large the store grows. The embedding of the query is
+    fetched within the same budget.
+
+    Attributes:
+        embed (Optional[Embedder]): Returns an embedding for a text, or None. Used
+            when a call passes no embedder of its own; vector recall is disabled
+            when neither is set.
+        last_latency (float): Duration in seconds of the latest `recall`.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, path: str = MEMORY_PATH, embed: Optional[Embedder] = None):
+        """
+        Args:
+            path (str): Directory holding `memories.db` and `vectors.f16`.
+            embed (Optional[Embedder]): Returns an embedding for a text, or None.
+                Vector recall is disabled when omitted.
+        """
+        os.makedirs(path, exist_ok=True)
+        self.embed = embed
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-writer")
+        self._vectors_path = os.path.join(path, "vectors.f16")
+        self._vectors: Optional[np.memmap] = None
+        self.last_latency = 0.0
+
+        self._db = sqlite3.connect(os.path.join(path, "memories.db"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS memories (
+                id INTEGER PRIMARY KEY,
+                uid TEXT,
+                sid TEXT,
+                created_at REAL NOT NULL,
+                prompt TEXT NOT NULL,
+                expanded_prompt TEXT,
+                response TEXT,
+                assets TEXT,
+                vector_row INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS memories_uid ON memories (uid, created_at);
+            CREATE INDEX IF NOT EXISTS memories_vector_row ON memories (vector_row);
+            CREATE INDEX IF NOT EXISTS memories_uid_vector_row ON memories (uid, vector_row);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        try:
+            self._db.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5 "
+                "(prompt, expanded_prompt, response, content='memories', content_rowid='id')"
+            )
+            self._fts = True
+        except sqlite3.OperationalError:
+            logging.warning("SQLite FTS5 unavailable, full-text recall disabled")
+            self._fts = False
+        self._db.commit()
+
+        dim = self._meta("dim")
+        self._dim = int(dim) if dim else None
+
+    # ----------------------------------------------------------------------
+    def remember(
+        self,
+        prompt: str,
+        expanded_prompt: Optional[str] = None,
+        response: Optional[str] = None,
+        assets: Optional[Dict[str, Any]] = None,
+        uid: Optional[str] = None,
+        sid: Optional[str] = None,
+        embed: Optional[Embedder] = None
+    ) -> None:
+        """
+        Stores a generation in the background; the caller never waits for the
+        embedding call or the disk write. `embed` overrides the store's embedder.
+        """
+        self._writer.submit(self._remember, prompt, expanded_prompt, response, assets, uid, sid, embed)
+
+    def _remember(self, prompt, expanded_prompt, response, assets, uid, sid, embed=None):
+        try:
+            vector = self._vector(" ".join(filter(None, [prompt, expanded_prompt])), embed=embed)
+            with self._lock:
+                vector_row = self._append_vector(vector) if vector is not None else None
+                cursor = self._db.execute(
+                    "INSERT INTO memories (uid, sid, created_at, prompt, expanded_prompt, response, assets, vector_row) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (uid, sid, time.time(), prompt, expanded_prompt, response, json.dumps(assets or {}), vector_row)
+                )
+                if self._fts:
+                    self._db.execute(
+                        "INSERT INTO memories_fts (rowid, prompt, expanded_prompt, response) VALUES (?, ?, ?, ?)",
+                        (cursor.lastrowid, prompt, expanded_prompt, response)
+                    )
+                self._db.commit()
+        except Exception as e:
+            logging.error(f"Failed to store memory: {e}")
+
+    # ----------------------------------------------------------------------
+    def recall(
+        self,
+        query: str,
+        uid: Optional[str] = None,
+        k: int = 3,
+        budget: float = 0.05,
+        embed: Optional[Embedder] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns the memories most relevant to `query`.
+
+        Args:
+            query (str): The text to match, usually the new user prompt.
+            uid (Optional[str]): Restrict recall to this user's memories.
+            k (int): Maximum number of memories returned.
+            budget (float): Soft time budget in seconds for embedding the query and
+                the vector scan.
+            embed (Optional[Embedder]): Embedder of the caller, overriding the store's.
+
+        Returns:
+            List[Dict[str, Any]]: Memories ordered by relevance, each with `id`,
+            `created_at`, `prompt`, `expanded_prompt`, `response`, `assets` and `score`.
+        """
+        start = time.time()
+        scores: Dict[int, float] = {}
+
+        for rank, memory_id in enumerate(self._search_text(query, uid)):
+            scores[memory_id] = scores.get(memory_id, 0.0) + 1.0 / (rank + 1)
+
+        deadline = start + budget
+        remaining = deadline - time.time()
+        vector = self._vector(query, Deadline(remaining), embed) if remaining > 0 else None
+        if vector is not None:
+            for rank, memory_id in enumerate(self._search_vector(vector, uid, FTS_CANDIDATES, deadline)):
+                scores[memory_id] = scores.get(memory_id, 0.0) + 1.0 / (rank + 1)
+
+        best = sorted(scores, key=scores.get, reverse=True)[:k]
+        memories = self._load(best, scores)
+        self.last_latency = time.time() - start
+        logging.info("Recalled %d memories in %.1f ms", len(memories), self.last_latency * 1000, extra=SAMPLED)
+        return memories
+
+    # ----------------------------------------------------------------------
+    def _search_text(self, query: str, uid: Optional[str]) -> List[int]:
+        terms = re.findall(r"\w+", query.lower())
+        if not terms:
+            return []
+        with self._lock:
+            if self._fts:
+                match = " OR ".join(f'"{term}"' for term in terms)
+                sql = ("SELECT m.id FROM memories_fts f JOIN memories m ON m.id = f.rowid "
+                       "WHERE memories_fts MATCH ?" + (" AND m.uid = ?" if uid else "") +
+                       " ORDER BY bm25(memories_fts) LIMIT ?")
+                args = [match] + ([uid] if uid else []) + [FTS_CANDIDATES]
+            else:
+                sql = ("SELECT id FROM memories WHERE prompt LIKE ?" + (" AND uid = ?" if uid else "") +
+                       " ORDER BY created_at DESC LIMIT ?")
+                args = [f"%{terms[0]}%"] + ([uid] if uid else []) + [FTS_CANDIDATES]
+            return [row[0] for row in self._db.execute(sql, args)]
+
+    def _search_vector(self, vector: np.ndarray, uid: Optional[str], k: int, deadline: float) -> List[int]:
+        with self._lock:
+            vectors = self._vectors_view()
+            if vectors is None or len(vectors) == 0:
+                return []
+            # With a uid only that user's rows are scanned, so other users' memories
+            # cannot crowd them out of the top k
+            user_rows = self._user_rows(uid, len(vectors)) if uid else None
+
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        end = len(vectors) if user_rows is None else len(user_rows)
+        while end > 0 and (best_rows.size == 0 or time.time() < deadline):
+            begin = max(0, end - SCAN_BLOCK)
+            if user_rows is None:
+                rows, block = np.arange(begin, end), vectors[begin:end]
+            else:
+                rows = user_rows[begin:end]
+                block = vectors[rows]
+            block_scores = block.astype(np.float32) @ vector
+            best_rows = np.concatenate([best_rows, rows])
+            best_scores = np.concatenate([best_scores, block_scores])
+            if best_rows.size > k:
+                keep = np.argpartition(-best_scores, k)[:k]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+            end = begin
+
+        order = np.argsort(-best_scores)
+        rows = [int(row) for row in best_rows[order]]
+        if not rows:
+            return []
+        with self._lock:
+            placeholders = ",".join("?" * len(rows))
+            sql = f"SELECT vector_row, id FROM memories WHERE vector_row IN ({placeholders})"
+            ids = dict(self._db.execute(sql, rows).fetchall())
+        return [ids[row] for row in rows if row in ids]
+
+    def _user_rows(self, uid: str, limit: int) -> np.ndarray:
+        """Vector rows of a user's memories in ascending (oldest-first) order, below `limit`."""
+        cursor = self._db.execute(
+            "SELECT vector_row FROM memories WHERE uid = ? AND vector_row IS NOT NULL AND vector_row < ? "
+            "ORDER BY vector_row",
+            (uid, limit)
+        )
+        return np.fromiter((row[0] for row in cursor), dtype=np.int64)
+
+    def _load(self, ids: List[int], scores: Dict[int, float]) -> List[Dict[str, Any]]:
+        if not ids:
+            return []
+        with self._lock:
+            placeholders = ",".join("?" * len(ids))
+            rows = self._db.execute(
+                f"SELECT id, created_at, prompt, expanded_prompt, response, assets FROM memories WHERE id IN ({placeholders})",
+                ids
+            ).fetchall()
+        memories = {
+            row[0]: {
+                "id": row[0], "created_at": row[1], "prompt": row[2], "expanded_prompt": row[3],
+                "response": row[4], "assets": json.loads(row[5] or "{}"), "score": scores[row[0]]
+            } for row in rows
+        }
+        return [memories[i] for i in ids if i in memories]
+
+    # ----------------------------------------------------------------------
+    def _vector(
+        self, text: str, deadline: Optional[Deadline] = None, embed: Optional[Embedder] = None
+    ) -> Optional[np.ndarray]:
+        embed = embed or self.embed
+        if embed is None or not text:
+            return None
+        embedding = embed(text, deadline=deadline)
+        if not embedding:
+            return None
+        vector = np.asarray(embedding, dtype=np.float32)
+        if self._dim is not None and vector.shape[0] != self._dim:
+            logging.warning(f"Embedding dimension {vector.shape[0]} does not match memory index ({self._dim})")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _append_vector(self, vector: np.ndarray) -> int:
+        if self._dim is None:
+            self._dim = int(vector.shape[0])
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dim', ?)", (str(self._dim),))
+        with open(self._vectors_path, "ab") as f:
+            row = f.tell() // (self._dim * 2)
+            f.write(vector.astype(np.float16).tobytes())
+        self._vectors = None
+        return row
+
+    def _vectors_view(self) -> Optional[np.memmap]:
+        if self._vectors is None and self._dim and os.path.exists(self._vectors_path):
+            rows = os.path.getsize(self._vectors_path) // (self._dim * 2)
+            if rows:
+                self._vectors = np.memmap(self._vectors_path, dtype=np.float16, mode="r", shape=(rows, self._dim))
+        return self._vectors
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
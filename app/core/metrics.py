@@ -0,0 +1,139 @@
+import logging
+import os
+from typing import Any
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+    from prometheus_client import multiprocess
+except ImportError:  # prometheus-client is optional; metrics become no-ops without it
+    CONTENT_TYPE_LATEST = "text/plain; charset=utf-8"
+    generate_latest = None
+
+    class _Noop:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def labels(self, *args, **kwargs) -> "_Noop":
+            return self
+
+        def observe(self, *args, **kwargs):
+            pass
+
+        def inc(self, *args, **kwargs):
+            pass
+
+        def dec(self, *args, **kwargs):
+            pass
+
+        def set(self, *args, **kwargs):
+            pass
+
+    Counter = Gauge = Histogram = _Noop
+
+# Directory where every process of the app (front-end, SDK worker subprocess,
+# worker.py processes) writes its metrics, so /metrics reports them all. Must be
+# set in the environment before the processes start, and emptied between runs
+MULTIPROCESS_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Buckets (seconds) for request-scale latencies, from cache hits to slow 3D generations
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Buckets (seconds) for disk operations
+DISK_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+# Buckets for generation speed
+TOKEN_RATE_BUCKETS = (1, 5, 10, 20, 30, 50, 75, 100, 150, 250, 500)
+
+# Buckets (bytes) for downloaded resources
+SIZE_BUCKETS = (1 << 10, 16 << 10, 128 << 10, 512 << 10, 1 << 20, 4 << 20, 16 << 20, 64 << 20, 256 << 20)
+
+QUEUE_WAIT = Histogram(
+    "engine_queue_wait_seconds", "Time a ray waited in the engine queue before execution", buckets=LATENCY_BUCKETS
+)
+EXECUTION = Histogram(
+    "engine_execution_seconds", "Time spent executing a ray", buckets=LATENCY_BUCKETS
+)
+PIPELINE_STAGE = Histogram(
+    "pipeline_stage_seconds", "Latency of a pipeline stage", ["stage"], buckets=LATENCY_BUCKETS
+)
+LLM_LATENCY = Histogram(
+    "llm_generation_seconds", "Latency of an LLM generation served by the backend", ["model"], buckets=LATENCY_BUCKETS
+)
+LLM_TTFT = Histogram(
+    "llm_time_to_first_token_seconds", "Time to the first streamed token", ["model"], buckets=LATENCY_BUCKETS
+)
+LLM_TOKEN_RATE = Histogram(
+    "llm_tokens_per_second", "Generation speed reported by the backend (eval_count / eval_duration)", ["model"],
+    buckets=TOKEN_RATE_BUCKETS
+)
+LLM_TOKENS = Counter(
+    "llm_tokens", "Tokens processed by the backend", ["model", "kind"]
+)
+LLM_BACKEND_UP = Gauge(
+    "llm_backend_up", "Whether an LLM backend receives traffic (0 while ejected)", ["endpoint"],
+    multiprocess_mode="livemin"
+)
+LLM_BACKEND_IN_FLIGHT = Gauge(
+    "llm_backend_in_flight", "Calls running on an LLM backend", ["endpoint"], multiprocess_mode="livesum"
+)
+HEDGES = Counter(
+    "hedged_calls", "Calls answered by a hedged duplicate race, by the attempt that won", ["target", "winner"]
+)
+DEADLINE_EXCEEDED = Counter(
+    "deadline_exceeded", "Requests or stages abandoned because their deadline passed", ["stage"]
+)
+STUB_CALL = Histogram(
+    "openfabric_call_seconds", "Latency of a call to an Openfabric app", ["app"], buckets=LATENCY_BUCKETS
+)
+RESOURCE_BYTES = Histogram(
+    "resource_download_bytes", "Size of downloaded Openfabric resources", buckets=SIZE_BUCKETS
+)
+STORE_FLUSH = Histogram(
+    "store_flush_seconds", "Time to flush a store to disk", buckets=DISK_BUCKETS
+)
+STARTUP = Gauge(
+    "startup_seconds", "Seconds from process start to each startup milestone", ["phase"], multiprocess_mode="max"
+)
+
+
+def record_generation(data: dict, model: str) -> None:
+    """
+    Records the token counts and speed Ollama reports with a finished generation
+    (`prompt_eval_count`, `eval_count` and `eval_duration` in nanoseconds).
+    """
+    completion = data.get("eval_count")
+    prompt = data.get("prompt_eval_count")
+    if prompt:
+        LLM_TOKENS.labels(model, "prompt").inc(prompt)
+    if completion:
+        LLM_TOKENS.labels(model, "completion").inc(completion)
+        if data.get("eval_duration"):
+            LLM_TOKEN_RATE.labels(model).observe(completion / (data["eval_duration"] / 1e9))
+
+
+def process_exited(pid: int) -> None:
+    """Drops the live gauges of a worker process that exited, in multiprocess mode."""
+    if MULTIPROCESS_DIR and generate_latest is not None:
+        multiprocess.mark_process_dead(pid, MULTIPROCESS_DIR)
+
+
+def install(webserver: Any) -> None:
+    """
+    Serves the metrics in the Prometheus text format at `/metrics` on the SDK's
+    Flask web server. With PROMETHEUS_MULTIPROC_DIR set, the metrics of every
+    process writing to that directory are aggregated, so executions that run
+    outside the web server process are reported too.
+    """
+    if generate_latest is None:
+        logging.warning("prometheus-client is not installed, /metrics is disabled")
+        return
+
+    def metrics():
+        if MULTIPROCESS_DIR:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry, MULTIPROCESS_DIR)
+            return generate_latest(registry), 200, {"Content-Type": CONTENT_TYPE_LATEST}
+        return generate_latest(), 200, {"Content-Type": CONTENT_TYPE_LATEST}
+
+    webserver.add_url_rule("/metrics", "metrics", metrics)
+    logging.info(f"Metrics exported at /metrics{' for every process' if MULTIPROCESS_DIR else ''}")
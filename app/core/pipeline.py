@@ -0,0 +1,301 @@
+import asyncio
+import base64
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from core.blob_store import Blob
+from core.deadline import Deadline, DeadlineExceeded
+from core.llm import LLMClient
+from core.logs import SAMPLED
+from core.metrics import DEADLINE_EXCEEDED, PIPELINE_STAGE
+from core.stub import Stub
+
+# Instruction used to turn a user idea into an image-generation prompt
+EXPANSION_TEMPLATE = (
+    "Rewrite the following idea as a single vivid, detailed visual description for a "
+    "text-to-image model. Describe subject, setting, lighting and style. "
+    "Answer with the description only.\n\n{memories}{history}Idea: {prompt}"
+)
+
+# Prompt used when no text-to-image app is configured: the user prompt is answered as it is
+ANSWER_TEMPLATE = "{memories}{history}{prompt}"
+
+# Section listing recalled memories, inserted before the idea
+MEMORIES_TEMPLATE = "Earlier creations of this user that may be referenced:\n{items}\n\n"
+
+
+class Pipeline:
+    """
+    Pipeline chains prompt expansion, text-to-image and image-to-3D as asyncio stages.
+    Without a text-to-image app there is nothing to expand for, so the LLM stage
+    answers the user prompt instead (with the same memories and history).
+
+    Every stage is guarded by its own semaphore, so each Openfabric app (and the LLM)
+    sees at most `concurrency` requests at a time while different requests occupy
+    different stages: request B can be expanded while request A is in image-to-3D.
+    All pipelines share one event loop running in a background thread, which lets
+    synchronous callers such as `execute` submit work with `run`.
+
+    A request carries one `Deadline` through all stages: each stage gets the time
+    that is left, and once it runs out the current stage is cancelled (which
+    cancels its remote execution) and the remaining stages are skipped.
+
+    Attributes:
+        llm (LLMClient): Client used for prompt expansion.
+        stub (Stub): Stub used to call the Openfabric apps.
+        text_to_image (Optional[str]): App ID of the text-to-image app.
+        image_to_3d (Optional[str]): App ID of the image-to-3D app.
+        hedging (bool): Whether slow Openfabric calls are hedged with a duplicate.
+    """
+
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    _loop_lock = threading.Lock()
+
+    # ----------------------------------------------------------------------
+    def __init__(
+        self, llm: LLMClient, stub: Stub, app_ids: Optional[List[str]], concurrency: int = 4, hedging: bool = False
+    ):
+        """
+        Args:
+            llm (LLMClient): Client used for prompt expansion.
+            stub (Stub): Stub holding connections to the Openfabric apps.
+            app_ids (Optional[List[str]]): Text-to-image and image-to-3D app IDs, in that order.
+            concurrency (int): Maximum in-flight requests per stage.
+            hedging (bool): Whether to hedge Openfabric calls slower than their p95.
+        """
+        app_ids = app_ids or []
+        self.llm = llm
+        self.stub = stub
+        self.text_to_image = app_ids[0] if len(app_ids) > 0 else None
+        self.image_to_3d = app_ids[1] if len(app_ids) > 1 else None
+        self.hedging = hedging
+        self._concurrency = concurrency
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+
+    # ----------------------------------------------------------------------
+    @classmethod
+    def loop(cls) -> asyncio.AbstractEventLoop:
+        """Returns the shared pipeline event loop, starting it on first use."""
+        with cls._loop_lock:
+            if cls._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="pipeline-loop", daemon=True).start()
+                cls._loop = loop
+        return cls._loop
+
+    # ----------------------------------------------------------------------
+    def run(
+        self,
+        prompt: str,
+        uid: str = 'super-user',
+        llm_response: Optional[Dict] = None,
+        deadline: Optional[Deadline] = None,
+        **options
+    ) -> Dict[str, Any]:
+        """
+        Runs the pipeline for one prompt from synchronous code.
+
+        Args:
+            prompt (str): The user prompt.
+            uid (str): The user identifier forwarded to the Openfabric apps.
+            llm_response (Optional[Dict]): An expansion already produced by the caller
+                (e.g. streamed); the expansion stage is skipped when given.
+            deadline (Optional[Deadline]): When the whole request must be done.
+            **options: Generation options forwarded to `LLMClient.generate` (including
+                a session's `context`), plus `memories` and the session `history` to
+                inject into the expansion prompt.
+
+        Returns:
+            Dict[str, Any]: See `process`.
+        """
+        coroutine = self.process(prompt, uid, llm_response, deadline, **options)
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop()).result()
+
+    # ----------------------------------------------------------------------
+    async def process(
+        self,
+        prompt: str,
+        uid: str = 'super-user',
+        llm_response: Optional[Dict] = None,
+        deadline: Optional[Deadline] = None,
+        **options
+    ) -> Dict[str, Any]:
+        """
+        Runs prompt expansion, text-to-image and image-to-3D for one prompt. Stages
+        whose app is not configured, or whose input is missing, are skipped, as are
+        the stages left when the deadline passes. Without a text-to-image app the
+        LLM stage ("generation") answers the prompt and nothing is expanded.
+
+        Returns:
+            Dict[str, Any]: `llm` (the generation result), `expanded_prompt` (None
+            without a text-to-image app), `image` and `model_3d` (`Blob` handles when
+            the apps return resources), `timings` (seconds per stage) and `errors`
+            (per failed stage).
+        """
+        result: Dict[str, Any] = {"timings": {}, "errors": {}}
+        deadline = deadline or Deadline()
+
+        if llm_response is None:
+            stage = "expansion" if self.text_to_image else "generation"
+            llm_response = await self._stage(result, deadline, stage, self._generate, prompt, options, deadline)
+        result["llm"] = llm_response
+        expanded = llm_response["response"] if llm_response and self.text_to_image else None
+        result["expanded_prompt"] = expanded
+
+        image = None
+        if self.text_to_image:
+            image = await self._stage(
+                result, deadline, "text_to_image", self._call, self.text_to_image, expanded or prompt, uid, deadline
+            )
+        result["image"] = image
+
+        model_3d = None
+        if self.image_to_3d and image is not None:
+            model_3d = await self._stage(
+                result, deadline, "image_to_3d", self._call, self.image_to_3d, image, uid, deadline
+            )
+        result["model_3d"] = model_3d
+
+        return result
+
+    # ----------------------------------------------------------------------
+    def run_batch(
+        self,
+        items: List[Dict[str, Any]],
+        uid: str = 'super-user',
+        parallelism: int = 8,
+        timeout: Optional[float] = None,
+        on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Runs the pipeline for many prompts from synchronous code. See `process_batch`.
+        """
+        coroutine = self.process_batch(items, uid, parallelism, timeout, on_result)
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop()).result()
+
+    async def process_batch(
+        self,
+        items: List[Dict[str, Any]],
+        uid: str = 'super-user',
+        parallelism: int = 8,
+        timeout: Optional[float] = None,
+        on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Runs `process` for every item, at most `parallelism` items at a time. The
+        stage semaphores still bound what each app sees, so items overlap across
+        stages the same way separate requests do.
+
+        Args:
+            items (List[Dict[str, Any]]): One dict per item with its `prompt` and
+                generation options forwarded to `LLMClient.generate`.
+            uid (str): The user identifier forwarded to the Openfabric apps.
+            parallelism (int): Maximum items in flight.
+            timeout (Optional[float]): Seconds each item may take, from when it starts.
+            on_result (Optional[Callable[[int, Dict[str, Any]], None]]): Called on the
+                pipeline loop with the index and result of every finished item.
+
+        Returns:
+            List[Dict[str, Any]]: The result of every item, in order (see `process`).
+        """
+        limit = asyncio.Semaphore(max(1, parallelism))
+
+        async def one(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+            options = dict(item)
+            prompt = options.pop("prompt")
+            async with limit:
+                try:
+                    result = await self.process(prompt, uid, None, Deadline(timeout), **options)
+                except Exception as e:
+                    logging.error(f"Batch item {index} failed: {e}")
+                    result = {"llm": None, "expanded_prompt": None, "timings": {}, "errors": {"pipeline": str(e)}}
+            if on_result is not None:
+                on_result(index, result)
+            return result
+
+        return list(await asyncio.gather(*(one(index, item) for index, item in enumerate(items))))
+
+    # ----------------------------------------------------------------------
+    async def _stage(self, result: Dict[str, Any], deadline: Deadline, name: str, fn, *args) -> Any:
+        if deadline.expired():
+            logging.warning(f"Pipeline stage {name} skipped: deadline exceeded")
+            result["errors"][name] = "deadline exceeded"
+            DEADLINE_EXCEEDED.labels(name).inc()
+            return None
+        async with self._limit(name):
+            start = time.time()
+            try:
+                return await asyncio.wait_for(fn(*args), deadline.remaining())
+            except (asyncio.TimeoutError, DeadlineExceeded):
+                logging.warning(f"Pipeline stage {name} cancelled: deadline exceeded")
+                result["errors"][name] = "deadline exceeded"
+                DEADLINE_EXCEEDED.labels(name).inc()
+                return None
+            except Exception as e:
+                logging.warning(f"Pipeline stage {name} failed: {e}")
+                result["errors"][name] = str(e)
+                return None
+            finally:
+                result["timings"][name] = time.time() - start
+                PIPELINE_STAGE.labels(name).observe(result["timings"][name])
+                logging.info("Pipeline stage %s finished in %.2f seconds", name, result["timings"][name], extra=SAMPLED)
+
+    def _limit(self, name: str) -> asyncio.Semaphore:
+        if name not in self._limits:
+            self._limits[name] = asyncio.Semaphore(self._concurrency)
+        return self._limits[name]
+
+    # ----------------------------------------------------------------------
+    async def _generate(self, prompt: str, options: Dict[str, Any], deadline: Deadline) -> Optional[Dict]:
+        loop = asyncio.get_running_loop()
+        memories = options.pop("memories", None)
+        history = options.pop("history", "")
+        return await loop.run_in_executor(
+            None,
+            lambda: self.llm.generate(self.llm_prompt(prompt, memories, history), deadline=deadline, **options)
+        )
+
+    def llm_prompt(self, prompt: str, memories: Optional[List[Dict[str, Any]]] = None, history: str = "") -> str:
+        """
+        Returns the LLM prompt for a user prompt, with recalled memories and the
+        session history (see `SessionMemory.begin`): the instruction to expand it
+        into an image description when a text-to-image app is configured, and the
+        prompt itself otherwise.
+        """
+        items = "\n".join(
+            f"- {memory['prompt']}: {memory.get('expanded_prompt') or memory.get('response') or ''}"
+            for memory in memories or []
+        )
+        template = EXPANSION_TEMPLATE if self.text_to_image else ANSWER_TEMPLATE
+        return template.format(
+            prompt=prompt, memories=MEMORIES_TEMPLATE.format(items=items) if items else "", history=history
+        )
+
+    async def _call(self, app_id: str, value: Any, uid: str, deadline: Deadline) -> Any:
+        field = await asyncio.get_running_loop().run_in_executor(None, self._input_field, app_id)
+        data = {field: self._encode(value)}
+        output = await self.stub.call_async(app_id, data, uid, deadline, self.hedging)
+        return output.get("result") if isinstance(output, dict) else output
+
+    # ----------------------------------------------------------------------
+    def _input_field(self, app_id: str) -> str:
+        """Picks the input field of an app from its schema, defaulting to `prompt`."""
+        try:
+            properties = list(self.stub.schema(app_id, 'input').get("properties", {}))
+        except ValueError:
+            properties = []
+        return properties[0] if properties else "prompt"
+
+    @staticmethod
+    def _encode(value: Any) -> Any:
+        if isinstance(value, Blob):
+            # Stub calls carry their input as JSON, so the downstream app gets the asset
+            # as one base64 string (about 4/3 of its size) per call. It is encoded from
+            # the memory map, so no bytes copy of the content is made on the way
+            with value.view() as view:
+                return base64.b64encode(view).decode("ascii")
+        if isinstance(value, (bytes, bytearray)):
+            return base64.b64encode(value).decode("ascii")
+        return value
@@ -0,0 +1,199 @@
+import functools
+import logging
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.batcher import GenerationBatcher
+from core.llm import LLMClient
+from core.pipeline import Pipeline
+from core.response_cache import ResponseCache
+from core.router import EndpointRouter
+from core.stub import Stub
+from ontology_dc8f06af066e4a7880a5938933236037.config import ConfigClass
+
+if TYPE_CHECKING:
+    # numpy is only imported once a configuration enables memory
+    from core.memory import Embedder, MemoryStore
+
+# Size of the keep-alive connection pool kept per LLM endpoint
+POOL_SIZE = 16
+
+
+@dataclass(frozen=True)
+class Clients:
+    """The long-lived clients serving a single user configuration."""
+    config: ConfigClass
+    llm: LLMClient
+    stub: Stub
+    pipeline: Pipeline
+    memory: Optional["MemoryStore"]
+    # Embeds with this user's endpoints and embedding model; passed to every memory call
+    embed: Optional["Embedder"] = None
+
+
+class ClientRegistry:
+    """
+    ClientRegistry owns the process-wide LLM and Stub clients. It keeps one pooled
+    `requests.Session`, `EndpointRouter` and `GenerationBatcher` per LLM endpoint pool,
+    so in-flight counts and health are shared by every user of a host, one `Stub` per set of
+    app IDs and one `ResponseCache` per cache TTL/size, plus the process-wide
+    `MemoryStore`, and hands out an immutable per-user snapshot so `execute` never
+    builds clients itself.
+
+    The snapshot is rebuilt by `configure` and swapped in with a single reference
+    assignment, so concurrent readers always see either the old or the new set.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: Dict[Tuple, requests.Session] = {}
+        self._routers: Dict[Tuple, EndpointRouter] = {}
+        self._batchers: Dict[Tuple[Tuple, float, int], GenerationBatcher] = {}
+        self._stubs: Dict[Tuple[str, ...], Stub] = {}
+        self._caches: Dict[Tuple[float, int], ResponseCache] = {}
+        self._memory: Optional["MemoryStore"] = None
+        self._clients: Dict[str, Clients] = {}
+
+    # ----------------------------------------------------------------------
+    def configure(self, configuration: Dict[str, ConfigClass]) -> None:
+        """
+        Builds clients for every user configuration and swaps them in atomically.
+        Sessions, stubs and response caches are reused when an endpoint, app-ID set
+        or cache setting did not change, and dropped (closed where they own
+        connections or threads) once no configuration references them any more.
+
+        Args:
+            configuration (Dict[str, ConfigClass]): User configurations keyed by UID.
+        """
+        with self._lock:
+            sessions: Dict[Tuple, requests.Session] = {}
+            routers: Dict[Tuple, EndpointRouter] = {}
+            batchers: Dict[Tuple[Tuple, float, int], GenerationBatcher] = {}
+            stubs: Dict[Tuple[str, ...], Stub] = {}
+            caches: Dict[Tuple[float, int], ResponseCache] = {}
+            clients: Dict[str, Clients] = {}
+
+            for uid, conf in configuration.items():
+                endpoints = conf.llm_endpoints or [conf.llm_endpoint]
+                endpoint = (EndpointRouter.key(endpoints), conf.llm_health_interval)
+                if endpoint not in sessions:
+                    sessions[endpoint] = self._sessions.get(endpoint) or self._session()
+                    routers[endpoint] = self._routers.get(endpoint) or EndpointRouter(
+                        endpoints, sessions[endpoint], conf.llm_health_interval
+                    )
+
+                key = tuple(sorted(conf.app_ids or []))
+                if key not in stubs:
+                    stubs[key] = self._stubs.get(key) or Stub(list(key))
+
+                cache = None
+                if conf.response_cache:
+                    cache_key = (conf.response_cache_ttl, conf.response_cache_size)
+                    if cache_key not in caches:
+                        caches[cache_key] = self._caches.get(cache_key) or ResponseCache(
+                            ttl=cache_key[0], size=cache_key[1]
+                        )
+                    cache = caches[cache_key]
+
+                batcher = None
+                if conf.batch_window_ms > 0:
+                    batcher_key = (endpoint, conf.batch_window_ms, conf.llm_parallelism)
+                    if batcher_key not in batchers:
+                        batchers[batcher_key] = self._batchers.get(batcher_key) or GenerationBatcher(
+                            conf.batch_window_ms / 1000, conf.llm_parallelism
+                        )
+                    batcher = batchers[batcher_key]
+
+                llm = LLMClient(conf, sessions[endpoint], cache, batcher, routers[endpoint])
+                pipeline = Pipeline(llm, stubs[key], conf.app_ids, conf.pipeline_concurrency, conf.hedging)
+                memory, embed = None, None
+                if conf.memory:
+                    if self._memory is None:
+                        from core.memory import MemoryStore
+                        self._memory = MemoryStore()
+                    # The store is shared, so the user's embedder goes with each call instead
+                    memory, embed = self._memory, functools.partial(llm.embed, model=conf.embedding_model)
+
+                clients[uid] = Clients(conf, llm, stubs[key], pipeline, memory, embed)
+                logging.info(f"Clients ready for user: {uid}")
+
+            stale_sessions = [s for e, s in self._sessions.items() if e not in sessions]
+            stale_routers = [r for e, r in self._routers.items() if e not in routers]
+            stale_stubs = [s for k, s in self._stubs.items() if k not in stubs]
+            stale_batchers = [b for k, b in self._batchers.items() if k not in batchers]
+            self._sessions, self._routers, self._batchers, self._stubs = sessions, routers, batchers, stubs
+            self._caches = caches
+            self._clients = clients
+
+        for router in stale_routers:
+            router.close()
+        for session in stale_sessions:
+            session.close()
+        for stub in stale_stubs:
+            stub.close()
+        for batcher in stale_batchers:
+            batcher.close()
+
+    # ----------------------------------------------------------------------
+    def warm_up(self) -> None:
+        """
+        Preloads every model used by a configuration that enables `warm_up`, once
+        per endpoint and model, in background threads so the config callback does
+        not wait for the loads.
+        """
+        models: Dict[Tuple[str, str], Callable[[], object]] = {}
+        for clients in self._clients.values():
+            conf = clients.config
+            if not conf.warm_up:
+                continue
+            endpoint = EndpointRouter.key(conf.llm_endpoints or [conf.llm_endpoint])
+            models.setdefault((endpoint, conf.default_model), clients.llm.warm_up)
+            if conf.memory:
+                models.setdefault(
+                    (endpoint, conf.embedding_model),
+                    functools.partial(clients.llm.embed, "", model=conf.embedding_model)
+                )
+        for (endpoint, model), load in models.items():
+            logging.info(f"Warming up model {model} at {[url for url, _ in endpoint]}")
+            threading.Thread(target=load, name=f"warm-up-{model}", daemon=True).start()
+
+    # ----------------------------------------------------------------------
+    def get(self, uid: str, default: Optional[ConfigClass] = None) -> Clients:
+        """
+        Returns the clients configured for a user, building a fallback set from
+        `default` (or `ConfigClass()`) when the user is unknown.
+
+        Args:
+            uid (str): The user identifier.
+            default (Optional[ConfigClass]): Configuration to fall back to.
+
+        Returns:
+            Clients: The LLM client, Stub, Pipeline and memory for the user.
+        """
+        clients = self._clients.get(uid)
+        if clients is None:
+            self.configure({**self.configurations(), uid: default or ConfigClass()})
+            clients = self._clients[uid]
+        return clients
+
+    # ----------------------------------------------------------------------
+    def configurations(self) -> Dict[str, ConfigClass]:
+        """Returns the configurations currently served, keyed by UID."""
+        return {uid: clients.config for uid, clients in self._clients.items()}
+
+    # ----------------------------------------------------------------------
+    @staticmethod
+    def _session() -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+
+registry = ClientRegistry()
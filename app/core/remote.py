@@ -1,56 +1,175 @@
+import asyncio
 import json
 import logging
-from typing import Optional, Union, Dict, Any, Generator
+import threading
+import time
+from typing import Optional, Union, Dict, Any, Generator, List, Tuple
 
 from openfabric_pysdk.helper import Proxy
 from openfabric_pysdk.helper.proxy import ExecutionResult
 
-# Setting up the logger
-logging.basicConfig(level=logging.DEBUG)
+from core.deadline import DeadlineExceeded
+
+# Setting up the logger; handlers and levels are left to the application
 logger = logging.getLogger(__name__)
 
+# Statuses after which an execution will not change any more
+TERMINAL_STATUSES = ("completed", "failed", "cancelled", "canceled", "removed")
+
+# Safety net: how often a waiter re-checks the status in case the proxy finished
+# an execution without an event (e.g. its state checker cancelled it)
+RECHECK_INTERVAL = 5.0
+
+
+class Completion:
+    """
+    Completion tracks one in-flight execution and wakes its waiters when the proxy
+    reports progress or a response. Waiting costs no polling: synchronous waiters
+    block on a condition variable, asynchronous ones on a future resolved from the
+    socket.io callback thread.
+    """
+
+    def __init__(self, output: ExecutionResult):
+        self.output = output
+        self._condition = threading.Condition()
+        self._version = 0
+        self._finished = False
+        self._futures: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def done(self) -> bool:
+        """Whether the execution has reached a terminal status"""
+        return self._finished or str(self.output.status()).lower() in TERMINAL_STATUSES
+
+    def notify(self, finished: bool = False) -> None:
+        """Record an update from the proxy and wake every waiter"""
+        with self._condition:
+            self._version += 1
+            self._finished = self._finished or finished
+            futures, self._futures = self._futures, []
+            self._condition.notify_all()
+        for loop, future in futures:
+            loop.call_soon_threadsafe(Completion._resolve, future)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until the execution finishes.
+
+        Args:
+            timeout: Maximum seconds to wait, or None to wait indefinitely
+
+        Returns:
+            Whether the execution finished
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while not self.done():
+                remaining = RECHECK_INTERVAL if deadline is None else min(RECHECK_INTERVAL, deadline - time.monotonic())
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def wait_update(self, version: int, timeout: Optional[float] = None) -> int:
+        """
+        Block until an update newer than `version` arrives or the execution finishes.
+
+        Returns:
+            The latest update version
+        """
+        with self._condition:
+            if self._version <= version and not self.done():
+                self._condition.wait(RECHECK_INTERVAL if timeout is None else timeout)
+            return self._version
+
+    async def wait_async(self, timeout: Optional[float] = None) -> bool:
+        """
+        Awaitable variant of wait(); no thread is held while waiting.
+
+        Returns:
+            Whether the execution finished
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while not self.done():
+            remaining = RECHECK_INTERVAL if deadline is None else min(RECHECK_INTERVAL, deadline - loop.time())
+            if remaining <= 0:
+                return False
+            future = loop.create_future()
+            with self._condition:
+                if self.done():
+                    break
+                self._futures.append((loop, future))
+            try:
+                await asyncio.wait_for(future, remaining)
+            except asyncio.TimeoutError:
+                pass
+        return True
+
+    @staticmethod
+    def _resolve(future: asyncio.Future) -> None:
+        if not future.done():
+            future.set_result(None)
+
+
 class Remote:
     """
     Enhanced Remote class with LLM-specific improvements.
     Maintains all original functionality while adding features useful for LLM operations.
+
+    Completion is event driven: the Remote subscribes to the proxy's `progress`,
+    `response` and `restore` notifications and wakes the matching `Completion`,
+    so any number of outstanding calls can be awaited without a thread each.
     """
 
-    def __init__(self, proxy_url: str, proxy_tag: Optional[str] = None, timeout: int = 30):
+    def __init__(self, proxy_url: str, proxy_tag: Optional[str] = None, timeout: Optional[float] = 30):
         """
         Initialize with additional timeout parameter.
-        
+
         Args:
             proxy_url: The base URL of the proxy
             proxy_tag: Optional tag for the proxy instance
-            timeout: Timeout in seconds for operations (default: 30)
+            timeout: Default time in seconds to wait for a response, or None to wait
+                indefinitely (default: 30)
         """
         self.proxy_url = proxy_url
         self.proxy_tag = proxy_tag
-        # self.timeout = timeout
+        self.timeout = timeout
         self.client: Optional[Proxy] = None
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Completion] = {}
         logger.debug(f"Remote instance initialized with proxy_url={proxy_url}, proxy_tag={proxy_tag}, timeout={timeout}")
 
     def connect(self) -> 'Remote':
         """Establish connection with timeout support"""
         logger.debug("Attempting to connect to proxy")
         self.client = Proxy(
-            self.proxy_url, 
-            self.proxy_tag, 
+            self.proxy_url,
+            self.proxy_tag,
             ssl_verify=False,
             # timeout=self.timeout
         )
+        self.client.register("progress", self._on_progress)
+        self.client.register("response", self._on_response)
+        self.client.register("restore", self._on_response)
         logger.info(f"Successfully connected to proxy {self.proxy_url} with tag {self.proxy_tag}")
         return self
 
+    def disconnect(self) -> None:
+        """Close the underlying proxy connection, if any"""
+        if self.client is not None:
+            logger.debug(f"Disconnecting from proxy {self.proxy_url}")
+            self.client.disconnect()
+            self.client = None
+
     def execute(self, inputs: dict, uid: str, stream: bool = False) -> Union[ExecutionResult, None]:
         """
         Enhanced execute with streaming support.
-        
+
         Args:
             inputs: Input payload
             uid: Unique request identifier
             stream: Whether to enable streaming (default: False)
-            
+
         Returns:
             ExecutionResult or None if not connected
         """
@@ -58,29 +177,121 @@ class Remote:
             logger.error("Client is not connected. Execute failed.")
             return None
 
-        logger.debug(f"Executing request with uid={uid}, stream={stream}")
+        logger.debug("Executing request with uid=%s, stream=%s", uid, stream)
         # Add streaming flag to inputs if LLM request
         if isinstance(inputs, dict) and inputs.get("model"):
             inputs["stream"] = stream
 
         result = self.client.request(inputs, uid)
-        logger.info(f"Request executed with uid={uid}")
+        self.completion(result)
+        logger.info("Request executed with uid=%s", uid)
         return result
 
-    @staticmethod
-    def get_response(output: ExecutionResult) -> Union[dict, None]:
+    def completion(self, output: ExecutionResult) -> Completion:
+        """
+        Get (or start tracking) the completion primitive of an execution.
+
+        Args:
+            output: ExecutionResult returned by execute()
+
+        Returns:
+            The Completion for the execution
+        """
+        rid = output.request_id()
+        with self._lock:
+            completion = self._pending.get(rid)
+            if completion is None:
+                completion = Completion(output)
+                self._pending[rid] = completion
+        return completion
+
+    def _on_progress(self, data: Dict[str, Any]) -> None:
+        self._notify(data.get("rid") if isinstance(data, dict) else None, finished=False)
+
+    def _on_response(self, data: Dict[str, Any]) -> None:
+        ray = data.get("ray") if isinstance(data, dict) else None
+        self._notify(ray.get("rid") if isinstance(ray, dict) else None, finished="output" in data)
+
+    def _notify(self, rid: Optional[str], finished: bool) -> None:
+        with self._lock:
+            completion = self._pending.get(rid)
+        if completion is not None:
+            completion.notify(finished)
+
+    def _release(self, output: ExecutionResult) -> None:
+        with self._lock:
+            self._pending.pop(output.request_id(), None)
+
+    def cancel(self, output: ExecutionResult) -> None:
+        """
+        Abandon an execution: stop tracking it locally and ask the remote app to
+        drop it from its queue.
+        """
+        qid = output.request_qid()
+        output.cancel()
+        self._release(output)
+        if qid is not None and self.client is not None:
+            logger.info(f"Cancelling remote execution {qid}")
+            try:
+                self.client.delete(qid)
+            except Exception as e:
+                logger.warning(f"Could not cancel remote execution {qid}: {e}")
+
+    def get_response(self, output: ExecutionResult, timeout: Optional[float] = None) -> Union[dict, None]:
         """
         Original get_response with enhanced error handling.
+        Blocks on the execution's Completion instead of sleep-polling.
+
+        Args:
+            output: ExecutionResult returned by execute()
+            timeout: Seconds to wait; defaults to the Remote's timeout
+
+        Raises:
+            DeadlineExceeded: If no response arrived in time; the execution is cancelled
+        """
+        if output is None:
+            logger.warning("Received empty output, returning None")
+            return None
+
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            finished = self.completion(output).wait(timeout)
+        except BaseException:
+            self.cancel(output)
+            raise
+        if not finished:
+            self.cancel(output)
+            raise DeadlineExceeded(f"No response within {timeout:.1f} seconds")
+        self._release(output)
+        return self._result(output)
+
+    async def get_response_async(self, output: ExecutionResult, timeout: Optional[float] = None) -> Union[dict, None]:
+        """
+        Awaitable get_response; resolved by the proxy's response callback.
+        Cancelling the awaiting task cancels the remote execution as well.
         """
         if output is None:
             logger.warning("Received empty output, returning None")
             return None
 
-        output.wait()
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            finished = await self.completion(output).wait_async(timeout)
+        except BaseException:
+            self.cancel(output)
+            raise
+        if not finished:
+            self.cancel(output)
+            raise DeadlineExceeded(f"No response within {timeout:.1f} seconds")
+        self._release(output)
+        return self._result(output)
+
+    @staticmethod
+    def _result(output: ExecutionResult) -> Union[dict, None]:
         status = str(output.status()).lower()
-        
-        logger.debug(f"Response status: {status}")
-        
+
+        logger.debug("Response status: %s", status)
+
         if status == "completed":
             logger.info("Request completed successfully")
             return output.data()
@@ -88,14 +299,14 @@ class Remote:
             error = output.error() or "Unknown error"
             logger.error(f"Request failed: {error}")
             raise Exception(f"Request failed: {error}")
-        elif status == "cancelled":
+        elif status in ("cancelled", "canceled"):
             logger.warning("Request was cancelled")
             raise Exception("Request was cancelled")
         else:
             logger.error(f"Unexpected request status: {status}")
             raise Exception(f"Unexpected request status: {status}")
 
-    def execute_sync(self, inputs: dict, configs: dict, uid: str) -> Union[dict, None]:
+    def execute_sync(self, inputs: dict, configs: dict, uid: str, timeout: Optional[float] = None) -> Union[dict, None]:
         """
         Original synchronous execute with timeout enforcement.
         """
@@ -103,50 +314,78 @@ class Remote:
             logger.error("Client is not connected. Sync execute failed.")
             return None
 
-        logger.debug(f"Executing sync request with uid={uid}")
-        output = self.client.execute(inputs, configs, uid)
-        return self.get_response(output)
+        logger.debug("Executing sync request with uid=%s", uid)
+        output = self.execute(inputs, uid)
+        return self.get_response(output, timeout)
 
     # New LLM-specific methods
-    def stream_response(self, output: ExecutionResult) -> Generator[Dict[str, Any], None, None]:
+    def stream_response(self, output: ExecutionResult, timeout: Optional[float] = None) -> Generator[Dict[str, Any], None, None]:
         """
         Stream LLM responses chunk by chunk.
-        
+        Waits for proxy updates between chunks instead of spinning.
+
         Args:
             output: ExecutionResult from a streaming request
-            
+            timeout: Seconds the whole stream may take; defaults to the Remote's timeout
+
         Yields:
             Response chunks as they arrive
+
+        Raises:
+            DeadlineExceeded: If the stream did not finish in time; the execution is cancelled
         """
         if output is None:
             logger.error("Stream error: No output provided.")
             return
 
-        while not output.completed():
-            if output.error():
-                logger.error(f"Stream error: {output.error()}")
-                raise Exception(f"Stream error: {output.error()}")
-                
-            chunk = output.stream()
-            if chunk:
-                try:
-                    logger.debug("Received chunk, attempting to parse")
-                    yield json.loads(chunk)
-                except json.JSONDecodeError:
-                    logger.warning("Chunk not valid JSON, returning as plain content")
-                    yield {"content": chunk}
-            
-            if output.completed():
-                logger.info("Streaming completed")
-                break
-
-    async def execute_async(self, inputs: dict, uid: str) -> Union[dict, None]:
-        """
-        Async version of execute (if your Proxy supports async).
-        """
-        # Implementation depends on your Proxy's async capabilities
-        logger.warning("Async execution not implemented in base Proxy")
-        raise NotImplementedError("Async execution not implemented in base Proxy")
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        completion = self.completion(output)
+        version = 0
+        try:
+            while True:
+                if deadline is not None and time.monotonic() >= deadline:
+                    self.cancel(output)
+                    raise DeadlineExceeded(f"Stream not finished within {timeout:.1f} seconds")
+                finished = completion.done()
+                if output.error():
+                    logger.error(f"Stream error: {output.error()}")
+                    raise Exception(f"Stream error: {output.error()}")
+
+                chunk = output.stream()
+                if chunk:
+                    try:
+                        logger.debug("Received chunk, attempting to parse")
+                        yield json.loads(chunk)
+                    except json.JSONDecodeError:
+                        logger.warning("Chunk not valid JSON, returning as plain content")
+                        yield {"content": chunk}
+
+                if finished:
+                    logger.info("Streaming completed")
+                    break
+                remaining = None if deadline is None else min(RECHECK_INTERVAL, max(0.0, deadline - time.monotonic()))
+                version = completion.wait_update(version, remaining)
+        finally:
+            self._release(output)
+
+    async def execute_async(self, inputs: dict, uid: str, timeout: Optional[float] = None) -> Union[dict, None]:
+        """
+        Async version of execute: submits the request and awaits its completion
+        event, holding no thread while the remote app works.
+
+        Args:
+            inputs: Input payload
+            uid: Unique request identifier
+            timeout: Seconds to wait; defaults to the Remote's timeout
+
+        Returns:
+            The response data, or None if not connected
+        """
+        output = self.execute(inputs, uid)
+        if output is None:
+            return None
+        return await self.get_response_async(output, timeout)
 
     def health_check(self) -> bool:
         """
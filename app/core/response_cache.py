@@ -0,0 +1,198 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Callable, Dict, Optional, Tuple
+
+from core.deadline import DeadlineExceeded
+
+# Default location of the on-disk cache, next to the schema cache
+CACHE_PATH = f"{os.getcwd()}/cache/responses.db"
+
+# Entries older than this are treated as missing
+DEFAULT_TTL = 24 * 3600.0
+
+# Maximum entries kept in memory; the disk keeps DISK_FACTOR times as many
+DEFAULT_SIZE = 1024
+DISK_FACTOR = 16
+
+
+class ResponseCache:
+    """
+    ResponseCache memoizes LLM generations keyed on (model, normalized prompt,
+    temperature, max_tokens). Hot entries live in an in-memory LRU, everything is
+    persisted to SQLite, and both tiers are bounded by size and TTL.
+
+    Identical requests that arrive while the first one is still generating are
+    coalesced: they wait for the in-flight result instead of calling the backend.
+
+    Attributes:
+        hits (int): Requests answered from memory or disk.
+        misses (int): Requests that reached the backend.
+        coalesced (int): Requests that waited on an identical in-flight request.
+        saved_seconds (float): Generation time avoided by hits and coalescing.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, path: str = CACHE_PATH, ttl: float = DEFAULT_TTL, size: int = DEFAULT_SIZE):
+        self._ttl = ttl
+        self._size = size
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.saved_seconds = 0.0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    # ----------------------------------------------------------------------
+    @staticmethod
+    def key(model: str, prompt: str, temperature: float, max_tokens: int) -> str:
+        """Builds the cache key of a generation request."""
+        normalized = " ".join(prompt.split())
+        raw = json.dumps([model, normalized, round(float(temperature), 4), int(max_tokens)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # ----------------------------------------------------------------------
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Returns a cached generation, or None when missing or expired.
+
+        Args:
+            key (str): A key built by `key`.
+
+        Returns:
+            Optional[Dict]: The cached result, marked with `cached=True`.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            else:
+                row = self._db.execute(
+                    "SELECT created_at, value FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    entry = (row[0], json.loads(row[1]))
+                    self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    self._remember(key, entry)
+
+            if entry is None or now - entry[0] > self._ttl:
+                return None
+            self.hits += 1
+            self.saved_seconds += entry[1].get("generation_time") or 0.0
+            return {**entry[1], "cached": True}
+
+    # ----------------------------------------------------------------------
+    def put(self, key: str, value: Dict) -> None:
+        """Stores a successful generation in memory and on disk."""
+        # Context tokens are large and only useful to the session that produced them
+        value = {k: v for k, v in value.items() if k != "context"}
+        now = time.time()
+        with self._lock:
+            self._remember(key, (now, value))
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+            self._db.execute(
+                "DELETE FROM responses WHERE created_at < ? OR key IN "
+                "(SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (now - self._ttl, self._size * DISK_FACTOR)
+            )
+            self._db.commit()
+
+    # ----------------------------------------------------------------------
+    def get_or_generate(
+        self, key: str, generate: Callable[[], Optional[Dict]], timeout: Optional[float] = None
+    ) -> Optional[Dict]:
+        """
+        Returns the cached generation for `key`, or runs `generate` once for all
+        concurrent callers asking for the same key. Failed generations (None) are
+        not cached.
+
+        Args:
+            key (str): A key built by `key`.
+            generate (Callable[[], Optional[Dict]]): Produces the generation on a miss.
+            timeout (Optional[float]): Seconds a coalesced caller waits for the
+                in-flight generation.
+
+        Returns:
+            Optional[Dict]: The generation result.
+
+        Raises:
+            DeadlineExceeded: If a coalesced caller waited longer than `timeout`.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            try:
+                result = future.result(timeout)
+            except FutureTimeout:
+                raise DeadlineExceeded("Deadline exceeded waiting for an identical generation")
+            if result is not None:
+                with self._lock:
+                    self.saved_seconds += result.get("generation_time") or 0.0
+            return result
+
+        try:
+            result = generate()
+            if result is not None:
+                self.put(key, result)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    # ----------------------------------------------------------------------
+    def stats(self) -> Dict[str, float]:
+        """Returns the hit/miss counters and the generation time saved."""
+        with self._lock:
+            total = self.hits + self.misses + self.coalesced
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_ratio": (self.hits + self.coalesced) / total if total else 0.0,
+                "saved_seconds": self.saved_seconds,
+                "entries": len(self._memory),
+            }
+
+    # ----------------------------------------------------------------------
+    def _remember(self, key: str, entry: Tuple[float, Dict]):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._size:
+            self._memory.popitem(last=False)
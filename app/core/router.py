@@ -0,0 +1,218 @@
+import contextlib
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import requests
+
+from core.deadline import CallCancelled, DeadlineExceeded, LatencyTracker
+from core.metrics import LLM_BACKEND_IN_FLIGHT, LLM_BACKEND_UP
+
+# Smoothing factor of the latency moving average (higher reacts faster)
+EWMA_ALPHA = 0.3
+
+# Consecutive failures after which a backend is ejected until a health check passes
+EJECT_AFTER = 3
+
+# Seconds to wait for a health check answer
+HEALTH_TIMEOUT = 2.0
+
+EndpointSpec = Union[str, Dict[str, Any]]
+
+
+class Backend:
+    """
+    One Ollama host of a router.
+
+    Attributes:
+        base (str): Base URL of the host, e.g. `http://gpu-1:11434`.
+        models (Tuple[str, ...]): Models served by the host; empty means any.
+        in_flight (int): Calls currently running on the host.
+        latency (Optional[float]): Moving average of successful call durations.
+        healthy (bool): Whether the host receives traffic.
+        failures (int): Consecutive failed calls or health checks.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, url: str, models: Optional[List[str]] = None):
+        self.base = url.split("/api/", 1)[0].rstrip("/")
+        self.models = tuple(models or ())
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self.healthy = True
+        self.failures = 0
+
+    # ----------------------------------------------------------------------
+    def url(self, api: str) -> str:
+        """Returns the URL of an Ollama API on this host, e.g. `url("generate")`."""
+        return f"{self.base}/api/{api}"
+
+    def serves(self, model: Optional[str]) -> bool:
+        return not self.models or model is None or model in self.models or model.split(":")[0] in self.models
+
+    def __repr__(self) -> str:
+        return f"Backend({self.base}, in_flight={self.in_flight}, latency={self.latency}, healthy={self.healthy})"
+
+
+class EndpointRouter:
+    """
+    EndpointRouter spreads LLM calls over a pool of Ollama hosts. Each call goes to
+    the healthy host serving the model with the lowest expected wait, i.e. the
+    latency moving average scaled by the calls already in flight there. Hosts
+    failing EJECT_AFTER times in a row are ejected; a background health check
+    probes every host and readmits ejected ones once they answer again.
+
+    Attributes:
+        backends (List[Backend]): The hosts of the pool.
+        latency (LatencyTracker): Recent successful call durations over all hosts,
+            used to decide when to hedge a call.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, endpoints: List[EndpointSpec], session: requests.Session, health_interval: float = 10.0):
+        """
+        Args:
+            endpoints (List[EndpointSpec]): Host URLs, or `{"url": ..., "models": [...]}`
+                entries restricting a host to some models.
+            session (requests.Session): Session used for health checks.
+            health_interval (float): Seconds between health checks; 0 disables them.
+        """
+        self.backends = [self._backend(spec) for spec in endpoints]
+        if not self.backends:
+            raise ValueError("At least one LLM endpoint is required")
+        self.latency = LatencyTracker()
+        self._session = session
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        for backend in self.backends:
+            LLM_BACKEND_UP.labels(backend.base).set(1)
+        if health_interval > 0 and len(self.backends) > 1:
+            threading.Thread(
+                target=self._check_health, args=(health_interval,), name="llm-health", daemon=True
+            ).start()
+
+    @staticmethod
+    def _backend(spec: EndpointSpec) -> Backend:
+        if isinstance(spec, dict):
+            return Backend(spec["url"], spec.get("models"))
+        return Backend(spec)
+
+    @staticmethod
+    def key(endpoints: List[EndpointSpec]) -> Tuple:
+        """Returns a hashable identity of an endpoint list, for sharing routers."""
+        return tuple(
+            (spec["url"], tuple(spec.get("models") or ())) if isinstance(spec, dict) else (spec, ())
+            for spec in endpoints
+        )
+
+    # ----------------------------------------------------------------------
+    def candidates(self, model: Optional[str], avoid: Sequence[Backend] = ()) -> Iterator[Backend]:
+        """
+        Yields the hosts to try for a call, best first. The ranking is recomputed
+        before every attempt, and each host is yielded at most once. Ejected hosts
+        are only used when no healthy host serves the model, and hosts in `avoid`
+        (e.g. the one running the call being hedged) only after all others.
+        """
+        tried = set()
+        while True:
+            with self._lock:
+                serving = [b for b in self.backends if b.serves(model) and id(b) not in tried]
+                pool = [b for b in serving if b.healthy] or serving
+                pool = [b for b in pool if b not in avoid] or pool
+                if not pool:
+                    return
+                backend = min(pool, key=self._cost)
+            tried.add(id(backend))
+            yield backend
+
+    def _cost(self, backend: Backend) -> float:
+        known = [b.latency for b in self.backends if b.latency is not None]
+        # Hosts without measurements are assumed as fast as the best known one
+        latency = backend.latency if backend.latency is not None else min(known, default=1.0)
+        return latency * (backend.in_flight + 1)
+
+    # ----------------------------------------------------------------------
+    @contextlib.contextmanager
+    def track(self, backend: Backend, measure: bool = True):
+        """
+        Accounts a call on a host: counts it as in flight, feeds its duration into
+        the latency average on success and its failure into ejection otherwise.
+        Only failures that point at the host count: connection errors, timeouts
+        and 5xx answers. Other errors (4xx answers, expired deadlines, cancelled
+        calls) are raised without marking it.
+
+        Args:
+            backend (Backend): The host the call runs on.
+            measure (bool): Whether the duration is representative of the host's
+                latency (warm-ups and embeddings are not).
+        """
+        with self._lock:
+            backend.in_flight += 1
+        LLM_BACKEND_IN_FLIGHT.labels(backend.base).inc()
+        start = time.time()
+        try:
+            yield backend
+        except Exception as e:
+            if _is_host_failure(e):
+                self._failed(backend)
+            raise
+        else:
+            with self._lock:
+                backend.failures = 0
+                if measure:
+                    elapsed = time.time() - start
+                    backend.latency = elapsed if backend.latency is None else (
+                        EWMA_ALPHA * elapsed + (1 - EWMA_ALPHA) * backend.latency
+                    )
+            if measure:
+                self.latency.record(elapsed)
+        finally:
+            with self._lock:
+                backend.in_flight -= 1
+            LLM_BACKEND_IN_FLIGHT.labels(backend.base).dec()
+
+    def _failed(self, backend: Backend):
+        with self._lock:
+            backend.failures += 1
+            eject = backend.healthy and backend.failures >= EJECT_AFTER
+            if eject:
+                backend.healthy = False
+        if eject:
+            LLM_BACKEND_UP.labels(backend.base).set(0)
+            logging.warning(f"LLM backend {backend.base} ejected after {backend.failures} failures")
+
+    # ----------------------------------------------------------------------
+    def close(self) -> None:
+        """Stops the health checks."""
+        self._closed.set()
+
+    def _check_health(self, interval: float):
+        while not self._closed.wait(interval):
+            for backend in self.backends:
+                try:
+                    self._session.get(backend.url("tags"), timeout=HEALTH_TIMEOUT).raise_for_status()
+                except Exception as e:
+                    logging.debug(f"LLM backend {backend.base} health check failed: {e}")
+                    self._failed(backend)
+                    continue
+                with self._lock:
+                    readmit = not backend.healthy
+                    backend.healthy = True
+                    backend.failures = 0
+                if readmit:
+                    LLM_BACKEND_UP.labels(backend.base).set(1)
+                    logging.info(f"LLM backend {backend.base} readmitted")
+
+
+def _is_host_failure(error: Exception) -> bool:
+    """Whether an error says the host is down or overloaded, rather than the request being at fault."""
+    if isinstance(error, (DeadlineExceeded, CallCancelled)):
+        # The caller ran out of time or gave up; that says nothing about the host
+        return False
+    if isinstance(error, requests.HTTPError):
+        return error.response is None or error.response.status_code >= 500
+    return isinstance(error, (
+        requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+        ConnectionError, TimeoutError
+    ))
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+# Default location of the on-disk cache, next to the SDK datastore
+CACHE_PATH = f"{os.getcwd()}/cache/schemas"
+
+# Entries younger than this are served without contacting the app
+DEFAULT_TTL = 3600.0
+
+Fetcher = Callable[[str], dict]
+
+
+class SchemaCache:
+    """
+    SchemaCache keeps the manifest and input/output schemas of Openfabric apps in
+    memory and on disk, so a Stub can start without network round-trips.
+
+    Entries are served as-is until their TTL expires. After that the manifest is
+    fetched again and, if its version did not change, the cached schemas are kept
+    and only the timestamp is refreshed; otherwise both schemas are refetched. A
+    manifest without version fields only keeps the schemas if it is unchanged.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, path: str = CACHE_PATH, ttl: float = DEFAULT_TTL):
+        self._path = path
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+        os.makedirs(self._path, exist_ok=True)
+
+    # ----------------------------------------------------------------------
+    def peek(self, app_id: str) -> Optional[dict]:
+        """
+        Returns the cached entry for an app if it is still fresh, without
+        touching the network.
+
+        Args:
+            app_id (str): The application ID.
+
+        Returns:
+            Optional[dict]: The entry (`manifest`, `input`, `output`), or None.
+        """
+        entry = self._read(app_id)
+        if entry is not None and time.time() - entry["fetched_at"] < self._ttl:
+            return entry
+        return None
+
+    # ----------------------------------------------------------------------
+    def get(self, app_id: str, fetch: Fetcher) -> dict:
+        """
+        Returns the entry for an app, revalidating it with `fetch` when expired.
+
+        Args:
+            app_id (str): The application ID.
+            fetch (Fetcher): Callable fetching a path (e.g. `manifest`) of the app.
+
+        Returns:
+            dict: The entry (`manifest`, `input`, `output`).
+        """
+        entry = self.peek(app_id)
+        if entry is not None:
+            return entry
+
+        stale = self._read(app_id)
+        manifest = fetch("manifest")
+        if stale is not None and self._version(stale["manifest"]) == self._version(manifest):
+            logging.info(f"[{app_id}] Schema cache revalidated")
+            entry = {**stale, "manifest": manifest}
+        else:
+            logging.info(f"[{app_id}] Schema cache miss, fetching schemas")
+            entry = {
+                "manifest": manifest,
+                "input": fetch("schema?type=input"),
+                "output": fetch("schema?type=output"),
+            }
+        entry["fetched_at"] = time.time()
+        self._write(app_id, entry)
+        return entry
+
+    # ----------------------------------------------------------------------
+    def _read(self, app_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(app_id)
+            if entry is not None:
+                return entry
+            try:
+                with open(self._file(app_id)) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                return None
+            self._entries[app_id] = entry
+            return entry
+
+    def _write(self, app_id: str, entry: dict):
+        with self._lock:
+            self._entries[app_id] = entry
+            tmp = self._file(app_id) + ".tmp"
+            try:
+                with open(tmp, "w") as f:
+                    json.dump(entry, f)
+                os.replace(tmp, self._file(app_id))
+            except OSError as e:
+                logging.warning(f"[{app_id}] Could not persist schema cache: {e}")
+
+    def _file(self, app_id: str) -> str:
+        return os.path.join(self._path, hashlib.sha1(app_id.encode()).hexdigest() + ".json")
+
+    @staticmethod
+    def _version(manifest: dict) -> Tuple:
+        version = manifest.get("version"), manifest.get("sdk"), manifest.get("input"), manifest.get("output")
+        if any(field is not None for field in version):
+            return version
+        # Manifests without version fields are compared whole, so any change refetches the schemas
+        return (hashlib.sha256(json.dumps(manifest, sort_keys=True, default=str).encode()).hexdigest(),)
+
+
+schema_cache = SchemaCache()
@@ -0,0 +1,199 @@
+import collections
+import logging
+import os
+import threading
+import time
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# Sessions kept in memory; the least recently used one is evicted beyond this
+SESSION_MAX = int(os.getenv("SESSION_MAX", 1024))
+
+# Seconds after which an idle session is forgotten
+SESSION_IDLE = float(os.getenv("SESSION_IDLE_SECONDS", 3600))
+
+# Turns kept verbatim per session
+MAX_TURNS = 16
+
+# Compacted turns kept per session, as one line each
+MAX_SUMMARY = 32
+
+# Characters kept from a compacted turn
+SUMMARY_CHARS = 120
+
+# Rough characters per token, for turns the backend did not count
+CHARS_PER_TOKEN = 4
+
+# Section listing the conversation so far, inserted before the idea
+HISTORY_TEMPLATE = "Conversation so far (the idea may refer to it):\n{items}\n\n"
+
+
+class Turn:
+    """One exchange of a session: the user idea and the model's answer."""
+
+    __slots__ = ("prompt", "response", "tokens")
+
+    def __init__(self, prompt: str, response: str, tokens: int):
+        self.prompt = prompt
+        self.response = response
+        self.tokens = tokens
+
+
+class Session:
+    """
+    Short-term state of one session.
+
+    Attributes:
+        model (Optional[str]): Model that produced `context`.
+        context (Optional[List[int]]): Context tokens returned by Ollama with the last
+            answer, encoding the whole conversation; None once compacted.
+        turns (Deque[Turn]): The latest turns, verbatim.
+        summary (Deque[str]): Older turns, compacted to one line each.
+        touched (float): When the session was last used.
+    """
+
+    __slots__ = ("model", "context", "turns", "summary", "touched")
+
+    def __init__(self):
+        self.model: Optional[str] = None
+        self.context: Optional[List[int]] = None
+        self.turns: Deque[Turn] = collections.deque(maxlen=MAX_TURNS)
+        self.summary: Deque[str] = collections.deque(maxlen=MAX_SUMMARY)
+        self.touched = time.time()
+
+    def tokens(self) -> int:
+        return len(self.context) if self.context is not None else sum(turn.tokens for turn in self.turns)
+
+
+class SessionMemory:
+    """
+    SessionMemory is the short-term memory of conversations, keyed by session ID.
+
+    After each answer it keeps the `context` tokens Ollama returns. The next turn
+    of the session sends them back, so the model continues the conversation without
+    re-evaluating it. When the context grows past the token budget, or the session
+    switches models, the context is dropped. The following turn is then sent with a
+    compact transcript instead: the latest turns verbatim and older ones reduced to
+    one line each. The context Ollama returns for that turn becomes the new base.
+
+    Memory is bounded per session (by the token budget and MAX_TURNS) and overall:
+    idle sessions expire and the least recently used ones are evicted.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, max_sessions: int = SESSION_MAX, idle: float = SESSION_IDLE):
+        """
+        Args:
+            max_sessions (int): Sessions kept before the least recently used is evicted.
+            idle (float): Seconds after which an unused session is forgotten.
+        """
+        self._max_sessions = max_sessions
+        self._idle = idle
+        self._lock = threading.Lock()
+        self._sessions: "collections.OrderedDict[str, Session]" = collections.OrderedDict()
+        self.reused = 0
+        self.compacted = 0
+
+    # ----------------------------------------------------------------------
+    def begin(self, sid: str, model: str) -> Tuple[Optional[List[int]], str]:
+        """
+        Returns what the next generation of a session should carry.
+
+        Args:
+            sid (str): The session ID.
+            model (str): The model the generation will use.
+
+        Returns:
+            Tuple[Optional[List[int]], str]: The context tokens to send, and the
+            history to put in the prompt. At most one of them is set.
+        """
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(sid)
+            if session is None:
+                return None, ""
+            self._sessions.move_to_end(sid)
+            session.touched = time.time()
+            if session.context is not None and session.model == model:
+                self.reused += 1
+                return list(session.context), ""
+            return None, self._history(session)
+
+    # ----------------------------------------------------------------------
+    def record(self, sid: str, prompt: str, result: Dict[str, Any], budget: int) -> None:
+        """
+        Adds an answered turn to a session and compacts it once it outgrows `budget`.
+
+        Args:
+            sid (str): The session ID.
+            prompt (str): The user idea of the turn.
+            result (Dict[str, Any]): The generation result, as returned by `LLMClient.generate`.
+            budget (int): Tokens the session may hold before it is compacted.
+        """
+        response = result.get("response") or ""
+        tokens = (result.get("prompt_tokens") or 0) + (result.get("tokens_used") or 0)
+        turn = Turn(prompt, response, tokens or (len(prompt) + len(response)) // CHARS_PER_TOKEN)
+
+        with self._lock:
+            session = self._sessions.get(sid)
+            if session is None:
+                session = self._sessions[sid] = Session()
+            self._sessions.move_to_end(sid)
+            session.touched = time.time()
+            if len(session.turns) == session.turns.maxlen:
+                self._fold(session)
+            session.turns.append(turn)
+            session.model = result.get("model")
+            session.context = result.get("context") or None
+            if session.tokens() > budget:
+                self._compact(session, budget)
+                self.compacted += 1
+                logging.info(f"Session {sid} compacted to {session.tokens()} tokens")
+            while len(self._sessions) > self._max_sessions:
+                evicted, _ = self._sessions.popitem(last=False)
+                logging.info(f"Session {evicted} evicted")
+
+    # ----------------------------------------------------------------------
+    def forget(self, sid: str) -> None:
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the number of live sessions and how often context was reused or compacted."""
+        with self._lock:
+            return {"sessions": len(self._sessions), "reused": self.reused, "compacted": self.compacted}
+
+    # ----------------------------------------------------------------------
+    def _compact(self, session: Session, budget: int):
+        # The context encodes every turn, so it is dropped as a whole; the transcript
+        # replacing it keeps the newest turns that fit in half the budget
+        session.context = None
+        while len(session.turns) > 1 and session.tokens() > budget // 2:
+            self._fold(session)
+
+    @staticmethod
+    def _fold(session: Session):
+        turn = session.turns.popleft()
+        session.summary.append(_clip(turn.prompt))
+
+    @staticmethod
+    def _history(session: Session) -> str:
+        items = [f"- (earlier) {line}" for line in session.summary]
+        items += [f"- {turn.prompt}: {_clip(turn.response, 4 * SUMMARY_CHARS)}" for turn in session.turns]
+        return HISTORY_TEMPLATE.format(items="\n".join(items)) if items else ""
+
+    def _expire(self):
+        cutoff = time.time() - self._idle
+        while self._sessions:
+            sid, session = next(iter(self._sessions.items()))
+            if session.touched >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+            logging.info(f"Session {sid} expired")
+
+
+def _clip(text: str, limit: int = SUMMARY_CHARS) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+session_memory = SessionMemory()
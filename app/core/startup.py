@@ -0,0 +1,208 @@
+import collections
+import contextlib
+import importlib.abc
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from core.logs import shutdown as shutdown_logging
+
+# Seconds between checks whether the web server accepts connections
+PROBE_INTERVAL = 0.05
+
+# Seconds to wait for the port before the cold start is reported as failed
+PROBE_TIMEOUT = float(os.getenv("STARTUP_PROBE_TIMEOUT", 300))
+
+# Top-level packages listed in the import report
+TOP_IMPORTS = 15
+
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+    """
+    ImportTimer measures how long modules take to execute on import, like
+    `python -X importtime`, but in process so it can be reported with the other
+    startup phases. It sits first on `sys.meta_path`, finds specs through the
+    finders behind it and wraps the `exec_module` of the loaders they return.
+
+    Time is attributed to the top-level package of each module, excluding the
+    nested imports it triggers, so the totals add up to the overall import time.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.totals: Dict[str, float] = collections.defaultdict(float)
+        self.modules = 0
+
+    # ----------------------------------------------------------------------
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        loader = spec.loader
+        # Built-in and frozen importers are shared classes, not per-module loaders
+        if loader is None or isinstance(loader, type) or not hasattr(loader, "exec_module"):
+            return spec
+        loader.exec_module = self._timed(loader.exec_module, fullname.partition(".")[0])
+        return spec
+
+    # ----------------------------------------------------------------------
+    def report(self, top: int = TOP_IMPORTS) -> Dict[str, Any]:
+        """Returns the total import time and the packages that took longest."""
+        with self._lock:
+            ranked = sorted(self.totals.items(), key=lambda item: item[1], reverse=True)
+            return {
+                "seconds": round(sum(self.totals.values()), 4),
+                "modules": self.modules,
+                "packages": {package: round(seconds, 4) for package, seconds in ranked[:top]},
+            }
+
+    # ----------------------------------------------------------------------
+    def _timed(self, exec_module: Callable, package: str) -> Callable:
+        def timed(module):
+            stack: List[float] = self._local.__dict__.setdefault("stack", [])
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                elapsed = time.perf_counter() - start
+                nested = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                with self._lock:
+                    self.totals[package] += elapsed - nested
+                    self.modules += 1
+        return timed
+
+
+class StartupProfile:
+    """
+    StartupProfile times the phases of a cold start (imports, store and queue
+    setup, loading the app, ...) and the milestones that matter for availability:
+    `serving`, when the web server first accepts connections, and `ready`, when
+    the work deferred past it (datastore recovery) has finished. Milestones are
+    measured from the moment this module is imported, which `ignite.py` does first,
+    and exported as the `startup_seconds` gauge.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self):
+        self._started = time.monotonic()
+        self.phases: Dict[str, float] = {}
+        self.milestones: Dict[str, float] = {}
+        self.imports: Optional[ImportTimer] = None
+
+    # ----------------------------------------------------------------------
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Times the enclosed block as the phase `name`."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.monotonic() - start
+
+    def mark(self, name: str) -> float:
+        """Records the milestone `name` and returns the seconds elapsed since startup."""
+        # Imported here so `profile_imports` also sees prometheus_client being loaded
+        from core.metrics import STARTUP
+        elapsed = time.monotonic() - self._started
+        self.milestones[name] = elapsed
+        STARTUP.labels(name).set(elapsed)
+        return elapsed
+
+    # ----------------------------------------------------------------------
+    def profile_imports(self) -> None:
+        """Starts timing every module imported from now on."""
+        if self.imports is None:
+            self.imports = ImportTimer()
+            sys.meta_path.insert(0, self.imports)
+
+    # ----------------------------------------------------------------------
+    def when_serving(
+        self,
+        port: int,
+        deferred: Tuple[Tuple[str, Callable[[], Any]], ...] = (),
+        on_ready: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> threading.Thread:
+        """
+        Waits in a background thread until `port` accepts connections, then runs
+        the deferred work, each item as its own phase, and hands the report to
+        `on_ready`. If the port is still closed after PROBE_TIMEOUT, the deferred
+        work runs anyway and `on_ready` gets a report without `cold_start_seconds`.
+
+        Args:
+            port (int): The port the web server listens on.
+            deferred (Tuple[Tuple[str, Callable[[], Any]], ...]): Named work to run once serving.
+            on_ready (Optional[Callable[[Dict[str, Any]], None]]): Called with `report()` at the end.
+
+        Returns:
+            threading.Thread: The started thread.
+        """
+        def run():
+            if _wait_for_port(port, PROBE_TIMEOUT):
+                logging.info("Startup - serving on port %d after %.3f seconds", port, self.mark("serving"))
+            else:
+                logging.error("Startup - port %d not serving after %.0f seconds", port, PROBE_TIMEOUT)
+            for name, work in deferred:
+                try:
+                    with self.phase(name):
+                        work()
+                except Exception:
+                    logging.exception("Startup - deferred %s failed", name)
+            logging.info("Startup - ready after %.3f seconds", self.mark("ready"))
+            if on_ready is not None:
+                on_ready(self.report())
+
+        thread = threading.Thread(target=run, name="startup", daemon=True)
+        thread.start()
+        return thread
+
+    # ----------------------------------------------------------------------
+    def report(self) -> Dict[str, Any]:
+        """Returns the cold start time, the milestones, the phases and, if profiled, the imports."""
+        report: Dict[str, Any] = {
+            "cold_start_seconds": round(self.milestones["serving"], 4) if "serving" in self.milestones else None,
+            "milestones": {name: round(seconds, 4) for name, seconds in self.milestones.items()},
+            "phases": {name: round(seconds, 4) for name, seconds in self.phases.items()},
+        }
+        if self.imports is not None:
+            report["imports"] = self.imports.report()
+        return report
+
+
+def report_and_exit(report: Dict[str, Any]) -> None:
+    """
+    Prints a startup report as JSON on stdout and ends the process (`--profile-startup`),
+    with a non-zero status if the port never served.
+    """
+    print(json.dumps(report, indent=2), flush=True)
+    shutdown_logging()
+    # The web server and the engine workers never return on their own
+    os._exit(0 if report["cold_start_seconds"] is not None else 1)
+
+
+def _wait_for_port(port: int, timeout: float) -> bool:
+    until = time.monotonic() + timeout
+    while time.monotonic() < until:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=PROBE_INTERVAL):
+                return True
+        except OSError:
+            time.sleep(PROBE_INTERVAL)
+    return False
+
+
+startup = StartupProfile()
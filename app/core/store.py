@@ -0,0 +1,258 @@
+import collections
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.metrics import STORE_FLUSH
+
+# Durability levels, from fastest to safest:
+#   none  - commits are batched and never fsynced: committed writes survive a crash of
+#           the process, but an OS crash or power loss may lose recent ones
+#   batch - group commit every COMMIT_INTERVAL seconds and on flush(), fsync per group
+#   full  - every write is committed and fsynced before returning
+# In WAL mode only synchronous=FULL syncs the log on commit (NORMAL waits for a checkpoint)
+DURABILITY_LEVELS = ("none", "batch", "full")
+
+# Seconds between group commits in `none`/`batch` mode
+COMMIT_INTERVAL = 0.05
+
+# Commits between WAL checkpoints (compaction of the write-ahead log)
+CHECKPOINT_EVERY = 1000
+
+# Stores kept decoded in memory; eviction is free since the data is already logged
+CACHE_SIZE = 1024
+
+# Stores that only the main process reads and are never mirrored to JSON files
+PRIVATE_STORES = ("state", "tasks")
+
+_SYNCHRONOUS = {"none": "OFF", "batch": "FULL", "full": "FULL"}
+
+
+class _Backend:
+    """
+    One SQLite database (WAL mode) holding every store of a datastore directory.
+    Writes are queued and applied by a background thread in groups, so many
+    `set` calls share one transaction and one fsync.
+
+    The decoded stores are cached here too, under `lock`, so every LogStore of a
+    directory (the engine's, the task queue's) sees the same values.
+    """
+
+    _instances: Dict[str, "_Backend"] = {}
+    _instances_lock = threading.Lock()
+
+    # ----------------------------------------------------------------------
+    @classmethod
+    def open(cls, path: str, durability: str) -> "_Backend":
+        with cls._instances_lock:
+            backend = cls._instances.get(path)
+            if backend is None:
+                backend = cls(path, durability)
+                cls._instances[path] = backend
+            return backend
+
+    # ----------------------------------------------------------------------
+    def __init__(self, path: str, durability: str):
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"Durability must be one of {DURABILITY_LEVELS}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.durability = durability
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[str, Tuple]] = []
+        self._commits = 0
+        # Guards `cache` and keeps a store change and its commit together; taken before `_lock`
+        self.lock = threading.RLock()
+        self.cache: "collections.OrderedDict[str, Dict[str, Any]]" = collections.OrderedDict()
+        self._db = sqlite3.connect(os.path.join(path, "store.db"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(f"PRAGMA synchronous={_SYNCHRONOUS[durability]}")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS kv (name TEXT NOT NULL, key TEXT NOT NULL, value TEXT, "
+            "PRIMARY KEY (name, key)) WITHOUT ROWID"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS stores (name TEXT PRIMARY KEY)")
+        self._db.commit()
+
+        if durability != "full":
+            threading.Thread(target=self._committer, name="store-committer", daemon=True).start()
+
+    # ----------------------------------------------------------------------
+    def load(self, name: str) -> Optional[Dict[str, Any]]:
+        """Returns every key of a store, or None if the store was never written."""
+        self.commit()
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM stores WHERE name = ?", (name,)).fetchone() is None:
+                return None
+            rows = self._db.execute("SELECT key, value FROM kv WHERE name = ?", (name,)).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def write(self, sql: str, args: Tuple) -> None:
+        with self._lock:
+            self._pending.append((sql, args))
+        if self.durability == "full":
+            self.commit()
+
+    def set(self, name: str, key: str, value: Any) -> None:
+        self.write("INSERT OR IGNORE INTO stores (name) VALUES (?)", (name,))
+        self.write("INSERT OR REPLACE INTO kv (name, key, value) VALUES (?, ?, ?)", (name, key, json.dumps(value)))
+
+    def rem(self, name: str, key: str) -> None:
+        self.write("DELETE FROM kv WHERE name = ? AND key = ?", (name, key))
+
+    def drop(self, name: str) -> None:
+        self.write("DELETE FROM kv WHERE name = ?", (name,))
+        self.write("DELETE FROM stores WHERE name = ?", (name,))
+
+    def import_store(self, name: str, values: Dict[str, Any]) -> None:
+        """Imports a store recovered from a legacy JSON file."""
+        self.write("INSERT OR IGNORE INTO stores (name) VALUES (?)", (name,))
+        for key, value in values.items():
+            self.write("INSERT OR REPLACE INTO kv (name, key, value) VALUES (?, ?, ?)", (name, key, json.dumps(value)))
+
+    # ----------------------------------------------------------------------
+    def commit(self) -> None:
+        """Applies every queued write in a single transaction."""
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            with self._db:
+                for sql, args in pending:
+                    self._db.execute(sql, args)
+            self._commits += 1
+            if self._commits % CHECKPOINT_EVERY == 0:
+                self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _committer(self):
+        while True:
+            time.sleep(COMMIT_INTERVAL)
+            try:
+                self.commit()
+            except Exception as e:
+                logging.error(f"Store group commit failed: {e}")
+
+
+class LogStore:
+    """
+    LogStore is a drop-in replacement for `openfabric_pysdk.store.Store` with the
+    same get/set/rem/drop/all/flush/dump API. Instead of one pickleDB JSON file per
+    store that is rewritten on every dump, every write is appended to a shared
+    SQLite WAL database with group commit, so per-request disk I/O is proportional
+    to the record written rather than to the whole store. LogStores of the same
+    directory share the database and the decoded stores.
+
+    `flush(name)` also materializes the store as `<name>.json`, because the SDK
+    worker process reads ray inputs from those files directly. Stores listed in
+    PRIVATE_STORES (the task queue state) are never mirrored. Existing JSON files
+    are imported on first access, so switching backends keeps queued work.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, path: str = None, autodump: bool = False, durability: str = None):
+        self.__path = path or os.getcwd()
+        self.__autodump = autodump
+        self.__backend = _Backend.open(self.__path, durability or os.getenv("STORE_DURABILITY", "batch"))
+        self.__lock = self.__backend.lock
+        self.__cache = self.__backend.cache
+
+    # ------------------------------------------------------------------------
+    def dump(self, kvdb: Any = None):
+        self.__backend.commit()
+
+    # ------------------------------------------------------------------------
+    def flush(self, name: str):
+        start = time.time()
+        self.__backend.commit()
+        if name not in PRIVATE_STORES:
+            values = self.all(name)
+            file = os.path.join(self.__path, f"{name}.json")
+            with open(file + ".tmp", "w") as f:
+                json.dump(values, f)
+            os.replace(file + ".tmp", file)
+        STORE_FLUSH.observe(time.time() - start)
+
+    # ------------------------------------------------------------------------
+    def get(self, name, key, default=None) -> Any:
+        value = self.__instance(name).get(key)
+        if value:
+            return value
+        else:
+            return default
+
+    # ------------------------------------------------------------------------
+    def set(self, name: str, key: str, val: Any):
+        with self.__lock:
+            self.__instance(name)[key] = val
+            self.__backend.set(name, key, val)
+            if self.__autodump:
+                self.__backend.commit()
+
+    # ------------------------------------------------------------------------
+    def rem(self, name: str, key: str):
+        with self.__lock:
+            self.__instance(name).pop(key, None)
+            self.__backend.rem(name, key)
+            if self.__autodump:
+                self.__backend.commit()
+
+    # ------------------------------------------------------------------------
+    def drop(self, name: str):
+        with self.__lock:
+            self.__cache.pop(name, None)
+            self.__backend.drop(name)
+        file = os.path.join(self.__path, f"{name}.json")
+        if os.path.isfile(file):
+            os.remove(file)
+
+    # ------------------------------------------------------------------------
+    def all(self, name: str) -> Dict[str, Any]:
+        """Returns a copy of every key of a store; changing it does not change the store."""
+        with self.__lock:
+            return dict(self.__instance(name))
+
+    # ------------------------------------------------------------------------
+    def __instance(self, name: str) -> Dict[str, Any]:
+        with self.__lock:
+            values = self.__cache.get(name)
+            if values is None:
+                values = self.__backend.load(name)
+                if values is None:
+                    values = self.__recover(name)
+                self.__cache[name] = values
+                while len(self.__cache) > CACHE_SIZE:
+                    self.__cache.popitem(last=False)
+            self.__cache.move_to_end(name)
+            return values
+
+    def __recover(self, name: str) -> Dict[str, Any]:
+        file = os.path.join(self.__path, f"{name}.json")
+        values: Dict[str, Any] = {}
+        try:
+            with open(file) as f:
+                values = json.load(f)
+            self.__backend.import_store(name, values)
+            logging.info(f"Store - imported {file}")
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            logging.error(f"Store - {file} is corrupted, starting empty")
+        return values
+
+
+def install() -> None:
+    """
+    Replaces the SDK store with LogStore when `STORE_ENGINE=log` (the default).
+    Must run before `openfabric_pysdk.engine` is imported, since the engine and
+    the task queue bind the Store class at import time. `STORE_ENGINE=pickledb`
+    keeps the SDK's original JSON-file store.
+    """
+    if os.getenv("STORE_ENGINE", "log") != "log":
+        return
+    import openfabric_pysdk.store
+    openfabric_pysdk.store.Store = LogStore
+    logging.info(f"Store - using append-only log backend ({os.getenv('STORE_DURABILITY', 'batch')} durability)")
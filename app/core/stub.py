@@ -1,21 +1,31 @@
+import asyncio
 import json
 import logging
-import pprint
-from typing import Any, Dict, List, Literal, Tuple, Generator
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Literal, Optional, Tuple, Generator
 
 import requests
 
-from core.remote import Remote
-from openfabric_pysdk.helper import has_resource_fields, json_schema_to_marshmallow, resolve_resources
-from openfabric_pysdk.loader import OutputSchemaInst
+from core.blob_store import BlobStore, blob_store
+from core.deadline import Deadline, LatencyTracker
+from core.logs import SAMPLED, payload
+from core.metrics import HEDGES, STUB_CALL
+from core.schema_cache import SchemaCache, schema_cache
+
+if TYPE_CHECKING:
+    # The socket.io client behind Remote is imported on the first call to an app
+    from core.remote import Remote
 
 # Type aliases for clarity
 Manifests = Dict[str, dict]
 Schemas = Dict[str, Tuple[dict, dict]]
-Connections = Dict[str, Remote]
+Connections = Dict[str, "Remote"]
+Compiled = Dict[str, Tuple[Any, bool]]
 
-# Setting up the logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Seconds a failed manifest/schema fetch is remembered before the app is tried again
+LOAD_RETRY_SECONDS = float(os.getenv("STUB_LOAD_RETRY_SECONDS", 30))
 
 class Stub:
     """
@@ -26,54 +36,157 @@ class Stub:
     Attributes:
         _schema (Schemas): Stores input/output schemas for each app ID.
         _manifest (Manifests): Stores manifest metadata for each app ID.
-        _connections (Connections): Stores active Remote connections for each app ID.
+        _connections (Connections): Stores warm Remote connections, opened lazily per app ID.
+        _compiled (Compiled): Memoized output marshmallow schema and resource flag per app ID.
+        _latency (Dict[str, LatencyTracker]): Recent call durations per app ID, used to hedge.
+        _failed (Dict[str, float]): When each app whose fetch failed may be tried again.
     """
 
     # ----------------------------------------------------------------------
-    def __init__(self, app_ids: List[str], timeout: int = 30):
+    def __init__(
+        self,
+        app_ids: List[str],
+        timeout: int = 30,
+        cache: SchemaCache = schema_cache,
+        blobs: BlobStore = blob_store
+    ):
         """
-        Initializes the Stub instance by loading manifests, schemas, and connections
-        for each given app ID.
+        Initializes the Stub instance for the given app IDs. Manifests and schemas are
+        served from the schema cache when fresh and fetched on first use otherwise;
+        Remote connections are opened lazily on the first call to each app.
 
         Args:
             app_ids (List[str]): A list of application identifiers (hostnames or URLs).
+            timeout (int): Seconds a call may take when it has no tighter deadline.
+            cache (SchemaCache): The manifest/schema cache to use.
+            blobs (BlobStore): The store that generated resources are downloaded to.
         """
         logging.info("Initializing Stub instance with app IDs: %s", app_ids)
-        # self._timeout = timeout
+        self._timeout = timeout
+        self._cache = cache
+        self._blobs = blobs
+        self._app_ids = list(app_ids)
+        self._lock = threading.RLock()
         self._schema: Schemas = {}
         self._manifest: Manifests = {}
         self._connections: Connections = {}
+        self._compiled: Compiled = {}
+        self._latency: Dict[str, LatencyTracker] = {}
+        self._failed: Dict[str, float] = {}
+        self._loading: Dict[str, threading.Lock] = {}
 
         for app_id in app_ids:
-            base_url = app_id.strip('/')
+            entry = self._cache.peek(app_id)
+            if entry is not None:
+                logging.info(f"[{app_id}] Manifest and schemas loaded from cache.")
+                self._store(app_id, entry)
+
+    # ----------------------------------------------------------------------
+    def _load(self, app_id: str) -> None:
+        """
+        Makes sure the manifest and schemas of an app are available, fetching them
+        through the schema cache if needed. A failed fetch is not retried for
+        LOAD_RETRY_SECONDS, and a fetch only blocks callers of the same app.
+        """
+        if app_id in self._schema or app_id not in self._app_ids or self._backing_off(app_id):
+            return
 
+        base_url = _url(app_id, "https")
+
+        def fetch(path: str) -> dict:
+            logging.info(f"Fetching {path} for {app_id}...")
+            return requests.get(f"{base_url}/{path}", timeout=5).json()
+
+        with self._lock:
+            loading = self._loading.setdefault(app_id, threading.Lock())
+        with loading:
+            if app_id in self._schema or self._backing_off(app_id):
+                return
             try:
-                logging.info(f"Fetching manifest for {app_id}...")
-                # Fetch manifest
-                manifest = requests.get(f"https://{base_url}/manifest", timeout=5).json()
-                logging.info(f"[{app_id}] Manifest loaded: {manifest}")
-                self._manifest[app_id] = manifest
-
-                logging.info(f"Fetching input schema for {app_id}...")
-                # Fetch input schema
-                input_schema = requests.get(f"https://{base_url}/schema?type=input", timeout=5).json()
-                logging.info(f"[{app_id}] Input schema loaded: {input_schema}")
-
-                logging.info(f"Fetching output schema for {app_id}...")
-                # Fetch output schema
-                output_schema = requests.get(f"https://{base_url}/schema?type=output", timeout=5).json()
-                logging.info(f"[{app_id}] Output schema loaded: {output_schema}")
-                self._schema[app_id] = (input_schema, output_schema)
+                entry = self._cache.get(app_id, fetch)
+            except Exception as e:
+                logging.error(f"[{app_id}] Initialization failed, retrying in {LOAD_RETRY_SECONDS:.0f}s: {e}")
+                self._failed[app_id] = time.monotonic() + LOAD_RETRY_SECONDS
+                return
+            with self._lock:
+                self._store(app_id, entry)
+                self._failed.pop(app_id, None)
+
+    def _backing_off(self, app_id: str) -> bool:
+        retry_at = self._failed.get(app_id)
+        return retry_at is not None and time.monotonic() < retry_at
+
+    def _store(self, app_id: str, entry: dict) -> None:
+        self._manifest[app_id] = entry["manifest"]
+        self._schema[app_id] = (entry["input"], entry["output"])
+        self._compiled.pop(app_id, None)
 
+    # ----------------------------------------------------------------------
+    def _connection(self, app_id: str) -> "Remote":
+        """
+        Returns the warm Remote connection for an app, establishing it on first use.
+
+        Raises:
+            Exception: If the app ID is unknown or the connection cannot be established.
+        """
+        connection = self._connections.get(app_id)
+        if connection is not None:
+            return connection
+
+        if app_id not in self._app_ids:
+            logging.error(f"Connection not found for app ID: {app_id}")
+            raise Exception(f"Connection not found for app ID: {app_id}")
+
+        with self._lock:
+            connection = self._connections.get(app_id)
+            if connection is None:
                 logging.info(f"Establishing remote connection for {app_id}...")
-                # Establish Remote WebSocket connection
-                self._connections[app_id] = Remote(f"wss://{base_url}/app", f"{app_id}-proxy").connect()
+                from core.remote import Remote
+                connection = Remote(f"{_url(app_id, 'wss')}/app", f"{app_id}-proxy", timeout=self._timeout).connect()
+                self._connections[app_id] = connection
                 logging.info(f"[{app_id}] Connection established.")
-            except Exception as e:
-                logging.error(f"[{app_id}] Initialization failed: {e}")
+        return connection
+
+    # ----------------------------------------------------------------------
+    def _output_marshmallow(self, app_id: str) -> Tuple[Any, bool]:
+        """
+        Returns the compiled output schema of an app and whether it carries resource
+        fields. Compilation happens once per app and is memoized.
+        """
+        compiled = self._compiled.get(app_id)
+        if compiled is None:
+            from openfabric_pysdk.helper import has_resource_fields, json_schema_to_marshmallow
+            marshmallow = json_schema_to_marshmallow(self.schema(app_id, 'output'))
+            compiled = (marshmallow, has_resource_fields(marshmallow()))
+            self._compiled[app_id] = compiled
+        return compiled
+
+    # ----------------------------------------------------------------------
+    def _resolve(self, app_id: str, result: Any, deadline: Optional[Deadline] = None) -> Any:
+        """
+        Downloads the resources referenced by an app output to the blob store and
+        replaces them with `Blob` handles.
+        """
+        marshmallow, handle_resources = self._output_marshmallow(app_id)
+        if not handle_resources:
+            return result
+        logging.info("Resolving resources for %s...", app_id)
+        url = _url(app_id, "https") + "/resource?reid={reid}"
+        return self._blobs.resolve(url, result, marshmallow(), deadline=deadline)
+
+    def _timeout_for(self, deadline: Optional[Deadline]) -> Optional[float]:
+        return self._timeout if deadline is None else deadline.timeout(self._timeout)
+
+    def _tracker(self, app_id: str) -> LatencyTracker:
+        tracker = self._latency.get(app_id)
+        if tracker is None:
+            tracker = self._latency.setdefault(app_id, LatencyTracker())
+        return tracker
 
     # ----------------------------------------------------------------------
-    def call(self, app_id: str, data: Any, uid: str = 'super-user', retries: int = 3) -> dict:
+    def call(
+        self, app_id: str, data: Any, uid: str = 'super-user', retries: int = 3, deadline: Optional[Deadline] = None
+    ) -> dict:
         """
         Sends a request to the specified app via its Remote connection.
 
@@ -81,40 +194,114 @@ class Stub:
             app_id (str): The application ID to route the request to.
             data (Any): The input data to send to the app.
             uid (str): The unique user/session identifier for tracking (default: 'super-user').
+            deadline (Optional[Deadline]): When the request must be done; the remote
+                execution is cancelled if it runs past it.
 
         Returns:
-            dict: The output data returned by the app.
+            dict: The output data returned by the app, with resources as `Blob` handles.
 
         Raises:
+            DeadlineExceeded: If the app did not answer before the deadline.
             Exception: If no connection is found for the provided app ID, or execution fails.
         """
-        logging.info(f"Calling app {app_id} with data: {data} and UID: {uid}")
+        logging.info("Calling app %s with fields: %s and UID: %s", app_id, payload(data), uid, extra=SAMPLED)
 
-        connection = self._connections.get(app_id)
-        if not connection:
-            logging.error(f"Connection not found for app ID: {app_id}")
-            raise Exception(f"Connection not found for app ID: {app_id}")
+        connection = self._connection(app_id)
+        start = time.time()
 
         try:
             handler = connection.execute(data, uid)
-            logging.info(f"Execution started for {app_id}. Waiting for response...")
-            result = connection.get_response(handler)
+            logging.info("Execution started for %s. Waiting for response...", app_id, extra=SAMPLED)
+            result = connection.get_response(handler, self._timeout_for(deadline))
 
-            logging.info(f"Received result for {app_id}: {result}")
+            logging.info("Received result for %s with fields: %s", app_id, payload(result), extra=SAMPLED)
 
-            schema = self.schema(app_id, 'output')
-            marshmallow = json_schema_to_marshmallow(schema)
-            handle_resources = has_resource_fields(marshmallow())
+            result = self._resolve(app_id, result, deadline)
+            STUB_CALL.labels(app_id).observe(time.time() - start)
+            self._tracker(app_id).record(time.time() - start)
+            return result
+        except Exception as e:
+            logging.error(f"[{app_id}] Execution failed: {e}")
+            raise
 
-            if handle_resources:
-                logging.info(f"Resolving resources for {app_id}...")
-                result = resolve_resources("https://" + app_id + "/resource?reid={reid}", result, marshmallow())
+    # ----------------------------------------------------------------------
+    async def call_async(
+        self,
+        app_id: str,
+        data: Any,
+        uid: str = 'super-user',
+        deadline: Optional[Deadline] = None,
+        hedge: bool = False
+    ) -> dict:
+        """
+        Async version of call(): awaits the app's response without holding a thread
+        for the whole execution. Cancelling the awaiting task cancels the remote
+        execution as well.
 
-            return result
+        Args:
+            app_id (str): The application ID to route the request to.
+            data (Any): The input data to send to the app.
+            uid (str): The unique user/session identifier for tracking (default: 'super-user').
+            deadline (Optional[Deadline]): When the request must be done.
+            hedge (bool): Whether to send a duplicate request once the call takes longer
+                than the app's recent p95 latency; the first answer wins and the other
+                execution is cancelled.
+
+        Returns:
+            dict: The output data returned by the app, with resources as `Blob` handles.
+        """
+        logging.info("Calling app %s asynchronously with UID: %s", app_id, uid, extra=SAMPLED)
+        loop = asyncio.get_running_loop()
+        connection = await loop.run_in_executor(None, self._connection, app_id)
+
+        try:
+            delay = self._tracker(app_id).p95() if hedge else None
+            if delay is None:
+                return await self._attempt(connection, app_id, data, uid, deadline)
+            return await self._hedged(connection, app_id, data, uid, deadline, delay)
         except Exception as e:
             logging.error(f"[{app_id}] Execution failed: {e}")
             raise
 
+    async def _attempt(
+        self, connection: "Remote", app_id: str, data: Any, uid: str, deadline: Optional[Deadline]
+    ) -> dict:
+        start = time.time()
+        result = await connection.execute_async(data, uid, self._timeout_for(deadline))
+        logging.info("Received result for %s with fields: %s", app_id, payload(result), extra=SAMPLED)
+        result = await asyncio.get_running_loop().run_in_executor(None, self._resolve, app_id, result, deadline)
+        STUB_CALL.labels(app_id).observe(time.time() - start)
+        self._tracker(app_id).record(time.time() - start)
+        return result
+
+    async def _hedged(
+        self, connection: "Remote", app_id: str, data: Any, uid: str, deadline: Optional[Deadline], delay: float
+    ) -> dict:
+        """
+        Runs a call and, if it is still pending after `delay` seconds, a duplicate of
+        it. Returns the first successful result and cancels the other attempt.
+        """
+        primary = asyncio.ensure_future(self._attempt(connection, app_id, data, uid, deadline))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        logging.info(f"[{app_id}] No answer after {delay:.2f}s, sending a hedged request")
+        hedge = asyncio.ensure_future(self._attempt(connection, app_id, data, uid, deadline))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        HEDGES.labels(app_id, "primary" if task is primary else "hedge").inc()
+                        return task.result()
+            # Both attempts failed: surface the primary's error
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
     # ----------------------------------------------------------------------
     def manifest(self, app_id: str) -> dict:
         """
@@ -126,7 +313,8 @@ class Stub:
         Returns:
             dict: The manifest data for the app, or an empty dictionary if not found.
         """
-        logging.info(f"Retrieving manifest for {app_id}")
+        logging.debug("Retrieving manifest for %s", app_id)
+        self._load(app_id)
         return self._manifest.get(app_id, {})
 
     # ----------------------------------------------------------------------
@@ -144,7 +332,8 @@ class Stub:
         Raises:
             ValueError: If the schema type is invalid or the schema is not found.
         """
-        logging.info(f"Retrieving {type} schema for {app_id}")
+        logging.debug("Retrieving %s schema for %s", type, app_id)
+        self._load(app_id)
 
         _input, _output = self._schema.get(app_id, (None, None))
 
@@ -162,20 +351,40 @@ class Stub:
             logging.error("Invalid schema type provided")
             raise ValueError("Type must be either 'input' or 'output'")
 
+    # ----------------------------------------------------------------------
+    def close(self) -> None:
+        """
+        Disconnects every Remote connection held by this Stub.
+        """
+        for app_id, connection in self._connections.items():
+            logging.info(f"Closing connection for {app_id}")
+            connection.disconnect()
+        self._connections.clear()
+
     def stream(self, app_id: str, data: Any, uid: str = 'super-user') -> Generator[dict, None, None]:
         """Streaming version of call()"""
-        logging.info(f"Starting stream for app {app_id} with data: {data} and UID: {uid}")
+        logging.info(
+            "Starting stream for app %s with fields: %s and UID: %s", app_id, payload(data), uid, extra=SAMPLED
+        )
+
+        connection = self._connection(app_id)
 
-        connection = self._connections.get(app_id)
-        if not connection:
-            logging.error(f"Connection not found for app ID: {app_id}")
-            raise Exception(f"Connection not found for app ID: {app_id}")
-        
         try:
             handler = connection.execute(data, uid, stream=True)
-            logging.info(f"Streaming data for {app_id}...")
-            for chunk in connection.get_response_stream(handler):
+            logging.info("Streaming data for %s...", app_id, extra=SAMPLED)
+            for chunk in connection.stream_response(handler):
                 yield chunk
         except Exception as e:
             logging.error(f"[{app_id}] Streaming execution failed: {e}")
             raise
+
+
+def _url(app_id: str, scheme: str) -> str:
+    """
+    Returns the base URL of an app. App IDs are hostnames served over TLS; an ID
+    given as `http://host:port` (e.g. a local stand-in app) is reached without TLS.
+    """
+    if app_id.startswith("http://"):
+        host = app_id[len("http://"):].strip('/')
+        return f"{'ws' if scheme == 'wss' else 'http'}://{host}"
+    return f"{scheme}://{app_id.strip('/')}"
@@ -0,0 +1,287 @@
+import collections
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import openfabric_pysdk.store
+from openfabric_pysdk.store import Store
+
+TASKS = 'tasks'
+
+# Legacy SDK queue state, migrated on first start
+STATE = 'state'
+LEGACY_KEYS = ('QUEUED', 'REQUESTED', 'COMPLETED')
+
+# Dispatched tasks are forgotten after this many seconds ...
+RETENTION_SECONDS = float(os.getenv("TASK_RETENTION_SECONDS", 7 * 24 * 3600))
+# ... or once more than this many are retained
+RETENTION_COUNT = int(os.getenv("TASK_RETENTION_COUNT", 10000))
+
+
+class TaskStatus:
+    QUEUED = 'queued'
+    DISPATCHED = 'dispatched'
+
+
+class IndexedTask:
+    """
+    IndexedTask is a drop-in replacement for `openfabric_pysdk.task.Task`.
+
+    The SDK task keeps QUEUED/REQUESTED/COMPLETED as lists that are loaded, mutated
+    and rewritten on every request and never trimmed. Here each task is one record
+    (`{status, at, uid}`) in its own store key, indexed in memory by insertion-ordered
+    dicts, so add/next/rem are O(1) in time and in bytes written. Dispatched tasks
+    are retained for RETENTION_SECONDS / RETENTION_COUNT and then forgotten, and
+    `on_evict` is told so cached rays can be released.
+
+    Queued tasks are kept in one FIFO lane per user and `next` serves the lanes
+    round-robin, so a large batch from one user cannot starve the others. The
+    user of a task is resolved through `uid_of` when it is added.
+
+    With `defer_recovery` set, the persisted tasks are not loaded on creation but
+    by a later call to `recover`, so the engine can be built (and the port opened)
+    without waiting for the datastore.
+    """
+
+    # Set by `install(defer_recovery=True)` before the engine creates its queue
+    defer_recovery: bool = False
+
+    # ------------------------------------------------------------------------
+    def __init__(self, store: Optional[Store] = None):
+        self.__lock = threading.RLock()
+        # Resolved at call time so a store installed by core.store.install is used
+        self.__store = store or openfabric_pysdk.store.Store(path=f"{os.getcwd()}/datastore", autodump=True)
+        self.__queued: "collections.OrderedDict[str, float]" = collections.OrderedDict()
+        self.__dispatched: "collections.OrderedDict[str, float]" = collections.OrderedDict()
+        self.__lanes: "collections.OrderedDict[str, collections.OrderedDict[str, None]]" = collections.OrderedDict()
+        self.__uids: Dict[str, str] = {}
+        self.__waits: Dict[str, float] = {}
+        self.on_evict: Optional[Callable[[str], None]] = None
+        self.uid_of: Optional[Callable[[str], Optional[str]]] = None
+        self.recovered = threading.Event()
+
+        if not self.defer_recovery:
+            self.recover()
+
+    # ------------------------------------------------------------------------
+    def recover(self) -> int:
+        """
+        Loads the tasks persisted by previous runs, migrating the legacy SDK state
+        first. Tasks added since this queue was created keep their place; recovered
+        queued tasks join their user's lane behind them. Runs once.
+
+        Returns:
+            int: The number of queued tasks recovered.
+        """
+        with self.__lock:
+            if self.recovered.is_set():
+                return 0
+            self.__migrate()
+            records: Dict[str, dict] = self.__store.all(TASKS) or {}
+            restored = []
+            for tid, record in sorted(records.items(), key=lambda item: item[1].get('at', 0)):
+                if tid in self.__queued or tid in self.__dispatched:
+                    continue
+                if record.get('status') == TaskStatus.QUEUED:
+                    self.__queued[tid] = record.get('at', 0)
+                    self.__enqueue(tid, record.get('uid'))
+                    restored.append(tid)
+                else:
+                    self.__dispatched[tid] = record.get('at', 0)
+            self.__prune()
+            self.recovered.set()
+        if restored:
+            logging.info(f"Openfabric - restore pre-existing tasks: {restored}")
+        return len(restored)
+
+    # ------------------------------------------------------------------------
+    def empty(self) -> bool:
+        return not self.__queued
+
+    # ------------------------------------------------------------------------
+    def next(self) -> str:
+        with self.__lock:
+            if not self.__queued:
+                raise queue.Empty()
+            uid, lane = next(iter(self.__lanes.items()))
+            tid, _ = lane.popitem(last=False)
+            self.__lanes.pop(uid)
+            if lane:
+                self.__lanes[uid] = lane
+            at = self.__queued.pop(tid)
+            self.__waits[tid] = time.time() - at
+            self.__set(tid, TaskStatus.DISPATCHED, at)
+            self.__prune()
+            return tid
+
+    # ------------------------------------------------------------------------
+    def add(self, tid: str):
+        uid = self.uid_of(tid) if self.uid_of is not None else None
+        with self.__lock:
+            self.__dispatched.pop(tid, None)
+            if tid not in self.__queued:
+                self.__enqueue(tid, uid)
+            self.__set(tid, TaskStatus.QUEUED, time.time())
+
+    # ------------------------------------------------------------------------
+    def rem(self, tid: str):
+        with self.__lock:
+            if self.__queued.pop(tid, None) is not None:
+                uid = self.__uids.pop(tid, None)
+                lane = self.__lanes.get(uid)
+                if lane is not None:
+                    lane.pop(tid, None)
+                    if not lane:
+                        self.__lanes.pop(uid)
+            self.__dispatched.pop(tid, None)
+            self.__store.rem(TASKS, tid)
+
+    # ------------------------------------------------------------------------
+    def all(self) -> List[str]:
+        """Tasks that still need their ray at startup: only the queued ones."""
+        return list(self.__queued)
+
+    # ------------------------------------------------------------------------
+    def tracked(self) -> List[str]:
+        """Every retained task: dispatched ones in dispatch order, then queued ones."""
+        with self.__lock:
+            return list(self.__dispatched) + list(self.__queued)
+
+    def queued(self) -> List[str]:
+        return list(self.__queued)
+
+    def queue_wait(self, tid: str) -> Optional[float]:
+        """Seconds the task spent queued before its latest dispatch (reported once)."""
+        return self.__waits.pop(tid, None)
+
+    def status(self, tid: str) -> Optional[str]:
+        if tid in self.__queued:
+            return TaskStatus.QUEUED
+        if tid in self.__dispatched:
+            return TaskStatus.DISPATCHED
+        return None
+
+    # ------------------------------------------------------------------------
+    def __enqueue(self, tid: str, uid: Optional[str]):
+        uid = uid or ''
+        self.__uids[tid] = uid
+        if uid not in self.__lanes:
+            self.__lanes[uid] = collections.OrderedDict()
+        self.__lanes[uid][tid] = None
+
+    def __set(self, tid: str, status: str, at: float):
+        index = self.__queued if status == TaskStatus.QUEUED else self.__dispatched
+        index[tid] = at
+        uid = self.__uids.get(tid) if status == TaskStatus.QUEUED else self.__uids.pop(tid, None)
+        self.__store.set(TASKS, tid, {'status': status, 'at': at, 'uid': uid})
+
+    def __prune(self):
+        horizon = time.time() - RETENTION_SECONDS
+        while self.__dispatched:
+            tid, at = next(iter(self.__dispatched.items()))
+            if at >= horizon and len(self.__dispatched) <= RETENTION_COUNT:
+                break
+            self.__dispatched.popitem(last=False)
+            self.__store.rem(TASKS, tid)
+            if self.on_evict is not None:
+                self.on_evict(tid)
+
+    def __migrate(self):
+        legacy = {key: self.__store.get(STATE, key) for key in LEGACY_KEYS}
+        if not any(legacy.values()):
+            return
+        now = time.time()
+        queued = legacy['QUEUED'] or []
+        for offset, tid in enumerate(legacy['REQUESTED'] or []):
+            status = TaskStatus.QUEUED if tid in queued else TaskStatus.DISPATCHED
+            self.__store.set(TASKS, tid, {'status': status, 'at': now - len(legacy['REQUESTED']) + offset, 'uid': None})
+        for key in LEGACY_KEYS:
+            self.__store.rem(STATE, key)
+        logging.info("Openfabric - migrated legacy task queue state")
+
+
+def install(defer_recovery: bool = False) -> None:
+    """
+    Replaces the SDK task queue with IndexedTask and makes the engine's ray lookups
+    lazy and index-driven. The task class must be swapped before
+    `openfabric_pysdk.engine` is imported, because the engine instantiates its
+    task queue (and loads every ray it lists) at import time.
+
+    Args:
+        defer_recovery (bool): Leave the persisted tasks unloaded until `recover`
+            is called, instead of loading them while the engine is imported.
+    """
+    import openfabric_pysdk.task
+    IndexedTask.defer_recovery = defer_recovery
+    openfabric_pysdk.task.Task = IndexedTask
+
+    from openfabric_pysdk.context import Ray, RaySchema, RayStatus
+    from openfabric_pysdk.engine import engine as instance
+    engine_class = type(instance)
+
+    def ray(self, qid: str) -> Ray:
+        rays = self._Engine__rays
+        value = rays.get(qid)
+        if value is None:
+            stored = self.read(qid, 'ray', RaySchema().load)
+            value = stored or Ray(qid=qid)
+            # Cache new and retained rays only; rays of forgotten tasks are served uncached
+            if stored is None or self._Engine__task.status(qid) is not None:
+                rays[qid] = value
+        return value
+
+    def rays(self, criteria=None) -> List[Ray]:
+        return [r for r in list(self._Engine__rays.values()) if criteria is None or criteria(r)]
+
+    def pending_rays(self, criteria=None) -> List[Ray]:
+        task: IndexedTask = self._Engine__task
+        selected = []
+        for qid in task.tracked():
+            r = self.ray(qid)
+            if criteria is None or criteria(r):
+                selected.append(r)
+        return selected
+
+    def delete(self, qid: str, app=None) -> Ray:
+        # Rays served uncached by `ray` are not in `__rays`, and the SDK's `delete`
+        # pops them unconditionally while holding the engine lock
+        lock: threading.Condition = engine_class._Engine__lock
+        with lock:
+            try:
+                self._Engine__task.rem(qid)
+                value = self.ray(qid)
+                (app or self._Engine__app).cancel_execution(value)
+                self._Engine__store.drop(qid)
+                value.status = RayStatus.REMOVED
+            finally:
+                self._Engine__rays.pop(qid, None)
+                lock.notify_all()
+        return value
+
+    engine_class.ray = ray
+    engine_class.rays = rays
+    engine_class.pending_rays = pending_rays
+    engine_class.delete = delete
+    instance._Engine__task.on_evict = lambda qid: instance._Engine__rays.pop(qid, None)
+    logging.info("Openfabric - using indexed task queue")
+
+
+def recover() -> int:
+    """
+    Loads the persisted tasks into the engine queue installed by `install` and
+    wakes the workers for the queued ones. Rays are read lazily when dispatched.
+
+    Returns:
+        int: The number of queued tasks recovered.
+    """
+    from openfabric_pysdk.engine import engine as instance
+    lock: threading.Condition = type(instance)._Engine__lock
+    # Loading holds only the queue's own lock, so requests keep being accepted meanwhile
+    restored = instance._Engine__task.recover()
+    if restored:
+        with lock:
+            lock.notify_all()
+    return restored
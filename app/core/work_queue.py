@@ -0,0 +1,637 @@
+import contextlib
+import hmac
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import requests
+
+from core.logs import payload
+
+# "shared" hands rays to worker processes through the shared queue; anything else
+# keeps executing them in this process
+WORK_QUEUE = os.getenv("WORK_QUEUE", "local")
+
+# SQLite database holding the shared queue. Processes on one host share it directly;
+# workers on other hosts reach it through the routes served by the front-end
+WORK_QUEUE_PATH = os.getenv("WORK_QUEUE_PATH", f"{os.getcwd()}/datastore/work.db")
+
+# Seconds a claimed job stays leased without a heartbeat before another worker may take it
+LEASE_SECONDS = float(os.getenv("WORK_LEASE_SECONDS", 30))
+
+# Seconds between the heartbeats renewing a worker's leases
+HEARTBEAT_INTERVAL = LEASE_SECONDS / 3
+
+# Claims of a job before it is failed instead of requeued (a job that kills its worker)
+MAX_ATTEMPTS = int(os.getenv("WORK_MAX_ATTEMPTS", 3))
+
+# Seconds between polls of an idle queue, by workers and by the front-end result sync
+POLL_INTERVAL = 0.05
+
+# Minimum seconds between pushes of a running ray's progress to the queue
+RAY_PUSH_INTERVAL = 0.25
+
+# Seconds finished jobs are kept for front-ends to pick up their results
+JOB_RETENTION = float(os.getenv("WORK_JOB_RETENTION_SECONDS", 3600))
+
+# Jobs read by the result sync per poll
+SYNC_BATCH = 256
+
+# Shared secret remote workers present to the /work routes; the routes are not served without one
+WORK_QUEUE_SECRET = os.getenv("WORK_QUEUE_SECRET")
+
+
+class JobStatus:
+    QUEUED = 'queued'
+    LEASED = 'leased'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELED = 'canceled'
+
+
+FINISHED = (JobStatus.DONE, JobStatus.FAILED, JobStatus.CANCELED)
+
+
+class WorkQueue:
+    """
+    WorkQueue is a backlog of rays shared by every process that opens the same
+    SQLite file (WAL mode, so readers never block the writer).
+
+    A worker `claim`s the oldest claimable job, which leases it to the worker for
+    LEASE_SECONDS; `heartbeat` renews every lease the worker holds. A job whose
+    lease ran out, because its worker died or hung, is claimable again, up to
+    MAX_ATTEMPTS claims. `update` and `complete` only apply while the caller still
+    holds the lease, so a worker that lost its job cannot overwrite the result of
+    the one that took it over.
+
+    Each change gives the job the next sequence number, so front-ends follow the
+    results of every job with `changes(cursor)`, whichever process executed it.
+    The counter is kept in `meta`, so it never goes back when jobs are pruned.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, path: str = WORK_QUEUE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._local = threading.local()
+        with self._write() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (qid TEXT PRIMARY KEY, uid TEXT, status TEXT NOT NULL, "
+                "data TEXT, ray TEXT, output TEXT, error TEXT, owner TEXT, lease_until REAL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, enqueued_at REAL NOT NULL, "
+                "finished_at REAL, seq INTEGER NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, enqueued_at)")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_seq ON jobs (seq)")
+            db.execute("CREATE TABLE IF NOT EXISTS configs (uid TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    # ----------------------------------------------------------------------
+    def submit(self, qid: str, uid: Optional[str], data: Optional[str], ray: Optional[dict]) -> None:
+        """Queues a ray, or requeues it from scratch if it was submitted before."""
+        with self._write() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO jobs (qid, uid, status, data, ray, attempts, enqueued_at, seq) "
+                "VALUES (?, ?, ?, ?, ?, 0, ?, ?)",
+                (qid, uid, JobStatus.QUEUED, data, _dumps(ray), time.time(), self._next_seq(db))
+            )
+
+    # ----------------------------------------------------------------------
+    def claim(self, owner: str) -> Optional[Dict[str, Any]]:
+        """
+        Leases the next job to `owner`: an expired lease first, then the oldest
+        queued job. Jobs that used up MAX_ATTEMPTS are failed on the way.
+
+        Returns:
+            Optional[Dict[str, Any]]: `qid`, `uid`, `data`, `ray` and `attempts`, or None if idle.
+        """
+        now = time.time()
+        with self._write() as db:
+            while True:
+                row = db.execute(
+                    "SELECT qid, uid, data, ray, attempts FROM jobs WHERE status = ? AND lease_until < ? "
+                    "ORDER BY enqueued_at LIMIT 1", (JobStatus.LEASED, now)
+                ).fetchone() or db.execute(
+                    "SELECT qid, uid, data, ray, attempts FROM jobs WHERE status = ? "
+                    "ORDER BY enqueued_at LIMIT 1", (JobStatus.QUEUED,)
+                ).fetchone()
+                if row is None:
+                    return None
+                qid, uid, data, ray, attempts = row
+                if attempts >= MAX_ATTEMPTS:
+                    db.execute(
+                        "UPDATE jobs SET status = ?, error = ?, owner = NULL, finished_at = ?, seq = ? WHERE qid = ?",
+                        (JobStatus.FAILED, f"Abandoned after {attempts} attempts", now, self._next_seq(db), qid)
+                    )
+                    logging.warning("Work queue - job %s failed after %d attempts", qid, attempts)
+                    continue
+                db.execute(
+                    "UPDATE jobs SET status = ?, owner = ?, lease_until = ?, attempts = ?, seq = ? WHERE qid = ?",
+                    (JobStatus.LEASED, owner, now + LEASE_SECONDS, attempts + 1, self._next_seq(db), qid)
+                )
+                if attempts:
+                    logging.info("Work queue - job %s requeued to %s (attempt %d)", qid, owner, attempts + 1)
+                return {"qid": qid, "uid": uid, "data": data, "ray": _loads(ray), "attempts": attempts + 1}
+
+    # ----------------------------------------------------------------------
+    def heartbeat(self, owner: str) -> int:
+        """Renews every lease held by `owner` and returns how many it holds."""
+        with self._write() as db:
+            return db.execute(
+                "UPDATE jobs SET lease_until = ? WHERE owner = ? AND status = ?",
+                (time.time() + LEASE_SECONDS, owner, JobStatus.LEASED)
+            ).rowcount
+
+    # ----------------------------------------------------------------------
+    def update(self, qid: str, owner: str, ray: dict) -> bool:
+        """Publishes the progress of a running job. Returns False if `owner` lost the lease."""
+        with self._write() as db:
+            return db.execute(
+                "UPDATE jobs SET ray = ?, seq = ? WHERE qid = ? AND owner = ? AND status = ?",
+                (_dumps(ray), self._next_seq(db), qid, owner, JobStatus.LEASED)
+            ).rowcount > 0
+
+    def complete(
+        self, qid: str, owner: str, ray: dict, output: Optional[dict] = None, error: Optional[str] = None
+    ) -> bool:
+        """
+        Stores the result of a job, failed if `error` is set. Returns False if
+        `owner` lost the lease, in which case the result is discarded.
+        """
+        status = JobStatus.FAILED if error is not None else JobStatus.DONE
+        with self._write() as db:
+            return db.execute(
+                "UPDATE jobs SET status = ?, ray = ?, output = ?, error = ?, owner = NULL, finished_at = ?, "
+                "seq = ? WHERE qid = ? AND owner = ? AND status = ?",
+                (status, _dumps(ray), _dumps(output), error, time.time(), self._next_seq(db),
+                 qid, owner, JobStatus.LEASED)
+            ).rowcount > 0
+
+    def cancel(self, qid: str) -> None:
+        with self._write() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, finished_at = ?, seq = ? WHERE qid = ? AND status IN (?, ?)",
+                (JobStatus.CANCELED, time.time(), self._next_seq(db), qid, JobStatus.QUEUED, JobStatus.LEASED)
+            )
+
+    # ----------------------------------------------------------------------
+    def changes(self, cursor: int, limit: int = SYNC_BATCH) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Returns the jobs changed after `cursor`, oldest change first, and the
+        cursor to pass next time.
+        """
+        rows = self._db().execute(
+            "SELECT qid, status, ray, output, error, seq FROM jobs WHERE seq > ? ORDER BY seq LIMIT ?", (cursor, limit)
+        ).fetchall()
+        return (rows[-1][5] if rows else cursor), [_job(*row) for row in rows]
+
+    def cursor(self) -> int:
+        """Returns the latest sequence number, so a new follower of `changes` skips the history."""
+        row = self._db().execute("SELECT value FROM meta WHERE key = 'seq'").fetchone()
+        if row is None:
+            row = self._db().execute("SELECT COALESCE(MAX(seq), 0) FROM jobs").fetchone()
+        return row[0]
+
+    def jobs(self, qids: List[str]) -> List[Dict[str, Any]]:
+        """Returns the current state of the given jobs, in the shape `changes` returns them."""
+        rows = []
+        for start in range(0, len(qids), SYNC_BATCH):
+            chunk = qids[start:start + SYNC_BATCH]
+            rows += self._db().execute(
+                f"SELECT qid, status, ray, output, error, seq FROM jobs WHERE qid IN ({', '.join('?' * len(chunk))}) "
+                "ORDER BY seq", chunk
+            ).fetchall()
+        return [_job(*row) for row in rows]
+
+    def prune(self, retention: float = JOB_RETENTION) -> int:
+        """Forgets jobs that finished more than `retention` seconds ago."""
+        with self._write() as db:
+            return db.execute(
+                "DELETE FROM jobs WHERE finished_at < ?", (time.time() - retention,)
+            ).rowcount
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the number of jobs per status."""
+        return dict(self._db().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    # ----------------------------------------------------------------------
+    def publish_configs(self, configs: Dict[str, dict]) -> None:
+        """Shares the user configurations (serialized) with every worker."""
+        with self._write() as db:
+            db.execute("DELETE FROM configs")
+            db.executemany("INSERT INTO configs (uid, value) VALUES (?, ?)", [(u, _dumps(c)) for u, c in configs.items()])
+            db.execute("INSERT INTO meta (key, value) VALUES ('configs', 1) "
+                       "ON CONFLICT (key) DO UPDATE SET value = value + 1")
+
+    def configs(self, version: int = 0) -> Tuple[int, Optional[Dict[str, dict]]]:
+        """Returns the configuration version, and the configurations if they changed since `version`."""
+        db = self._db()
+        row = db.execute("SELECT value FROM meta WHERE key = 'configs'").fetchone()
+        current = row[0] if row else 0
+        if current == version:
+            return current, None
+        return current, {uid: _loads(value) for uid, value in db.execute("SELECT uid, value FROM configs")}
+
+    # ----------------------------------------------------------------------
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @contextlib.contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        # IMMEDIATE takes the write lock up front, so a claim's read and update are atomic across processes
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    @staticmethod
+    def _next_seq(db: sqlite3.Connection) -> int:
+        # Seeded from the jobs of queues created before the counter existed
+        db.execute(
+            "INSERT INTO meta (key, value) VALUES ('seq', (SELECT COALESCE(MAX(seq), 0) + 1 FROM jobs)) "
+            "ON CONFLICT (key) DO UPDATE SET value = value + 1"
+        )
+        return db.execute("SELECT value FROM meta WHERE key = 'seq'").fetchone()[0]
+
+
+class RemoteWorkQueue:
+    """
+    RemoteWorkQueue is the worker side of a WorkQueue served over HTTP by a
+    front-end (see `install_routes`), for workers on hosts that cannot open the
+    queue file. It offers the calls a Worker needs, with the same semantics.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, url: str, timeout: float = 10, secret: Optional[str] = WORK_QUEUE_SECRET):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self._session = requests.Session()
+        if secret:
+            self._session.headers["Authorization"] = f"Bearer {secret}"
+
+    # ----------------------------------------------------------------------
+    def claim(self, owner: str) -> Optional[Dict[str, Any]]:
+        return self._call("claim", owner=owner)
+
+    def heartbeat(self, owner: str) -> int:
+        return self._call("heartbeat", owner=owner)
+
+    def update(self, qid: str, owner: str, ray: dict) -> bool:
+        return self._call("update", qid=qid, owner=owner, ray=ray)
+
+    def complete(
+        self, qid: str, owner: str, ray: dict, output: Optional[dict] = None, error: Optional[str] = None
+    ) -> bool:
+        return self._call("complete", qid=qid, owner=owner, ray=ray, output=output, error=error)
+
+    def configs(self, version: int = 0) -> Tuple[int, Optional[Dict[str, dict]]]:
+        version, configs = self._call("configs", version=version)
+        return version, configs
+
+    # ----------------------------------------------------------------------
+    def _call(self, operation: str, **kwargs) -> Any:
+        response = self._session.post(f"{self.url}/work/{operation}", json=kwargs, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["result"]
+
+
+def install_routes(webserver: Any, queue: WorkQueue, secret: Optional[str] = WORK_QUEUE_SECRET) -> None:
+    """
+    Serves the worker calls of `queue` at `/work/<operation>` on the SDK's Flask
+    web server, so RemoteWorkQueue workers on other hosts can pull from it. Every
+    call must carry `Authorization: Bearer <secret>`; without a secret the routes
+    are not served, and only workers that open the queue file can work.
+    """
+    if not secret:
+        logging.warning("Work queue - WORK_QUEUE_SECRET not set, /work routes for remote workers disabled")
+        return
+    from flask import jsonify, request
+    expected = f"Bearer {secret}".encode("utf-8")
+
+    operations: Dict[str, Callable] = {
+        "claim": queue.claim,
+        "heartbeat": queue.heartbeat,
+        "update": queue.update,
+        "complete": queue.complete,
+        "configs": queue.configs,
+    }
+
+    def work(operation: str):
+        if not hmac.compare_digest(request.headers.get("Authorization", "").encode("utf-8"), expected):
+            return jsonify({"error": "Unauthorized"}), 401
+        call = operations.get(operation)
+        if call is None:
+            return jsonify({"error": f"Unknown operation: {operation}"}), 404
+        return jsonify({"result": call(**(request.get_json(silent=True) or {}))})
+
+    webserver.add_url_rule("/work/<operation>", "work", work, methods=["POST"])
+    logging.info("Work queue served at /work for remote workers")
+
+
+class WorkModel:
+    """The request/response/ray triple `execute` works on in a worker process."""
+
+    def __init__(self, request, response, ray):
+        self.request = request
+        self.response = response
+        self.ray = ray
+
+
+class Worker:
+    """
+    Worker executes rays claimed from a (local or remote) work queue.
+
+    Each of its `threads` claims one job at a time and runs `execute` on it with
+    the app's InputClass/OutputClass, pushing the ray's progress and messages back
+    at most every RAY_PUSH_INTERVAL seconds. A heartbeat thread renews its leases,
+    and user configurations published by the front-end are applied through
+    `configure` before the next job runs.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(
+        self,
+        queue: Any,
+        execute: Callable[[Any], None],
+        configure: Optional[Callable[[Dict[str, Any], Any], None]] = None,
+        threads: int = 1
+    ):
+        """
+        Args:
+            queue (Any): A WorkQueue or RemoteWorkQueue.
+            execute (Callable[[Any], None]): The app's execute callback.
+            configure (Optional[Callable[[Dict[str, Any], Any], None]]): The app's config callback.
+            threads (int): Jobs executed at once by this worker.
+        """
+        self.queue = queue
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._execute = execute
+        self._configure = configure
+        self._threads = max(1, threads)
+        self._config_version = 0
+        self._config_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._count_lock = threading.Lock()
+        self._claimed = 0
+        self.executed = 0
+
+    # ----------------------------------------------------------------------
+    def run(self, limit: Optional[int] = None) -> None:
+        """Works until `stop` is called, or until `limit` jobs were executed."""
+        logging.info("Work queue - worker %s started with %d threads", self.owner, self._threads)
+        threading.Thread(target=self._heartbeat, name="work-heartbeat", daemon=True).start()
+        threads = [
+            threading.Thread(target=self._work, args=(limit,), name=f"work-{index}", daemon=True)
+            for index in range(self._threads)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self._stop.set()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # ----------------------------------------------------------------------
+    def _work(self, limit: Optional[int]):
+        while not self._stop.is_set() and self._reserve(limit):
+            self._sync_configs()
+            job = self.queue.claim(self.owner)
+            if job is None:
+                self._release()
+                self._stop.wait(POLL_INTERVAL)
+                continue
+            try:
+                self._run(job)
+            except Exception:
+                # The lease runs out and the job is retried, up to MAX_ATTEMPTS
+                logging.exception("Work queue - could not run %s", job["qid"])
+            with self._count_lock:
+                self.executed += 1
+
+    def _reserve(self, limit: Optional[int]) -> bool:
+        # A thread takes a slot of the budget before claiming, so the threads never run more than `limit` jobs
+        with self._count_lock:
+            if limit is not None and self._claimed >= limit:
+                return False
+            self._claimed += 1
+            return True
+
+    def _release(self):
+        with self._count_lock:
+            self._claimed -= 1
+
+    def _run(self, job: Dict[str, Any]):
+        from openfabric_pysdk.context import MessageType, Ray, RaySchema, RayStatus
+        from ontology_dc8f06af066e4a7880a5938933236037.input import InputClassSchema
+        from ontology_dc8f06af066e4a7880a5938933236037.output import OutputClass, OutputClassSchema
+
+        qid = job["qid"]
+        ray = RaySchema().load(job["ray"]) if job["ray"] else Ray(qid=qid)
+        pushed = [0.0]
+
+        def push(current):
+            now = time.monotonic()
+            if now - pushed[0] >= RAY_PUSH_INTERVAL:
+                pushed[0] = now
+                if not self.queue.update(qid, self.owner, RaySchema().dump(current)):
+                    logging.warning("Work queue - lost the lease on %s", qid)
+
+        ray.status = RayStatus.RUNNING
+        ray.on_update(push)
+        output, error = None, None
+        start = time.time()
+        try:
+            model = WorkModel(InputClassSchema().load(json.loads(job["data"])), OutputClass(), ray)
+            self._execute(model)
+            output = OutputClassSchema().dump(model.response)
+            ray.status = RayStatus.COMPLETED
+        except Exception as e:
+            logging.exception("Work queue - execution of %s failed", qid)
+            error = str(e) or type(e).__name__
+            ray.message(MessageType.ERROR, error)
+            ray.status = RayStatus.FAILED
+        ray.on_update(None)
+        ray.complete()
+
+        if self.queue.complete(qid, self.owner, RaySchema().dump(ray), output, error):
+            logging.info("Work queue - executed %s in %.3fs", qid, time.time() - start)
+        else:
+            logging.warning("Work queue - result of %s discarded, its lease was lost", qid)
+
+    # ----------------------------------------------------------------------
+    def _heartbeat(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                self.queue.heartbeat(self.owner)
+            except Exception as e:
+                logging.warning("Work queue - heartbeat failed: %s", e)
+
+    def _sync_configs(self):
+        if self._configure is None:
+            return
+        with self._config_lock:
+            version, configs = self.queue.configs(self._config_version)
+            if configs is None:
+                return
+            from ontology_dc8f06af066e4a7880a5938933236037.config import ConfigClassSchema
+            schema = ConfigClassSchema()
+            self._configure({uid: schema.load(conf) for uid, conf in configs.items()}, None)
+            self._config_version = version
+            logging.info("Work queue - applied configuration version %d", version)
+
+
+_queue: Optional[WorkQueue] = None
+
+
+def shared_queue() -> Optional[WorkQueue]:
+    """Returns the queue installed by `install`, or None when rays execute locally."""
+    return _queue
+
+
+def install(mode: str = WORK_QUEUE, path: str = WORK_QUEUE_PATH) -> Optional[WorkQueue]:
+    """
+    In shared mode, turns this process into a front-end: the engine keeps
+    accepting rays through `Engine.prepare`, but hands each one to the shared
+    queue instead of executing it, and a sync thread applies the progress and
+    results published by the workers to the local rays and store, so every
+    front-end serves every result. Rays prepared by other front-ends are only
+    kept in memory once a client asks for them. Removing a ray cancels its job, and the user
+    configurations the SDK App receives are published to the workers.
+
+    Must run after `core.task_queue.install` and before `core.engine_pool.install`,
+    so the pool dispatches to the queue. The sync thread is an OS thread only if it
+    starts before the Flask stack monkey-patches threading.
+
+    Args:
+        mode (str): "shared", or anything else to keep executing locally.
+        path (str): The queue database.
+
+    Returns:
+        Optional[WorkQueue]: The shared queue, or None in local mode.
+    """
+    global _queue
+    if mode != "shared":
+        return None
+    from openfabric_pysdk.app import App
+    from openfabric_pysdk.context import RaySchema
+    from openfabric_pysdk.engine import engine as instance
+    from ontology_dc8f06af066e4a7880a5938933236037.config import ConfigClassSchema
+    engine_class = type(instance)
+    queue = _queue = WorkQueue(path)
+    delete, get_ray = engine_class.delete, engine_class.ray
+    # Rays this front-end holds in memory: the ones it prepared, restored or was polled for
+    watched = {ray.qid for ray in instance.rays()}
+
+    def ray(self, qid):
+        watched.add(qid)
+        return get_ray(self, qid)
+
+    def process(self, qid):
+        ray = self.ray(qid)
+        queue.submit(qid, ray.uid, self.read(qid, 'in'), RaySchema().dump(ray))
+        logging.info("Work queue - submitted %s", qid)
+
+    def remove(self, qid, app=None):
+        queue.cancel(qid)
+        removed = delete(self, qid, app)
+        watched.discard(qid)
+        return removed
+
+    configure = App.config_callback_function
+
+    def config_callback_function(self, config):
+        # The SDK calls this in the front-end, with every stored configuration
+        configure(self, config)
+        schema = ConfigClassSchema()
+        queue.publish_configs({uid: schema.dump(conf) for uid, conf in config.items()})
+
+    engine_class.ray = ray
+    engine_class.process = process
+    engine_class.delete = remove
+    App.config_callback_function = config_callback_function
+    threading.Thread(target=_sync, args=(queue, instance, watched), name="work-sync", daemon=True).start()
+    logging.info(f"Openfabric - executing rays through the shared work queue at {path}")
+    return queue
+
+
+def _sync(queue: WorkQueue, instance, watched: Set[str]) -> None:
+    # Only the jobs changed from now on are followed; those of the rays restored at boot are caught up once
+    cursor, pruned = queue.cursor(), time.monotonic()
+    _apply_all(instance, queue.jobs(sorted(watched)), watched)
+    while True:
+        try:
+            cursor, jobs = queue.changes(cursor)
+            _apply_all(instance, jobs, watched)
+            if time.monotonic() - pruned > JOB_RETENTION / 10:
+                pruned = time.monotonic()
+                queue.prune()
+        except Exception:
+            logging.exception("Work queue - result sync failed")
+            jobs = None
+        if not jobs:
+            time.sleep(POLL_INTERVAL)
+
+
+def _apply_all(instance, jobs: List[Dict[str, Any]], watched: Set[str]) -> None:
+    from openfabric_pysdk.context import Ray, RaySchema, RayStatus
+    for job in jobs:
+        if job["status"] == JobStatus.CANCELED:
+            continue
+        qid = job["qid"]
+        if qid in watched:
+            ray = instance.ray(qid)
+        elif job["status"] in FINISHED:
+            # Results of rays prepared by other front-ends are stored too, so any of them can serve them,
+            # but their rays are only kept in memory once a client asks for them
+            ray = RaySchema().load(job["ray"]) if job["ray"] else Ray(qid=qid)
+        else:
+            continue
+        _apply(instance, job, ray, RaySchema, RayStatus)
+
+
+def _apply(instance, job: Dict[str, Any], ray, schema, status) -> None:
+    qid = job["qid"]
+    if job["ray"]:
+        ray.update(schema().load(job["ray"]))
+    if job["status"] not in FINISHED:
+        return
+    if job["status"] == JobStatus.DONE:
+        instance.write(qid, 'out', job["output"])
+    else:
+        ray.status = status.FAILED
+        ray.complete()
+        logging.warning("Work queue - job %s failed: %s", qid, payload(job["error"]))
+    instance.write(qid, 'ray', ray, schema().dump)
+    instance.flush(qid)
+
+
+def _job(qid: str, status: str, ray: Optional[str], output: Optional[str], error: Optional[str], _seq: int) -> Dict:
+    return {"qid": qid, "status": status, "ray": _loads(ray), "output": _loads(output), "error": error}
+
+
+def _dumps(value: Any) -> Optional[str]:
+    return None if value is None else json.dumps(value)
+
+
+def _loads(value: Optional[str]) -> Any:
+    return None if value is None else json.loads(value)
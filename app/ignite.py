@@ -1,5 +1,56 @@
-from openfabric_pysdk.starter import Starter
+import sys
+
+from core.startup import report_and_exit, startup
+
+# `python ignite.py --profile-startup` starts as usual, prints how long each import
+# and startup phase took once the port is serving and recovery is done, and exits
+PROFILE_STARTUP = "--profile-startup" in sys.argv
+if PROFILE_STARTUP:
+    startup.profile_imports()
+
+PORT = 8888
+
+# Route logs through the structured writer first (LOG_MODE=structured), so every
+# later component logs through it
+with startup.phase("logging"):
+    from core.logs import install as install_logging
+    install_logging()
+
+# Swap in the log-structured store and the indexed task queue before the SDK
+# engine binds its Store and Task classes, then widen its worker into a pool.
+# When serving, persisted tasks are recovered only once the port is open.
+# The SDK engine (here) and the SDK web server with Flask (below) are still
+# imported before the port opens, since they are what serves it; only the
+# app's own heavy imports (memory store, remote app client, schema helpers)
+# are deferred to first use
+with startup.phase("store"):
+    from core.store import install as install_store
+    install_store()
+with startup.phase("engine"):
+    from core.task_queue import install as install_task_queue, recover as recover_tasks
+    from core.work_queue import install as install_work_queue, install_routes as install_work_routes
+    from core.engine_pool import install as install_engine_pool
+    from core.attachments import install as install_attachments, install_routes as install_attachment_routes
+    install_task_queue(defer_recovery=__name__ == '__main__')
+    # Inline attachments are moved to the blob store before rays are written
+    install_attachments()
+    # With WORK_QUEUE=shared, rays are handed to worker processes (worker.py) instead
+    work_queue = install_work_queue()
+    install_engine_pool()
+
+if __name__ == '__main__':
+    # Started before the Flask stack monkey-patches threading, so recovery runs on
+    # an OS thread and does not stall the gevent hub
+    startup.when_serving(PORT, (("recovery", recover_tasks),), report_and_exit if PROFILE_STARTUP else None)
+
+with startup.phase("webserver"):
+    from openfabric_pysdk.starter import Starter
+    from openfabric_pysdk.flask import webserver
+    from core.metrics import install as install_metrics
+    install_metrics(webserver)
+    install_attachment_routes(webserver)
+    if work_queue is not None:
+        install_work_routes(webserver, work_queue)
 
 if __name__ == '__main__':
-    PORT = 8888
     Starter.ignite(debug=False, host="0.0.0.0", port=PORT),
@@ -1,73 +1,24 @@
 import logging
 import time
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional
 
-import requests
 from ontology_dc8f06af066e4a7880a5938933236037.config import ConfigClass
 from ontology_dc8f06af066e4a7880a5938933236037.input import InputClass
-from ontology_dc8f06af066e4a7880a5938933236037.output import OutputClass
-from openfabric_pysdk.context import AppModel, State
-from core.stub import Stub
+from ontology_dc8f06af066e4a7880a5938933236037.output import BatchItemResult, OutputClass
+from openfabric_pysdk.context import AppModel, MessageType, State
+from core.attachments import handle, is_image, open_attachments
+from core.blob_store import Blob
+from core.deadline import Deadline
+from core.llm import LLMClient
+from core.logs import payload
+from core.registry import Clients, registry
+from core.session import session_memory
 
 # Configurations for the app
 configurations: Dict[str, ConfigClass] = {}
 
-############################################################
-# LLM Client Implementation
-############################################################
-class LLMClient:
-    def __init__(self, config: ConfigClass):
-        self.endpoint = config.llm_endpoint
-        # self.timeout = config.timeout
-        self.default_model = config.default_model
-        self.max_tokens = config.max_response_tokens
-        logging.info(f"LLMClient initialized with endpoint: {self.endpoint}")
-
-    def generate(
-        self,
-        prompt: str,
-        model: Optional[str] = None,
-        temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None,
-        stream: bool = False
-    ) -> Optional[Dict]:
-        """Generate text from the LLM"""
-        logging.info(f"Generating response for prompt: '{prompt[:50]}...'")  # Log first 50 characters of the prompt
-        
-        payload = {
-            "model": model or self.default_model,
-            "prompt": prompt,
-            "stream": stream,
-            "options": {
-                "temperature": temperature or 0.7,
-                "num_predict": max_tokens or self.max_tokens
-            }
-        }
-
-        try:
-            start_time = time.time()
-            logging.info(f"Sending request to LLM API at {self.endpoint}")
-            response = requests.post(
-                self.endpoint,
-                json=payload,
-                headers={"Content-Type": "application/json"},
-                # timeout=self.timeout
-            )
-            response.raise_for_status()
-
-            data = response.json()
-            generation_time = time.time() - start_time
-            logging.info(f"LLM API response received in {generation_time:.2f} seconds")
-
-            return {
-                "response": data.get("response"),
-                "model": data.get("model"),
-                "tokens_used": len(data.get("response", "").split()),
-                "generation_time": generation_time
-            }
-        except Exception as e:
-            logging.error(f"LLM request failed: {e}")
-            return None
+# Minimum interval (seconds) between partial output pushes while streaming
+STREAM_FLUSH_INTERVAL = 0.1
 
 ############################################################
 # Config callback function
@@ -78,6 +29,128 @@ def config(configuration: Dict[str, ConfigClass], state: State) -> None:
     for uid, conf in configuration.items():
         configurations[uid] = conf
         logging.info(f"Loaded config for user: {uid}")
+    registry.configure(configurations)
+    registry.warm_up()
+
+############################################################
+# Streaming helper
+############################################################
+def stream_llm(
+    model: AppModel,
+    llm_client: LLMClient,
+    request: InputClass,
+    prompt: str,
+    deadline: Optional[Deadline] = None,
+    context: Optional[List[int]] = None,
+    images: Optional[List[Blob]] = None
+) -> Optional[Dict]:
+    """
+    Streams the LLM answer to `prompt` into the response as it is generated. Partial text is
+    accumulated in `OutputClass.message` with `is_complete=False` and pushed to the
+    ray as messages at most every STREAM_FLUSH_INTERVAL seconds.
+
+    Returns:
+        Optional[Dict]: The final chunk, shaped like `LLMClient.generate`, or None.
+    """
+    response: OutputClass = model.response
+    response.is_complete = False
+    ray = getattr(model, 'ray', None)
+
+    parts, pending = [], []
+    last_flush = time.time()
+    for chunk in llm_client.generate_stream(
+        prompt=prompt,
+        model=request.model,
+        temperature=request.temperature,
+        max_tokens=request.max_tokens,
+        deadline=deadline,
+        context=context,
+        images=images
+    ):
+        response.time_to_first_token = chunk["time_to_first_token"]
+        parts.append(chunk["delta"])
+        pending.append(chunk["delta"])
+        if chunk["done"] or time.time() - last_flush >= STREAM_FLUSH_INTERVAL:
+            response.message = "".join(parts)
+            if ray is not None and any(pending):
+                ray.message(MessageType.INFO, "".join(pending))
+            pending.clear()
+            last_flush = time.time()
+        if chunk["done"]:
+            response.is_complete = True
+            return chunk
+    return None
+
+############################################################
+# Generated assets
+############################################################
+def asset(value: Any) -> Optional[str]:
+    """Returns how a generated image or 3D model is kept in memory: a handle for stored content."""
+    if value is None:
+        return None
+    return handle(value) if isinstance(value, Blob) else str(value)
+
+############################################################
+# Batch execution
+############################################################
+def execute_batch(model: AppModel, clients: Clients) -> None:
+    """
+    Runs every item of a batch request through the pipeline with bounded parallelism.
+    Each item's result is written to `OutputClass.items` as soon as it finishes, and
+    progress is reported on the ray's `batch` bar, so one ray carries the whole job.
+    """
+    request: InputClass = model.request
+    user_config: ConfigClass = clients.config
+    response: OutputClass = model.response
+    ray = getattr(model, 'ray', None)
+    total = len(request.batch)
+    logging.info(f"Received batch request with {total} items")
+
+    items = [
+        {
+            "prompt": item.prompt,
+            "model": item.model or request.model,
+            "temperature": item.temperature if item.temperature is not None else request.temperature,
+            "max_tokens": item.max_tokens or request.max_tokens
+        }
+        for item in request.batch
+    ]
+    response.items = [BatchItemResult(index=index) for index in range(total)]
+    response.is_complete = False
+
+    def on_result(index: int, result: Dict) -> None:
+        llm_response = result["llm"]
+        errors = result["errors"]
+        item = response.items[index]
+        item.status = "failed" if not llm_response else "partial" if errors else "completed"
+        item.expanded_prompt = result["expanded_prompt"]
+        item.stage_timings = result["timings"]
+        item.image = result.get("image")
+        item.model_3d = result.get("model_3d")
+        item.errors = errors or None
+        if llm_response:
+            item.message = llm_response["response"]
+            item.model = llm_response["model"]
+            item.tokens_used = llm_response.get("tokens_used")
+            item.generation_time = llm_response["generation_time"]
+        if ray is not None:
+            ray.progress('batch', step=1, total=total)
+            ray.message(MessageType.INFO, f"Batch item {index} {item.status}")
+
+    start = time.time()
+    clients.pipeline.run_batch(
+        items,
+        'super-user',
+        request.batch_parallelism or user_config.batch_parallelism,
+        user_config.timeout,
+        on_result
+    )
+
+    completed = sum(item.status == "completed" for item in response.items)
+    response.message = f"{completed}/{total} items completed"
+    response.generation_time = time.time() - start
+    response.is_complete = True
+    logging.info(f"Batch finished: {response.message} in {response.generation_time:.2f} seconds")
 
 ############################################################
 # Execution callback function
@@ -86,45 +159,118 @@ def execute(model: AppModel) -> None:
     """Main execution entry point"""
     logging.info("Execution started.")
 
+    # Pooled clients are built by the config callback and reused across requests
+    clients = registry.get('super-user')
+
     # Get input and config
     request: InputClass = model.request
-    logging.info(f"Received request with prompt: '{request.prompt[:50]}...'")  # Log first 50 characters of the prompt
-    
-    user_config: ConfigClass = configurations.get('super-user', ConfigClass())
-    
-    # Initialize components
-    logging.info("Initializing Stub and LLMClient.")
-    stub = Stub(user_config.app_ids)
-    llm_client = LLMClient(user_config)
-    
-    # Generate LLM response
-    llm_response = llm_client.generate(
-        prompt=request.prompt,
+    if request.batch:
+        execute_batch(model, clients)
+        logging.info("Execution finished.")
+        return
+    logging.info("Received request with prompt: %s", payload(request.prompt, 50))  # Log first 50 characters of the prompt
+
+    user_config: ConfigClass = clients.config
+    llm_client = clients.llm
+    pipeline = clients.pipeline
+    ray = getattr(model, 'ray', None)
+    # Long-term memory is kept per user; anonymous requests neither recall nor add to it
+    uid = getattr(ray, 'uid', None)
+
+    # One deadline bounds the whole request; every stage gets the time that is left
+    deadline = Deadline(user_config.timeout)
+
+    # Attachments are referenced by handle and read from the blob store's memory maps;
+    # images go to the model along with the prompt
+    try:
+        attachments = open_attachments(request.attachments, deadline=deadline)
+    except Exception as e:
+        logging.error(f"Attachments could not be read: {e}")
+        model.response.message = f"Sorry, an attachment could not be read: {e}"
+        model.response.is_complete = True
+        return
+    images = [blob for blob in attachments if is_image(blob)] or None
+
+    # Recall relevant long-term memories within the configured latency budget
+    memories = []
+    if clients.memory is not None and uid:
+        memories = clients.memory.recall(
+            request.prompt,
+            uid=uid,
+            k=user_config.memory_top_k,
+            budget=user_config.memory_budget_ms / 1000,
+            embed=clients.embed
+        )
+
+    # Continue the session's conversation: reuse Ollama's context, or replay a compact history.
+    # Requests without a session id share nothing, so anonymous callers never see each other's turns
+    sid = getattr(ray, 'sid', None)
+    context, history = None, ""
+    if user_config.session_memory and sid:
+        context, history = session_memory.begin(sid, request.model or user_config.default_model)
+
+    # Expand the prompt (or answer it, without a text-to-image app), streaming to the client when requested
+    llm_response = None
+    if request.stream:
+        llm_response = stream_llm(
+            model,
+            llm_client,
+            request,
+            pipeline.llm_prompt(request.prompt, memories, history),
+            deadline,
+            context,
+            images
+        )
+
+    # Chain prompt expansion -> text-to-image -> image-to-3D
+    result = pipeline.run(
+        request.prompt,
+        'super-user',
+        llm_response,
+        deadline,
         model=request.model,
         temperature=request.temperature,
         max_tokens=request.max_tokens,
-        stream=request.stream
+        memories=memories,
+        history=history,
+        context=context,
+        images=images
     )
-    
+    llm_response = result["llm"]
+
     # Prepare output
     response: OutputClass = model.response
+    response.is_complete = True
+    response.expanded_prompt = result["expanded_prompt"]
+    response.stage_timings = result["timings"]
+    # Stored assets are returned as `blob:<sha256>` handles (see OutputClassSchema)
+    response.image = result.get("image")
+    response.model_3d = result.get("model_3d")
     if llm_response:
         response.message = llm_response["response"]
         response.model = llm_response["model"]
-        response.tokens_used = llm_response["tokens_used"]
+        response.tokens_used = llm_response.get("tokens_used")
+        response.prompt_tokens = llm_response.get("prompt_tokens")
+        response.tokens_per_second = llm_response.get("tokens_per_second")
         response.generation_time = llm_response["generation_time"]
-        logging.info(f"LLM response generated successfully with {response.tokens_used} tokens used.")
+        logging.info("LLM response generated successfully with %s tokens used.", response.tokens_used)
     else:
         response.message = "Sorry, I couldn't process your request."
         logging.error("LLM response generation failed.")
 
-    # Optional: Call other apps through stub if needed
-    if user_config.app_ids:
-        try:
-            logging.info(f"Calling other apps through stub: {user_config.app_ids[0]}")
-            stub_result = stub.call(user_config.app_ids[0], {"prompt": request.prompt})
-            logging.info(f"Stub call result: {stub_result}")
-        except Exception as e:
-            logging.warning(f"Stub call failed: {e}")
+    if user_config.session_memory and sid and llm_response:
+        session_memory.record(sid, request.prompt, llm_response, user_config.session_token_budget)
+
+    # Remember this generation for later recall
+    if clients.memory is not None and uid and llm_response:
+        clients.memory.remember(
+            request.prompt,
+            expanded_prompt=result["expanded_prompt"],
+            response=llm_response["response"],
+            assets={"image": asset(response.image), "model_3d": asset(response.model_3d)},
+            uid=uid,
+            sid=getattr(ray, 'sid', None),
+            embed=clients.embed
+        )
 
     logging.info("Execution finished.")
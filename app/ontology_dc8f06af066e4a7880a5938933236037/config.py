@@ -1,6 +1,6 @@
 import logging
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Any, List, Optional
 from marshmallow import Schema, fields, post_load
 from openfabric_pysdk.utility import SchemaUtil
 
@@ -12,16 +12,54 @@ logger = logging.getLogger(__name__)
 class ConfigClass:
     app_ids: Optional[List[str]] = None
     llm_endpoint: str = "http://localhost:11434/api/generate"  # Default value
+    llm_endpoints: Optional[List[Any]] = None  # Pool of hosts (URLs or {"url", "models"}); overrides llm_endpoint
+    llm_health_interval: float = 10.0  # Seconds between health checks of pooled hosts
     default_model: str = "llama3"  # Default value
     max_response_tokens: int = 1024  # Default value
     timeout: float = 30.0  # Default value
+    hedging: bool = False  # Duplicate calls slower than their recent p95 latency; first answer wins
+    pipeline_concurrency: int = 4  # Max in-flight requests per pipeline stage
+    batch_parallelism: int = 8  # Items of a batch request processed at once
+    response_cache: bool = True  # Cache LLM responses
+    response_cache_ttl: float = 86400.0  # Seconds a cached response stays valid
+    response_cache_size: int = 1024  # Cached responses kept in memory
+    cache_sampled_responses: bool = False  # Also cache temperature > 0 responses
+    memory: bool = True  # Recall and store long-term memories
+    memory_top_k: int = 3  # Memories injected into the prompt
+    memory_budget_ms: float = 50.0  # Soft time budget for memory recall
+    embedding_model: str = "nomic-embed-text"  # Model used for memory embeddings
+    session_memory: bool = True  # Carry the conversation over between requests of a session
+    session_token_budget: int = 2048  # Tokens of conversation kept before older turns are compacted
+    warm_up: bool = True  # Preload configured models when the configuration changes
+    keep_alive: str = "30m"  # How long Ollama keeps a model loaded ("-1m" keeps it loaded)
+    batch_window_ms: float = 5.0  # Window for grouping concurrent prompts per model (0 disables)
+    llm_parallelism: int = 4  # Max concurrent generations per model sent to the backend
 
 class ConfigClassSchema(Schema):
     app_ids = fields.List(fields.String(), allow_none=True)
     llm_endpoint = fields.String(required=False, missing="http://localhost:11434/api/generate")
+    llm_endpoints = fields.List(fields.Raw(), allow_none=True, missing=None)
+    llm_health_interval = fields.Float(required=False, missing=10.0)
     default_model = fields.String(required=False, missing="llama3")
     max_response_tokens = fields.Integer(required=False, missing=1024)
     timeout = fields.Float(required=False, missing=30.0)
+    hedging = fields.Boolean(required=False, missing=False)
+    pipeline_concurrency = fields.Integer(required=False, missing=4)
+    batch_parallelism = fields.Integer(required=False, missing=8)
+    response_cache = fields.Boolean(required=False, missing=True)
+    response_cache_ttl = fields.Float(required=False, missing=86400.0)
+    response_cache_size = fields.Integer(required=False, missing=1024)
+    cache_sampled_responses = fields.Boolean(required=False, missing=False)
+    memory = fields.Boolean(required=False, missing=True)
+    memory_top_k = fields.Integer(required=False, missing=3)
+    memory_budget_ms = fields.Float(required=False, missing=50.0)
+    embedding_model = fields.String(required=False, missing="nomic-embed-text")
+    session_memory = fields.Boolean(required=False, missing=True)
+    session_token_budget = fields.Integer(required=False, missing=2048)
+    warm_up = fields.Boolean(required=False, missing=True)
+    keep_alive = fields.String(required=False, missing="30m")
+    batch_window_ms = fields.Float(required=False, missing=5.0)
+    llm_parallelism = fields.Integer(required=False, missing=4)
 
     @post_load
     def create(self, data, **kwargs):
@@ -3,9 +3,26 @@ from datetime import *
 from typing import *
 
 from dataclasses import dataclass
-from marshmallow import Schema, fields, post_load
+from marshmallow import Schema, ValidationError, fields, post_load, validates_schema
 from openfabric_pysdk.utility import SchemaUtil
 
+@dataclass
+class BatchItem:
+    prompt: str = None
+    model: str = None  # Overrides the request's model for this item
+    temperature: float = None  # Overrides the request's temperature for this item
+    max_tokens: int = None  # Overrides the request's max_tokens for this item
+
+class BatchItemSchema(Schema):
+    prompt = fields.String(required=True)
+    model = fields.String(allow_none=True, missing=None)
+    temperature = fields.Float(allow_none=True, missing=None)
+    max_tokens = fields.Integer(allow_none=True, missing=None)
+
+    @post_load
+    def create(self, data, **kwargs):
+        return SchemaUtil.create(BatchItem(), data)
+
 @dataclass
 class InputClass:
     prompt: str = None
@@ -14,14 +31,23 @@ class InputClass:
     temperature: float = 0.7
     max_tokens: int = 512
     stream: bool = False
+    batch: List[BatchItem] = None  # Many prompts in one request; `prompt` is ignored when set
+    batch_parallelism: int = None  # Items processed at once; defaults to the configured value
 
 class InputClassSchema(Schema):
-    prompt = fields.String(required=True)
+    prompt = fields.String(allow_none=True, missing=None)
     attachments = fields.List(fields.String(), allow_none=True)
     model = fields.String(allow_none=True, missing=None)
     temperature = fields.Float(allow_none=True, missing=0.7)
     max_tokens = fields.Integer(allow_none=True, missing=512)
     stream = fields.Boolean(allow_none=True, missing=False)
+    batch = fields.List(fields.Nested(BatchItemSchema), allow_none=True, missing=None)
+    batch_parallelism = fields.Integer(allow_none=True, missing=None)
+
+    @validates_schema
+    def validate_prompt(self, data, **kwargs):
+        if not data.get("prompt") and not data.get("batch"):
+            raise ValidationError("Either prompt or batch is required.", "prompt")
 
     @post_load
     def create(self, data, **kwargs):
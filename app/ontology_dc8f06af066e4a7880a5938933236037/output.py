@@ -1,6 +1,6 @@
 import logging
 from dataclasses import dataclass
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from marshmallow import Schema, fields, post_load
 from openfabric_pysdk.utility import SchemaUtil
 
@@ -8,19 +8,80 @@ from openfabric_pysdk.utility import SchemaUtil
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class Asset(fields.String):
+    """
+    A generated image or 3D model. Content kept in the blob store is written as its
+    `blob:<sha256>` handle, downloadable from `GET /attachments/<sha256>` and usable
+    as an attachment of a later request; other values are written as strings.
+    """
+
+    def _serialize(self, value, attr, obj, **kwargs):
+        from core.attachments import handle
+        from core.blob_store import Blob
+        if isinstance(value, Blob):
+            value = handle(value)
+        return super()._serialize(value, attr, obj, **kwargs)
+
+@dataclass
+class BatchItemResult:
+    index: int = None  # Position of the item in the request's batch
+    status: str = "pending"  # pending, completed, partial (a later stage failed) or failed
+    message: Optional[str] = None
+    model: Optional[str] = None
+    expanded_prompt: Optional[str] = None
+    image: Optional[Any] = None  # Blob or value returned by the app; serialized by Asset
+    model_3d: Optional[Any] = None
+    tokens_used: Optional[int] = None
+    generation_time: Optional[float] = None
+    stage_timings: Optional[Dict[str, float]] = None
+    errors: Optional[Dict[str, str]] = None
+
+class BatchItemResultSchema(Schema):
+    index = fields.Integer()
+    status = fields.String()
+    message = fields.String(allow_none=True)
+    model = fields.String(allow_none=True)
+    expanded_prompt = fields.String(allow_none=True)
+    image = Asset(allow_none=True)
+    model_3d = Asset(allow_none=True)
+    tokens_used = fields.Integer(allow_none=True)
+    generation_time = fields.Float(allow_none=True)
+    stage_timings = fields.Dict(keys=fields.String(), values=fields.Float(), allow_none=True)
+    errors = fields.Dict(keys=fields.String(), values=fields.String(), allow_none=True)
+
+    @post_load
+    def create(self, data, **kwargs):
+        return SchemaUtil.create(BatchItemResult(), data)
+
 @dataclass
 class OutputClass:
     message: str = None
     model: Optional[str] = None
     tokens_used: Optional[int] = None
+    prompt_tokens: Optional[int] = None
+    tokens_per_second: Optional[float] = None
     generation_time: Optional[float] = None
+    time_to_first_token: Optional[float] = None
+    expanded_prompt: Optional[str] = None
+    image: Optional[Any] = None  # Generated image (text-to-image app); serialized by Asset
+    model_3d: Optional[Any] = None  # Generated 3D model (image-to-3D app); serialized by Asset
+    stage_timings: Optional[Dict[str, float]] = None
+    items: Optional[List[BatchItemResult]] = None  # Per-item results of a batch request
     is_complete: bool = True
 
 class OutputClassSchema(Schema):
     message = fields.String(allow_none=True, missing=None)
     model = fields.String(allow_none=True, missing=None)
     tokens_used = fields.Integer(allow_none=True)
+    prompt_tokens = fields.Integer(allow_none=True)
+    tokens_per_second = fields.Float(allow_none=True)
     generation_time = fields.Float(allow_none=True)
+    time_to_first_token = fields.Float(allow_none=True)
+    expanded_prompt = fields.String(allow_none=True)
+    image = Asset(allow_none=True)
+    model_3d = Asset(allow_none=True)
+    stage_timings = fields.Dict(keys=fields.String(), values=fields.Float(), allow_none=True)
+    items = fields.List(fields.Nested(BatchItemResultSchema), allow_none=True)
     is_complete = fields.Boolean(allow_none=True)
 
     @post_load
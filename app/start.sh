@@ -3,6 +3,11 @@
 start_sh_server
 start_code_server
 
+# Metrics of the previous run must not be aggregated into this one
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 python3 ./ignite.py
 
 infinite_loop
\ No newline at end of file
@@ -0,0 +1,112 @@
+import base64
+import hashlib
+import json
+
+import pytest
+
+from core import attachments
+from core.blob_store import BlobStore
+from ontology_dc8f06af066e4a7880a5938933236037.output import BatchItemResult, OutputClass, OutputClassSchema
+
+flask = pytest.importorskip("flask")
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(str(tmp_path / "blobs"), max_bytes=1024 ** 2)
+
+
+def client(store: BlobStore, secret=None):
+    app = flask.Flask(__name__)
+    attachments.install_routes(app, store, secret)
+    return app.test_client()
+
+
+# --------------------------------------------------------------------------
+def test_generated_assets_are_returned_as_handles(store):
+    image = store.put(b"\x89PNG\r\n\x1a\n" + b"0" * 64, "image/png")
+    model = store.put(b"glTF" + b"1" * 64, "model/gltf-binary")
+    response = OutputClass(message="ok", image=image, model_3d=model, items=[BatchItemResult(index=0, image=image)])
+
+    output = OutputClassSchema().dump(response)
+    assert output["image"] == f"blob:{image.digest}"
+    assert output["model_3d"] == f"blob:{model.digest}"
+    assert output["items"][0]["image"] == f"blob:{image.digest}"
+    # Values the apps returned as they are pass through unchanged
+    assert OutputClassSchema().dump(OutputClass(image="https://cdn/image.png"))["image"] == "https://cdn/image.png"
+
+
+def test_handles_are_downloadable_without_the_upload_secret(store):
+    image = store.put(b"\x89PNG\r\n\x1a\n" + b"0" * 64, "image/png")
+    http = client(store, secret=None)
+
+    response = http.get(f"/attachments/{image.digest}")
+    assert response.status_code == 200
+    assert hashlib.sha256(response.data).hexdigest() == image.digest
+    assert http.get(f"/attachments/{'0' * 64}").status_code == 404
+    # Uploads stay disabled without a secret
+    assert http.post("/attachments", data=b"content").status_code in (404, 405)
+
+
+# --------------------------------------------------------------------------
+def test_uploads_require_the_secret(store):
+    http = client(store, secret="s3cret")
+    auth = {"Authorization": "Bearer s3cret"}
+
+    assert http.post("/attachments", data=b"content").status_code == 401
+    assert http.post("/attachments", data=b"content", headers={"Authorization": "Bearer guess"}).status_code == 401
+    response = http.post("/attachments", data=b"content", headers=auth)
+    assert response.status_code == 201
+    assert response.get_json()["handle"] == f"blob:{hashlib.sha256(b'content').hexdigest()}"
+
+
+def test_chunked_upload_checks_offsets_and_content(store):
+    http = client(store, secret="s3cret")
+    auth = {"Authorization": "Bearer s3cret"}
+    upload = http.post("/attachments/uploads", headers=auth).get_json()["upload"]
+
+    assert http.put(f"/attachments/uploads/{upload}?offset=0", data=b"hello ", headers=auth).get_json()["size"] == 6
+    assert http.put(f"/attachments/uploads/{upload}?offset=0", data=b"again", headers=auth).status_code == 409
+    assert http.put(f"/attachments/uploads/{upload}?offset=6", data=b"world", headers=auth).status_code == 200
+    digest = hashlib.sha256(b"hello world").hexdigest()
+    assert http.post(f"/attachments/uploads/{upload}/commit?sha256={'0' * 64}", headers=auth).status_code == 422
+
+    upload = http.post("/attachments/uploads", headers=auth).get_json()["upload"]
+    http.put(f"/attachments/uploads/{upload}?offset=0", data=b"hello world", headers=auth)
+    response = http.post(f"/attachments/uploads/{upload}/commit?sha256={digest}", headers=auth)
+    assert response.get_json()["handle"] == f"blob:{digest}"
+
+
+def test_open_uploads_are_bounded(tmp_path):
+    http = client(BlobStore(str(tmp_path / "blobs"), max_uploads=1), secret="s3cret")
+    auth = {"Authorization": "Bearer s3cret"}
+
+    assert http.post("/attachments/uploads", headers=auth).status_code == 201
+    assert http.post("/attachments/uploads", headers=auth).status_code == 429
+
+
+def test_urls_are_only_fetched_from_allowed_hosts(store, monkeypatch):
+    monkeypatch.setattr(attachments, "URL_HOSTS", frozenset({"cdn.example.com"}))
+    fetched = []
+    monkeypatch.setattr(store, "fetch", lambda url, **kwargs: fetched.append((url, kwargs)))
+
+    with pytest.raises(ValueError):
+        attachments.open_attachment("http://169.254.169.254/latest/meta-data", store)
+    attachments.open_attachment("https://CDN.example.com/image.png", store)
+    assert fetched == [("https://CDN.example.com/image.png", {"deadline": None, "allow_redirects": False})]
+
+
+def test_inline_attachments_are_stored_and_pinned(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"), max_bytes=4096)
+    content = b"\x89PNG\r\n\x1a\n" + b"0" * 2048
+    data = '{"prompt": "describe", "attachments": ["data:image/png;base64,%s"]}' % base64.b64encode(content).decode()
+
+    request = json.loads(attachments.externalize(data, store))
+    digest = hashlib.sha256(content).hexdigest()
+    assert request["attachments"] == [f"blob:{digest}"]
+    assert attachments.is_image(attachments.open_attachment(request["attachments"][0], store))
+
+    # Filling the store evicts other blobs, but not the one the queued ray references
+    store.put(b"1" * 2048)
+    store.put(b"2" * 2048)
+    assert store.get(digest) is not None
@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+from core.batcher import GenerationBatcher
+from core.deadline import DeadlineExceeded
+
+
+def submit_all(batcher: GenerationBatcher, model: str, count: int, generate) -> list:
+    results = [None] * count
+
+    def call(index):
+        results[index] = batcher.submit(model, lambda: generate(index), timeout=5)
+
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+# --------------------------------------------------------------------------
+def test_concurrent_prompts_are_released_together():
+    batcher = GenerationBatcher(window=0.1, parallelism=4)
+
+    assert submit_all(batcher, "llama3", 4, lambda index: {"response": index}) == [{"response": i} for i in range(4)]
+    assert batcher.batches == 1
+    assert batcher.batched == 4
+    batcher.close()
+
+
+def test_backend_calls_are_bounded_per_model():
+    batcher = GenerationBatcher(window=0.01, parallelism=2)
+    lock, running, peak = threading.Lock(), [0], [0]
+
+    def generate(index):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return {"response": index}
+
+    assert len(submit_all(batcher, "llama3", 6, generate)) == 6
+    assert peak[0] == 2
+    batcher.close()
+
+
+def test_generation_queued_past_its_deadline_is_dropped():
+    batcher = GenerationBatcher(window=0.01, parallelism=1)
+    release, calls = threading.Event(), []
+    blocker = threading.Thread(target=batcher.submit, args=("llama3", lambda: release.wait(5)))
+    blocker.start()
+    time.sleep(0.05)
+
+    with pytest.raises(DeadlineExceeded):
+        batcher.submit("llama3", lambda: calls.append(1), timeout=0.05)
+    release.set()
+    blocker.join(5)
+    # The worker is free again, but the abandoned generation is never sent
+    assert batcher.submit("llama3", lambda: {"response": "ok"}, timeout=5) == {"response": "ok"}
+    assert calls == []
+    batcher.close()
@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+from core.deadline import Deadline, DeadlineExceeded, LatencyTracker
+from test_llm import FakeResponse, FakeSession, client, tokens
+
+
+class SlowResponse(FakeResponse):
+    """Streams a token every 50 ms, recording whether the reader gave up."""
+
+    def __init__(self):
+        super().__init__(lines=tokens(*["token "] * 40))
+        self.closed_early = False
+
+    def iter_lines(self):
+        for line in self.lines:
+            time.sleep(0.05)
+            yield line
+
+    def __exit__(self, exc_type, *exc):
+        self.closed_early = exc_type is not None
+        return False
+
+
+# --------------------------------------------------------------------------
+def test_timeouts_are_derived_from_the_time_left():
+    assert Deadline().timeout(30) == 30
+    assert Deadline(0.5).timeout(30) <= 0.5
+    assert Deadline(60).timeout(30) == 30
+
+    expired = Deadline(0.01)
+    time.sleep(0.02)
+    with pytest.raises(DeadlineExceeded):
+        expired.timeout(30)
+    with pytest.raises(DeadlineExceeded):
+        expired.check("test")
+
+
+def test_p95_is_only_trusted_after_enough_samples():
+    latency = LatencyTracker()
+    for index in range(19):
+        latency.record(index / 100)
+    assert latency.p95() is None
+
+    latency.record(1.0)
+    assert latency.p95() == 0.18
+
+
+def test_expired_deadline_skips_the_backend():
+    session = FakeSession(gpu=lambda payload: FakeResponse({"response": "ok"}))
+    deadline = Deadline(0.01)
+    time.sleep(0.02)
+
+    assert client(session, "gpu").generate("hi", deadline=deadline) is None
+    assert session.calls == []
+
+
+def test_slow_call_is_hedged_and_the_loser_cancelled():
+    slow = SlowResponse()
+    session = FakeSession(one=lambda payload: slow, two=lambda payload: FakeResponse(lines=tokens("fast")))
+    llm = client(session, "one", "two", hedging=True)
+    one, two = llm.router.backends
+    one.latency, two.latency = 0.01, 0.02
+    for _ in range(20):
+        llm.router.latency.record(0.01)
+
+    start = time.monotonic()
+    result = llm.generate("hi", deadline=Deadline(5))
+
+    assert result["response"] == "fast"
+    assert time.monotonic() - start < 1
+    assert [host for host, _ in session.calls] == ["one", "two"]
+    deadline = time.monotonic() + 2
+    while not slow.closed_early and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert slow.closed_early
@@ -0,0 +1,106 @@
+import importlib
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from core import engine_pool
+from core.engine_pool import InProcessExecutor, PoolMetrics
+
+context = pytest.importorskip("openfabric_pysdk.context")
+
+
+class FakeEngine:
+    def __init__(self, **inputs):
+        self.inputs, self.rays, self.store = inputs, {}, {}
+
+    def ray(self, qid):
+        return self.rays.setdefault(qid, context.Ray(qid=qid))
+
+    def read(self, qid, key):
+        return self.inputs.get(qid)
+
+    def write(self, qid, key, value, serializer=None):
+        self.store[(qid, key)] = serializer(value) if serializer else value
+
+    def flush(self, qid):
+        pass
+
+
+@pytest.fixture
+def app(monkeypatch):
+    app = types.ModuleType("fake_app")
+    monkeypatch.setitem(sys.modules, "fake_app", app)
+    return app
+
+
+# --------------------------------------------------------------------------
+def test_rays_execute_in_process_by_default(monkeypatch):
+    monkeypatch.delenv("ENGINE_EXECUTION", raising=False)
+    try:
+        assert importlib.reload(engine_pool).EXECUTION_MODE == "inprocess"
+    finally:
+        importlib.reload(engine_pool)
+
+
+def test_rays_execute_at_once_on_the_pool_threads(app):
+    barrier = threading.Barrier(2, timeout=5)
+
+    def execute(model):
+        # Only returns once both rays are executing
+        barrier.wait()
+        model.response.message = f"{model.request.prompt} on {threading.current_thread().name}"
+
+    app.execute = execute
+    engine = FakeEngine(a='{"prompt": "one"}', b='{"prompt": "two"}')
+    executor = InProcessExecutor("fake_app:execute", "")
+    threads = [threading.Thread(target=executor.execute, args=(engine, qid), name=qid) for qid in "ab"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert engine.store[("a", "out")]["message"] == "one on a"
+    assert engine.store[("b", "out")]["message"] == "two on b"
+    assert engine.rays["a"].status == context.RayStatus.COMPLETED
+
+
+def test_failed_execution_fails_the_ray(app):
+    def execute(model):
+        raise RuntimeError("backend down")
+
+    app.execute = execute
+    engine = FakeEngine(a='{"prompt": "one"}')
+    InProcessExecutor("fake_app:execute", "").execute(engine, "a")
+
+    assert engine.rays["a"].status == context.RayStatus.FAILED
+    assert engine.store[("a", "ray")]["status"] == "FAILED"
+    assert InProcessExecutor("fake_app:execute", "").execute(engine, "missing") is None
+
+
+def test_executions_wait_for_a_pending_configuration(app):
+    events = []
+
+    def config(configuration, state):
+        time.sleep(0.05)
+        events.append(("config", configuration))
+
+    app.config, app.execute = config, lambda model: events.append(("execute", model.request.prompt))
+    executor = InProcessExecutor("fake_app:execute", "fake_app:config")
+    executor.configure({"u1": "conf"}, None)
+    executor.execute(FakeEngine(a='{"prompt": "one"}'), "a")
+
+    assert events == [("config", {"u1": "conf"}), ("execute", "one")]
+
+
+def test_pool_metrics_split_queue_wait_from_execution():
+    metrics = PoolMetrics(size=1)
+    for qid in ("a", "b"):
+        metrics.started()
+        metrics.finished(qid, 0.5, 1.5)
+
+    assert metrics.ray("a") is None
+    assert metrics.ray("b") == {"queue_wait": 0.5, "execution": 1.5}
+    assert metrics.stats() == {"in_flight": 0, "executed": 2, "mean_queue_wait": 0.5, "mean_execution": 1.5}
@@ -0,0 +1,100 @@
+import json
+from typing import Callable, Dict, List
+
+import requests
+
+from core.llm import LLMClient
+from ontology_dc8f06af066e4a7880a5938933236037.config import ConfigClass
+
+
+class FakeResponse:
+    def __init__(self, body=None, lines: List[Dict] = (), status: int = 200):
+        self.body, self.lines, self.status_code = body, [json.dumps(line).encode() for line in lines], status
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            error = requests.HTTPError(f"{self.status_code} error")
+            error.response = self
+            raise error
+
+    def json(self):
+        return self.body
+
+    def iter_lines(self):
+        yield from self.lines
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    """Answers each host with `hosts[base](payload)`, recording every call."""
+
+    def __init__(self, **hosts: Callable[[Dict], FakeResponse]):
+        self.hosts = hosts
+        self.calls: List[tuple] = []
+
+    def post(self, url, json=None, headers=None, timeout=None, stream=False):
+        host = url.split("//", 1)[1].split(":", 1)[0]
+        self.calls.append((host, json))
+        return self.hosts[host](json)
+
+
+def client(session: FakeSession, *hosts: str, **fields) -> LLMClient:
+    endpoints = [f"http://{host}:11434/api/generate" for host in hosts]
+    return LLMClient(ConfigClass(llm_endpoints=endpoints, **fields), session)
+
+
+def tokens(*parts: str, **final) -> List[Dict]:
+    lines = [{"model": "llama3", "response": part, "done": False} for part in parts]
+    return lines + [{"model": "llama3", "response": "", "done": True, "eval_count": len(parts), **final}]
+
+
+# --------------------------------------------------------------------------
+def test_tokens_are_streamed_as_they_arrive():
+    session = FakeSession(gpu=lambda payload: FakeResponse(lines=tokens("Hel", "lo", context=[1, 2])))
+    chunks = list(client(session, "gpu").generate_stream("hi"))
+
+    assert [chunk["delta"] for chunk in chunks] == ["Hel", "lo", ""]
+    assert not any(chunk["done"] for chunk in chunks[:-1])
+    final = chunks[-1]
+    assert final["done"] and final["response"] == "Hello"
+    assert final["time_to_first_token"] is not None
+    assert final["tokens_used"] == 2 and final["context"] == [1, 2]
+    assert session.calls[0][1]["stream"] is True
+
+
+def test_streamed_generate_returns_the_aggregated_answer():
+    session = FakeSession(gpu=lambda payload: FakeResponse(lines=tokens("a ", "dragon")))
+    result = client(session, "gpu").generate("draw", stream=True)
+
+    assert result["response"] == "a dragon"
+    assert result["tokens_used"] == 2
+
+
+def test_stream_error_line_ends_the_generation():
+    session = FakeSession(gpu=lambda payload: FakeResponse(lines=[{"error": "model not found"}]))
+
+    assert list(client(session, "gpu").generate_stream("hi")) == []
+    assert client(session, "gpu").generate("hi", stream=True) is None
+
+
+def test_warm_up_loads_the_model_on_every_host_serving_it():
+    session = FakeSession(
+        one=lambda payload: FakeResponse({}), two=lambda payload: FakeResponse(status=500)
+    )
+    llm = client(session, "one", "two", keep_alive="-1m")
+
+    assert not llm.warm_up()
+    assert [host for host, _ in session.calls] == ["one", "two"]
+    assert session.calls[0][1] == {"model": "llama3", "prompt": "", "stream": False, "keep_alive": "-1m"}
+
+
+def test_generations_keep_the_model_loaded():
+    session = FakeSession(gpu=lambda payload: FakeResponse({"response": "ok", "model": "llama3"}))
+
+    assert client(session, "gpu", keep_alive="1h").generate("hi")["response"] == "ok"
+    assert session.calls[0][1]["keep_alive"] == "1h"
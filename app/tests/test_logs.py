@@ -0,0 +1,48 @@
+import json
+import logging
+import queue
+
+from core.logs import SAMPLED, QueueHandler, SamplingFilter, StructuredFormatter, clip, payload
+
+
+def record(msg: str, *args, level: int = logging.INFO, **extra) -> logging.LogRecord:
+    entry = logging.LogRecord("app", level, __file__, 1, msg, args, None)
+    entry.__dict__.update(extra)
+    return entry
+
+
+# --------------------------------------------------------------------------
+def test_payloads_are_bounded_and_rendered_lazily():
+    text = "x" * 1000
+    assert len(str(payload(text, 10))) < 60
+    assert str(payload({"prompt": text, "image": b"..."})) == "{keys: ['prompt', 'image']}"
+    assert str(payload(b"\x00" * 2048)) == "<2048 bytes>"
+    assert clip("short") == "short"
+    assert clip(text, 10) != clip("y" * 1000, 10)
+
+
+def test_only_marked_lines_are_sampled():
+    sampler = SamplingFilter(every=3)
+    kept = [sampler.filter(record("Sending request to %s", host, **SAMPLED)) for host in "abcdef"]
+    assert kept == [True, False, False, True, False, False]
+    assert sampler.dropped == 4
+
+    assert all(sampler.filter(record("Received request %s", qid)) for qid in "abcdef")
+    assert sampler.filter(record("Sending request to %s", "g", level=logging.WARNING, **SAMPLED))
+
+
+def test_structured_lines_carry_the_extra_fields():
+    line = json.loads(StructuredFormatter().format(record("ray %s done", "q1", qid="q1", elapsed=0.5)))
+
+    assert line["msg"] == "ray q1 done"
+    assert line["level"] == "INFO"
+    assert line["qid"] == "q1" and line["elapsed"] == 0.5
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = QueueHandler(queue.Queue(1))
+    handler.handle(record("first"))
+    handler.handle(record("second"))
+
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 1
@@ -0,0 +1,55 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from core.memory import MemoryStore  # noqa: E402
+
+VECTORS = {"dragon": [1.0, 0.0, 0.0], "castle": [0.0, 1.0, 0.0], "wyvern": [0.9, 0.1, 0.0]}
+
+
+def embed(text, deadline=None):
+    return next((vector for word, vector in VECTORS.items() if word in text), [0.0, 0.0, 1.0])
+
+
+@pytest.fixture
+def memory(tmp_path):
+    return MemoryStore(str(tmp_path), embed=embed)
+
+
+def remember(memory: MemoryStore, *entries):
+    for prompt, uid in entries:
+        memory.remember(prompt, response=f"made {prompt}", uid=uid)
+    # Memories are written in the background, in order
+    memory._writer.submit(lambda: None).result()
+
+
+# --------------------------------------------------------------------------
+def test_recall_merges_text_and_vector_hits(memory):
+    remember(memory, ("a red dragon", "alice"), ("a stone castle", "alice"))
+
+    # "wyvern" shares no word with the memories, only their embedding is close
+    recalled = memory.recall("wyvern", uid="alice", k=1, budget=1)
+    assert [entry["prompt"] for entry in recalled] == ["a red dragon"]
+    assert memory.recall("stone", uid="alice", k=1, budget=1)[0]["response"] == "made a stone castle"
+
+
+def test_recall_is_restricted_to_the_user(memory):
+    remember(memory, ("a red dragon", "alice"), ("a green dragon", "bob"))
+
+    recalled = memory.recall("dragon", uid="bob", k=5, budget=1)
+    assert [entry["prompt"] for entry in recalled] == ["a green dragon"]
+
+
+def test_the_callers_embedder_is_used(memory):
+    calls = []
+
+    def own(text, deadline=None):
+        calls.append((text, deadline))
+        return embed(text)
+
+    remember(memory, ("a red dragon", "alice"))
+    memory.recall("wyvern", uid="alice", budget=1, embed=own)
+
+    assert [text for text, _ in calls] == ["wyvern"]
+    # The query embedding is bounded by the recall budget
+    assert 0 < calls[0][1].remaining() <= 1
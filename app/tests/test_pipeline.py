@@ -0,0 +1,140 @@
+import threading
+import time
+from typing import Any, Dict, List
+
+import pytest
+
+from core.pipeline import EXPANSION_TEMPLATE, Pipeline
+
+
+class FakeLLM:
+    def __init__(self):
+        self.prompts: List[str] = []
+
+    def generate(self, prompt: str, deadline=None, **options) -> Dict[str, Any]:
+        self.prompts.append(prompt)
+        return {"response": f"answer to {prompt[-12:]}", "model": "llama3", "generation_time": 0.01}
+
+
+class FakeStub:
+    def __init__(self):
+        self.calls: List[tuple] = []
+
+    def schema(self, app_id: str, kind: str) -> Dict:
+        return {"properties": {"prompt" if app_id == "text-to-image" else "image": {}}}
+
+    async def call_async(self, app_id: str, data: Dict, uid: str, deadline=None, hedging=False) -> Dict:
+        self.calls.append((app_id, data))
+        return {"result": f"{app_id}-output"}
+
+
+# --------------------------------------------------------------------------
+def test_prompt_is_answered_without_a_text_to_image_app():
+    llm = FakeLLM()
+    result = Pipeline(llm, FakeStub(), []).run("What is the capital of France?")
+
+    assert llm.prompts == ["What is the capital of France?"]
+    assert result["llm"]["response"].startswith("answer to")
+    assert result["expanded_prompt"] is None
+    assert result["image"] is None and result["model_3d"] is None
+    assert set(result["timings"]) == {"generation"}
+
+
+def test_answer_keeps_memories_and_history():
+    llm = FakeLLM()
+    memories = [{"prompt": "a red dragon", "response": "a dragon of red scales"}]
+    Pipeline(llm, FakeStub(), None).run("make it blue", memories=memories, history="Conversation so far:\n\n")
+
+    assert "a red dragon" in llm.prompts[0]
+    assert "Conversation so far" in llm.prompts[0]
+    assert llm.prompts[0].endswith("make it blue")
+    assert "Rewrite the following idea" not in llm.prompts[0]
+
+
+def test_stages_are_chained_with_the_apps():
+    llm, stub = FakeLLM(), FakeStub()
+    result = Pipeline(llm, stub, ["text-to-image", "image-to-3d"]).run("a dragon")
+
+    assert llm.prompts == [EXPANSION_TEMPLATE.format(memories="", history="", prompt="a dragon")]
+    assert result["expanded_prompt"] == result["llm"]["response"]
+    assert stub.calls == [
+        ("text-to-image", {"prompt": result["expanded_prompt"]}),
+        ("image-to-3d", {"image": "text-to-image-output"}),
+    ]
+    assert result["image"] == "text-to-image-output"
+    assert result["model_3d"] == "image-to-3d-output"
+    assert result["errors"] == {}
+
+
+def test_failed_stage_skips_the_next_one():
+    class FailingStub(FakeStub):
+        async def call_async(self, app_id, data, uid, deadline=None, hedging=False):
+            raise RuntimeError("app down")
+
+    result = Pipeline(FakeLLM(), FailingStub(), ["text-to-image", "image-to-3d"]).run("a dragon")
+
+    assert result["errors"] == {"text_to_image": "app down"}
+    assert result["image"] is None and result["model_3d"] is None
+    assert result["llm"] is not None
+
+
+# --------------------------------------------------------------------------
+def test_batch_items_keep_their_order_and_options():
+    class RecordingLLM(FakeLLM):
+        def generate(self, prompt, deadline=None, **options):
+            self.prompts.append((prompt, options.get("model")))
+            return super().generate(prompt)
+
+    llm, finished = RecordingLLM(), []
+    items = [{"prompt": "first idea"}, {"prompt": "second idea", "model": "mistral"}]
+    results = Pipeline(llm, FakeStub(), None).run_batch(items, on_result=lambda index, result: finished.append(index))
+
+    assert [result["llm"]["response"] for result in results] == ["answer to first idea", "answer to second idea"]
+    assert ("second idea", "mistral") in llm.prompts
+    assert sorted(finished) == [0, 1]
+
+
+def test_batch_parallelism_is_bounded():
+    class SlowLLM(FakeLLM):
+        def __init__(self):
+            super().__init__()
+            self.lock, self.running, self.peak = threading.Lock(), 0, 0
+
+        def generate(self, prompt, deadline=None, **options):
+            with self.lock:
+                self.running += 1
+                self.peak = max(self.peak, self.running)
+            time.sleep(0.02)
+            with self.lock:
+                self.running -= 1
+            return super().generate(prompt)
+
+    llm = SlowLLM()
+    results = Pipeline(llm, FakeStub(), None).run_batch([{"prompt": f"idea {i}"} for i in range(8)], parallelism=2)
+
+    assert len(results) == 8
+    assert llm.peak == 2
+
+
+def test_failed_batch_item_does_not_fail_the_others():
+    class FlakyLLM(FakeLLM):
+        def generate(self, prompt, deadline=None, **options):
+            if "bad" in prompt:
+                raise RuntimeError("backend down")
+            return super().generate(prompt)
+
+    results = Pipeline(FlakyLLM(), FakeStub(), None).run_batch([{"prompt": "bad idea"}, {"prompt": "good idea"}])
+
+    assert results[0]["llm"] is None and results[0]["errors"]
+    assert results[1]["llm"]["response"] == "answer to good idea"
+
+
+def test_requests_need_a_prompt_or_a_batch():
+    from marshmallow import ValidationError
+    from ontology_dc8f06af066e4a7880a5938933236037.input import InputClassSchema
+
+    request = InputClassSchema().load({"batch": [{"prompt": "one", "temperature": 0}, {"prompt": "two"}]})
+    assert [item.prompt for item in request.batch] == ["one", "two"]
+    assert request.batch[0].temperature == 0
+    with pytest.raises(ValidationError):
+        InputClassSchema().load({"batch": []})
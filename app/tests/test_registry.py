@@ -0,0 +1,71 @@
+import pytest
+
+from core import registry as registry_module
+from core.registry import ClientRegistry
+from core.response_cache import ResponseCache
+from ontology_dc8f06af066e4a7880a5938933236037.config import ConfigClass
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    caches = []
+
+    def cache(ttl, size):
+        caches.append((ttl, size))
+        return ResponseCache(str(tmp_path / f"responses-{len(caches)}.db"), ttl=ttl, size=size)
+
+    monkeypatch.setattr(registry_module, "ResponseCache", cache)
+    return ClientRegistry()
+
+
+def config(**fields) -> ConfigClass:
+    return ConfigClass(memory=False, batch_window_ms=0, **fields)
+
+
+# --------------------------------------------------------------------------
+def test_users_of_a_host_share_its_clients(registry):
+    registry.configure({
+        "alice": config(app_ids=["b", "a"], default_model="llama3"),
+        "bob": config(app_ids=["a", "b"], default_model="mistral"),
+    })
+    alice, bob = registry.get("alice"), registry.get("bob")
+
+    assert alice.llm is not bob.llm
+    assert alice.llm.default_model == "llama3" and bob.llm.default_model == "mistral"
+    assert alice.stub is bob.stub
+    assert len(registry._sessions) == len(registry._routers) == len(registry._caches) == 1
+
+
+def test_reconfiguration_drops_unused_clients(registry):
+    registry.configure({"alice": config(llm_endpoint="http://one:11434/api/generate", response_cache_ttl=60)})
+    router, cache = next(iter(registry._routers.values())), next(iter(registry._caches.values()))
+
+    registry.configure({"alice": config(llm_endpoint="http://two:11434/api/generate", response_cache_ttl=120)})
+
+    assert router._closed.is_set()
+    assert router not in registry._routers.values()
+    assert cache not in registry._caches.values()
+    assert list(registry._caches) == [(120, 1024)]
+
+
+def test_unknown_users_get_the_default_configuration(registry):
+    registry.configure({"alice": config()})
+    clients = registry.get("carol", default=config(default_model="mistral"))
+
+    assert clients.llm.default_model == "mistral"
+    assert set(registry.configurations()) == {"alice", "carol"}
+
+
+def test_each_user_embeds_with_its_own_model(registry, monkeypatch):
+    memory = pytest.importorskip("core.memory")
+    monkeypatch.setattr(memory, "MemoryStore", lambda: object())
+    registry.configure({
+        "alice": ConfigClass(batch_window_ms=0, embedding_model="nomic-embed-text"),
+        "bob": ConfigClass(batch_window_ms=0, embedding_model="mxbai-embed-large"),
+    })
+    alice, bob = registry.get("alice"), registry.get("bob")
+
+    assert alice.memory is bob.memory
+    assert alice.embed.keywords == {"model": "nomic-embed-text"}
+    assert bob.embed.keywords == {"model": "mxbai-embed-large"}
+    assert alice.embed.func.__self__ is alice.llm
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from core import remote as remote_module
+from core.deadline import DeadlineExceeded
+from core.remote import Remote
+
+
+class FakeResult:
+    def __init__(self, rid: str):
+        self.rid, self.state, self.output, self.cancelled = rid, "running", None, False
+
+    def request_id(self):
+        return self.rid
+
+    def request_qid(self):
+        return f"q-{self.rid}"
+
+    def status(self):
+        return self.state
+
+    def data(self):
+        return self.output
+
+    def error(self):
+        return None
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class FakeProxy:
+    def __init__(self):
+        self.requests, self.deleted = [], []
+
+    def request(self, inputs, uid):
+        self.requests.append(inputs)
+        return FakeResult(f"r{len(self.requests)}")
+
+    def delete(self, qid):
+        self.deleted.append(qid)
+
+
+@pytest.fixture
+def remote():
+    remote = Remote("http://proxy", timeout=5)
+    remote.client = FakeProxy()
+    return remote
+
+
+def respond(remote: Remote, result: FakeResult, delay: float = 0.05):
+    def callback():
+        time.sleep(delay)
+        result.state, result.output = "completed", {"result": "ok"}
+        remote._on_response({"ray": {"rid": result.rid}, "output": result.output})
+    threading.Thread(target=callback, daemon=True).start()
+
+
+# --------------------------------------------------------------------------
+def test_response_event_wakes_the_waiter(remote, monkeypatch):
+    # Without the event the waiter would only notice after the recheck interval
+    monkeypatch.setattr(remote_module, "RECHECK_INTERVAL", 10)
+    result = remote.execute({"prompt": "a dragon"}, "u1")
+    respond(remote, result)
+
+    start = time.monotonic()
+    assert remote.get_response(result) == {"result": "ok"}
+    assert time.monotonic() - start < 2
+    assert remote._pending == {}
+
+
+def test_async_waiters_hold_no_thread(remote, monkeypatch):
+    monkeypatch.setattr(remote_module, "RECHECK_INTERVAL", 10)
+
+    async def run():
+        results = [remote.execute({"prompt": str(index)}, "u1") for index in range(20)]
+        threads = threading.active_count()
+        waiters = [asyncio.ensure_future(remote.get_response_async(result)) for result in results]
+        await asyncio.sleep(0.01)
+        assert threading.active_count() == threads
+        for result in results:
+            respond(remote, result, delay=0)
+        return await asyncio.wait_for(asyncio.gather(*waiters), 2)
+
+    assert asyncio.run(run()) == [{"result": "ok"}] * 20
+
+
+def test_timeout_cancels_the_execution(remote):
+    result = remote.execute({"prompt": "a dragon"}, "u1")
+
+    with pytest.raises(DeadlineExceeded):
+        remote.get_response(result, timeout=0.05)
+    assert result.cancelled
+    assert remote.client.deleted == [f"q-{result.rid}"]
+    assert remote._pending == {}
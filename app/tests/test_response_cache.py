@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+from core.deadline import DeadlineExceeded
+from core.response_cache import ResponseCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "responses.db"), ttl=60, size=4)
+
+
+def slow(result, started: threading.Event, release: threading.Event, calls: list):
+    def generate():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return result
+    return generate
+
+
+# --------------------------------------------------------------------------
+def test_identical_requests_are_coalesced(cache):
+    key = ResponseCache.key("llama3", "a   dragon", 0, 64)
+    started, release, calls = threading.Event(), threading.Event(), []
+    generate = slow({"response": "ok", "generation_time": 1.0}, started, release, calls)
+    results = []
+
+    owner = threading.Thread(target=lambda: results.append(cache.get_or_generate(key, generate)))
+    owner.start()
+    assert started.wait(5)
+    waiters = [threading.Thread(target=lambda: results.append(cache.get_or_generate(key, generate))) for _ in range(3)]
+    for waiter in waiters:
+        waiter.start()
+    while cache.stats()["coalesced"] < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in [owner] + waiters:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert [result["response"] for result in results] == ["ok"] * 4
+    assert cache.stats()["misses"] == 1
+    # Later requests, with the prompt spaced differently, are served from the cache
+    assert cache.get_or_generate(ResponseCache.key("llama3", "a dragon", 0, 64), generate)["cached"]
+    assert len(calls) == 1
+
+
+def test_failed_generation_is_not_cached(cache):
+    key = ResponseCache.key("llama3", "prompt", 0, 64)
+    assert cache.get_or_generate(key, lambda: None) is None
+    assert cache.get_or_generate(key, lambda: {"response": "ok"})["response"] == "ok"
+
+
+def test_generation_error_reaches_every_waiter(cache):
+    key = ResponseCache.key("llama3", "prompt", 0, 64)
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def generate():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("backend down")
+
+    def call():
+        try:
+            cache.get_or_generate(key, generate)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    owner = threading.Thread(target=call)
+    owner.start()
+    assert started.wait(5)
+    waiter = threading.Thread(target=call)
+    waiter.start()
+    while cache.stats()["coalesced"] < 1:
+        time.sleep(0.01)
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+
+    assert errors == ["backend down", "backend down"]
+    # Nothing is left in flight, so the next request generates again
+    assert cache.get_or_generate(key, lambda: {"response": "ok"})["response"] == "ok"
+
+
+def test_coalesced_wait_is_bounded(cache):
+    key = ResponseCache.key("llama3", "prompt", 0, 64)
+    started, release, calls = threading.Event(), threading.Event(), []
+    generate = slow({"response": "ok"}, started, release, calls)
+    owner = threading.Thread(target=cache.get_or_generate, args=(key, generate))
+    owner.start()
+    assert started.wait(5)
+
+    with pytest.raises(DeadlineExceeded):
+        cache.get_or_generate(key, lambda: {"response": "other"}, timeout=0.05)
+    release.set()
+    owner.join(5)
+
+
+# --------------------------------------------------------------------------
+def test_entries_persist_and_expire(tmp_path):
+    path = str(tmp_path / "responses.db")
+    key = ResponseCache.key("llama3", "prompt", 0, 64)
+    ResponseCache(path, ttl=60).put(key, {"response": "ok", "context": [1, 2, 3]})
+
+    restored = ResponseCache(path, ttl=60).get(key)
+    assert restored["response"] == "ok"
+    assert "context" not in restored
+    assert ResponseCache(path, ttl=-1).get(key) is None
@@ -0,0 +1,72 @@
+import pytest
+import requests
+
+from core import router as router_module
+from core.deadline import DeadlineExceeded
+from core.router import Backend, EndpointRouter
+from test_llm import FakeResponse, FakeSession, client
+
+
+def http_error(status: int) -> requests.HTTPError:
+    error = requests.HTTPError(f"{status} error")
+    error.response = FakeResponse(status=status)
+    return error
+
+
+def fail(router: EndpointRouter, backend: Backend, error: Exception):
+    with pytest.raises(type(error)):
+        with router.track(backend):
+            raise error
+
+
+@pytest.fixture
+def pool():
+    return EndpointRouter(["http://one:11434/api/generate", {"url": "http://two:11434", "models": ["llava"]}],
+                          requests.Session(), health_interval=0)
+
+
+# --------------------------------------------------------------------------
+def test_calls_go_to_the_least_loaded_host_serving_the_model(pool):
+    one, two = pool.backends
+    one.latency, two.latency = 1.0, 1.0
+    one.in_flight = 2
+
+    assert next(pool.candidates("llava")) is two
+    assert list(pool.candidates("llama3")) == [one]
+    assert list(pool.candidates("llava", avoid=[two])) == [one, two]
+
+
+def test_only_host_failures_eject_a_host(pool, monkeypatch):
+    monkeypatch.setattr(router_module, "EJECT_AFTER", 2)
+    one, two = pool.backends
+    fail(pool, one, http_error(404))
+    fail(pool, one, DeadlineExceeded("caller out of time"))
+    assert one.failures == 0
+
+    fail(pool, one, requests.ConnectionError("refused"))
+    fail(pool, one, http_error(503))
+    assert not one.healthy
+    assert next(pool.candidates("llava")) is two
+    # An ejected host still serves models no healthy host has
+    assert list(pool.candidates("llama3")) == [one]
+
+
+def test_generation_fails_over_to_the_next_host():
+    def down(payload):
+        raise requests.ConnectionError("refused")
+
+    session = FakeSession(one=down, two=lambda payload: FakeResponse({"response": "ok", "model": "llama3"}))
+    llm = client(session, "one", "two")
+    llm.router.backends[0].latency = 0.1
+
+    assert llm.generate("hi")["response"] == "ok"
+    assert [host for host, _ in session.calls] == ["one", "two"]
+    assert llm.router.backends[0].failures == 1
+
+
+def test_request_errors_do_not_count_against_the_hosts():
+    session = FakeSession(one=lambda payload: FakeResponse(status=400), two=lambda payload: FakeResponse(status=400))
+    llm = client(session, "one", "two")
+
+    assert llm.generate("hi") is None
+    assert all(backend.failures == 0 for backend in llm.router.backends)
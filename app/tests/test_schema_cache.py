@@ -0,0 +1,39 @@
+from core.schema_cache import SchemaCache
+
+
+def fetcher(manifest: dict, calls: list):
+    def fetch(path: str) -> dict:
+        calls.append(path)
+        return manifest if path == "manifest" else {"path": path}
+    return fetch
+
+
+# --------------------------------------------------------------------------
+def test_fresh_entries_are_served_without_fetching(tmp_path):
+    calls = []
+    SchemaCache(str(tmp_path), ttl=60).get("app", fetcher({"version": "1"}, calls))
+
+    assert SchemaCache(str(tmp_path), ttl=60).get("app", fetcher({"version": "2"}, calls))["manifest"] == {"version": "1"}
+    assert calls == ["manifest", "schema?type=input", "schema?type=output"]
+
+
+def test_unchanged_version_keeps_the_schemas(tmp_path):
+    cache, calls = SchemaCache(str(tmp_path), ttl=-1), []
+    cache.get("app", fetcher({"version": "1", "name": "a"}, calls))
+    calls.clear()
+
+    assert cache.get("app", fetcher({"version": "1", "name": "b"}, calls))["manifest"]["name"] == "b"
+    assert calls == ["manifest"]
+    cache.get("app", fetcher({"version": "2"}, calls))
+    assert calls == ["manifest", "manifest", "schema?type=input", "schema?type=output"]
+
+
+def test_manifest_without_version_is_compared_whole(tmp_path):
+    cache, calls = SchemaCache(str(tmp_path), ttl=-1), []
+    cache.get("app", fetcher({"name": "a"}, calls))
+    calls.clear()
+
+    cache.get("app", fetcher({"name": "a"}, calls))
+    assert calls == ["manifest"]
+    cache.get("app", fetcher({"name": "b"}, calls))
+    assert calls == ["manifest", "manifest", "schema?type=input", "schema?type=output"]
@@ -0,0 +1,50 @@
+import time
+
+from core.session import SessionMemory
+
+
+def answer(response: str, context=None, model: str = "llama3", tokens: int = 10) -> dict:
+    return {"response": response, "model": model, "context": context, "prompt_tokens": tokens, "tokens_used": tokens}
+
+
+# --------------------------------------------------------------------------
+def test_context_is_reused_for_the_same_model():
+    sessions = SessionMemory()
+    assert sessions.begin("s1", "llama3") == (None, "")
+
+    sessions.record("s1", "a red dragon", answer("a dragon of red scales", context=[1, 2, 3]), budget=1000)
+    assert sessions.begin("s1", "llama3") == ([1, 2, 3], "")
+    assert sessions.begin("s2", "llama3") == (None, "")
+    assert sessions.stats()["reused"] == 1
+
+
+def test_model_switch_sends_the_transcript_instead():
+    sessions = SessionMemory()
+    sessions.record("s1", "a red dragon", answer("a dragon of red scales", context=[1, 2, 3]), budget=1000)
+
+    context, history = sessions.begin("s1", "mistral")
+    assert context is None
+    assert "- a red dragon: a dragon of red scales" in history
+
+
+def test_sessions_past_the_budget_are_compacted():
+    sessions = SessionMemory()
+    for index in range(4):
+        sessions.record("s1", f"idea {index}", answer(f"answer {index}", context=[index] * 30 * (index + 1)), budget=60)
+
+    context, history = sessions.begin("s1", "llama3")
+    assert context is None
+    assert "(earlier) idea 0" in history
+    assert "- idea 3: answer 3" in history
+    assert sessions.stats()["compacted"] >= 1
+
+
+def test_sessions_are_bounded():
+    sessions = SessionMemory(max_sessions=2, idle=0.05)
+    for sid in ("s1", "s2", "s3"):
+        sessions.record(sid, "idea", answer("answer", context=[1]), budget=1000)
+    assert sessions.begin("s1", "llama3") == (None, "")
+
+    time.sleep(0.06)
+    assert sessions.begin("s3", "llama3") == (None, "")
+    assert sessions.stats()["sessions"] == 0
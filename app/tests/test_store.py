@@ -0,0 +1,147 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from core import store
+from core.store import LogStore, _Backend
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(code: str, path: str) -> None:
+    """Runs `code` in a fresh interpreter, so nothing survives but what reached the disk."""
+    subprocess.run([sys.executable, "-c", textwrap.dedent(code), path], cwd=APP_DIR, check=True, timeout=60)
+
+
+@pytest.fixture
+def path(tmp_path):
+    yield str(tmp_path)
+    _Backend._instances.pop(str(tmp_path), None)
+
+
+# --------------------------------------------------------------------------
+def test_group_commit_applies_queued_writes_in_one_transaction(path, monkeypatch):
+    # Keep the committer thread from racing the explicit commit below
+    monkeypatch.setattr(store, "COMMIT_INTERVAL", 3600)
+    backend = _Backend.open(path, "batch")
+    values = LogStore(path, durability="batch")
+    for i in range(100):
+        values.set("ray", f"k{i}", {"i": i})
+
+    assert len(backend._pending) == 200
+    values.dump()
+    assert backend._pending == []
+    assert backend._commits == 1
+    assert backend.load("ray")["k99"] == {"i": 99}
+
+
+def test_full_durability_commits_every_write(path):
+    backend = _Backend.open(path, "full")
+    values = LogStore(path, durability="full")
+    values.set("ray", "a", 1)
+    values.set("ray", "b", 2)
+
+    assert backend._pending == []
+    with sqlite3.connect(os.path.join(path, "store.db")) as db:
+        assert db.execute("SELECT COUNT(*) FROM kv WHERE name = 'ray'").fetchone()[0] == 2
+
+
+def test_rem_and_drop(path):
+    values = LogStore(path, durability="full")
+    values.set("ray", "a", 1)
+    values.set("ray", "b", 2)
+    values.rem("ray", "a")
+    assert values.all("ray") == {"b": 2}
+
+    values.drop("other")
+    values.set("other", "c", 3)
+    values.drop("other")
+    assert _Backend.open(path, "full").load("other") is None
+
+
+def test_flush_mirrors_public_stores_only(path):
+    values = LogStore(path, durability="batch")
+    values.set("in", "data", "x")
+    values.set("tasks", "q1", {"status": "queued"})
+    values.flush("in")
+    values.flush("tasks")
+
+    with open(os.path.join(path, "in.json")) as f:
+        assert json.load(f) == {"data": "x"}
+    assert not os.path.exists(os.path.join(path, "tasks.json"))
+
+
+# --------------------------------------------------------------------------
+def test_flushed_writes_survive_a_crash(path):
+    run("""
+        import os, sys
+        from core.store import LogStore
+        values = LogStore(sys.argv[1], durability="batch")
+        values.set("ray", "done", {"status": "COMPLETED"})
+        values.flush("ray")
+        values.set("ray", "later", {"status": "RUNNING"})
+        os._exit(0)
+    """, path)
+
+    # The unflushed write may or may not have made it; the flushed one always has
+    recovered = LogStore(path, durability="batch").all("ray")
+    assert recovered["done"] == {"status": "COMPLETED"}
+    assert set(recovered) <= {"done", "later"}
+
+
+def test_group_commit_persists_without_flush(path):
+    run("""
+        import os, sys, time
+        from core import store
+        values = store.LogStore(sys.argv[1], durability="batch")
+        values.set("ray", "a", 1)
+        time.sleep(store.COMMIT_INTERVAL * 10)
+        os._exit(0)
+    """, path)
+
+    assert LogStore(path, durability="batch").all("ray") == {"a": 1}
+
+
+def test_legacy_json_store_is_imported(path):
+    with open(os.path.join(path, "state.json"), "w") as f:
+        json.dump({"QUEUED": ["q1"]}, f)
+
+    assert LogStore(path, durability="full").get("state", "QUEUED") == ["q1"]
+    # Imported into the database, so the JSON file is no longer needed
+    os.remove(os.path.join(path, "state.json"))
+    _Backend._instances.pop(path)
+    assert LogStore(path, durability="full").get("state", "QUEUED") == ["q1"]
+
+
+# --------------------------------------------------------------------------
+def test_stores_of_a_directory_share_their_values(path):
+    engine_store = LogStore(path, durability="batch")
+    task_store = LogStore(path, durability="batch")
+    assert task_store.all("ray") == {}
+
+    engine_store.set("ray", "a", 1)
+    assert task_store.get("ray", "a") == 1
+    task_store.rem("ray", "a")
+    assert engine_store.all("ray") == {}
+
+
+def test_all_returns_a_copy(path):
+    values = LogStore(path, durability="batch")
+    values.set("ray", "a", 1)
+    snapshot = values.all("ray")
+    snapshot["b"] = 2
+    values.set("ray", "c", 3)
+
+    assert values.all("ray") == {"a": 1, "c": 3}
+    assert snapshot == {"a": 1, "b": 2}
+
+
+def test_batch_durability_syncs_the_log_on_commit(path):
+    backend = _Backend.open(path, "batch")
+    # 2 is FULL: in WAL mode, NORMAL only syncs at checkpoints
+    assert backend._db.execute("PRAGMA synchronous").fetchone()[0] == 2
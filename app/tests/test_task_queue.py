@@ -0,0 +1,112 @@
+import queue
+import time
+
+import pytest
+
+from core import task_queue
+from core.store import LogStore, _Backend
+from core.task_queue import STATE, TASKS, IndexedTask, TaskStatus
+
+
+@pytest.fixture
+def store(tmp_path):
+    yield LogStore(str(tmp_path), durability="full")
+    _Backend._instances.pop(str(tmp_path), None)
+
+
+def drain(tasks: IndexedTask):
+    order = []
+    while True:
+        try:
+            order.append(tasks.next())
+        except queue.Empty:
+            return order
+
+
+# --------------------------------------------------------------------------
+def test_legacy_state_is_migrated(store):
+    store.set(STATE, 'REQUESTED', ['a', 'b', 'c'])
+    store.set(STATE, 'QUEUED', ['b', 'c'])
+    store.set(STATE, 'COMPLETED', ['a'])
+
+    tasks = IndexedTask(store)
+
+    assert tasks.queued() == ['b', 'c']
+    assert tasks.status('a') == TaskStatus.DISPATCHED
+    assert all(store.get(STATE, key) is None for key in task_queue.LEGACY_KEYS)
+    assert store.get(TASKS, 'b')['status'] == TaskStatus.QUEUED
+
+
+def test_queued_tasks_are_recovered_in_order(store):
+    tasks = IndexedTask(store)
+    for tid in ('a', 'b', 'c'):
+        tasks.add(tid)
+    assert tasks.next() == 'a'
+
+    recovered = IndexedTask(store)
+    assert recovered.queued() == ['b', 'c']
+    assert recovered.status('a') == TaskStatus.DISPATCHED
+
+
+def test_deferred_recovery(store, monkeypatch):
+    IndexedTask(store).add('old')
+    monkeypatch.setattr(IndexedTask, 'defer_recovery', True)
+
+    tasks = IndexedTask(store)
+    tasks.add('new')
+    assert tasks.queued() == ['new']
+    assert tasks.recover() == 1
+    # Tasks added before recovery keep their place
+    assert tasks.queued() == ['new', 'old']
+    assert tasks.recover() == 0
+
+
+# --------------------------------------------------------------------------
+def test_retention_count_forgets_the_oldest_dispatched(store, monkeypatch):
+    monkeypatch.setattr(task_queue, 'RETENTION_COUNT', 2)
+    tasks = IndexedTask(store)
+    evicted = []
+    tasks.on_evict = evicted.append
+    for tid in ('a', 'b', 'c', 'd'):
+        tasks.add(tid)
+
+    assert drain(tasks) == ['a', 'b', 'c', 'd']
+    assert evicted == ['a', 'b']
+    assert tasks.tracked() == ['c', 'd']
+    assert store.get(TASKS, 'a') is None
+    assert tasks.status('a') is None
+
+
+def test_retention_seconds_forgets_expired_tasks(store, monkeypatch):
+    tasks = IndexedTask(store)
+    tasks.add('a')
+    tasks.next()
+    monkeypatch.setattr(task_queue, 'RETENTION_SECONDS', 0.01)
+    time.sleep(0.02)
+    tasks.add('b')
+    tasks.next()
+
+    assert tasks.tracked() == ['b']
+
+
+def test_rem_forgets_a_queued_task(store):
+    tasks = IndexedTask(store)
+    tasks.add('a')
+    tasks.add('b')
+    tasks.rem('a')
+
+    assert drain(tasks) == ['b']
+    assert store.get(TASKS, 'a') is None
+
+
+# --------------------------------------------------------------------------
+def test_lanes_are_served_round_robin(store):
+    tasks = IndexedTask(store)
+    owners = {'a1': 'alice', 'a2': 'alice', 'a3': 'alice', 'b1': 'bob', 'b2': 'bob'}
+    tasks.uid_of = owners.get
+    for tid in owners:
+        tasks.add(tid)
+
+    assert drain(tasks) == ['a1', 'b1', 'a2', 'b2', 'a3']
+    assert tasks.queue_wait('a1') >= 0
+    assert tasks.queue_wait('a1') is None
@@ -0,0 +1,203 @@
+import threading
+import time
+
+import pytest
+
+from core import work_queue
+from core.work_queue import JobStatus, WorkQueue, Worker, install_routes
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    return WorkQueue(str(tmp_path / "work.db"))
+
+
+def status(jobs: WorkQueue, qid: str) -> str:
+    return jobs._db().execute("SELECT status FROM jobs WHERE qid = ?", (qid,)).fetchone()[0]
+
+
+# --------------------------------------------------------------------------
+def test_claims_lease_the_oldest_job(jobs):
+    jobs.submit('a', 'u1', '{}', None)
+    jobs.submit('b', 'u1', '{}', None)
+
+    assert jobs.claim('w1')['qid'] == 'a'
+    assert jobs.claim('w2')['qid'] == 'b'
+    assert jobs.claim('w3') is None
+    assert jobs.stats() == {JobStatus.LEASED: 2}
+
+
+def test_expired_lease_is_claimed_again(jobs, monkeypatch):
+    monkeypatch.setattr(work_queue, 'LEASE_SECONDS', 0.05)
+    jobs.submit('a', 'u1', '{}', None)
+    jobs.claim('w1')
+    time.sleep(0.1)
+
+    job = jobs.claim('w2')
+    assert job['qid'] == 'a'
+    assert job['attempts'] == 2
+    # The worker that lost the lease can no longer publish or complete
+    assert not jobs.update('a', 'w1', {'status': 'RUNNING'})
+    assert not jobs.complete('a', 'w1', {}, {'message': 'stale'})
+    assert jobs.complete('a', 'w2', {}, {'message': 'fresh'})
+    assert status(jobs, 'a') == JobStatus.DONE
+
+
+def test_heartbeat_keeps_the_lease(jobs, monkeypatch):
+    monkeypatch.setattr(work_queue, 'LEASE_SECONDS', 0.2)
+    jobs.submit('a', 'u1', '{}', None)
+    jobs.claim('w1')
+    for _ in range(3):
+        time.sleep(0.1)
+        assert jobs.heartbeat('w1') == 1
+
+    assert jobs.claim('w2') is None
+
+
+def test_job_fails_after_max_attempts(jobs, monkeypatch):
+    monkeypatch.setattr(work_queue, 'LEASE_SECONDS', 0.01)
+    monkeypatch.setattr(work_queue, 'MAX_ATTEMPTS', 2)
+    jobs.submit('a', 'u1', '{}', None)
+    for _ in range(2):
+        assert jobs.claim('w1')['qid'] == 'a'
+        time.sleep(0.02)
+
+    assert jobs.claim('w1') is None
+    assert status(jobs, 'a') == JobStatus.FAILED
+
+
+def test_cancel_and_failed_completion(jobs):
+    jobs.submit('a', 'u1', '{}', None)
+    jobs.submit('b', 'u1', '{}', None)
+    jobs.cancel('a')
+    jobs.claim('w1')
+    jobs.complete('b', 'w1', {}, error='boom')
+
+    assert status(jobs, 'a') == JobStatus.CANCELED
+    assert status(jobs, 'b') == JobStatus.FAILED
+
+
+# --------------------------------------------------------------------------
+def test_changes_follow_the_sequence(jobs):
+    jobs.submit('a', 'u1', '{}', None)
+    cursor, changed = jobs.changes(0)
+    assert [job['qid'] for job in changed] == ['a']
+
+    jobs.claim('w1')
+    jobs.complete('a', 'w1', {'status': 'COMPLETED'}, {'message': 'done'})
+    cursor, changed = jobs.changes(cursor)
+    assert [(job['qid'], job['status']) for job in changed] == [('a', JobStatus.DONE)]
+    assert changed[0]['output'] == {'message': 'done'}
+    assert jobs.changes(cursor) == (cursor, [])
+
+
+def test_sequence_does_not_go_back_after_prune(jobs):
+    jobs.submit('a', 'u1', '{}', None)
+    jobs.claim('w1')
+    jobs.complete('a', 'w1', {})
+    cursor, _ = jobs.changes(0)
+    assert jobs.prune(retention=-1) == 1
+
+    jobs.submit('b', 'u1', '{}', None)
+    _, changed = jobs.changes(cursor)
+    assert [job['qid'] for job in changed] == ['b']
+
+
+def test_new_followers_skip_the_history(jobs):
+    assert jobs.cursor() == 0
+    jobs.submit('a', 'u1', '{}', None)
+    jobs.claim('w1')
+    cursor = jobs.cursor()
+
+    jobs.submit('b', 'u1', '{}', None)
+    assert [job['qid'] for job in jobs.changes(cursor)[1]] == ['b']
+    assert [job['status'] for job in jobs.jobs(['a', 'b', 'c'])] == [JobStatus.LEASED, JobStatus.QUEUED]
+
+
+class FakeEngine:
+    def __init__(self):
+        self.rays, self.store = {}, {}
+
+    def ray(self, qid):
+        from openfabric_pysdk.context import Ray
+        return self.rays.setdefault(qid, Ray(qid=qid))
+
+    def write(self, qid, key, value, serializer=None):
+        self.store[(qid, key)] = serializer(value) if serializer else value
+
+    def flush(self, qid):
+        pass
+
+
+def test_only_watched_rays_are_kept_in_memory(jobs):
+    pytest.importorskip("openfabric_pysdk.context")
+    for qid in ('mine', 'theirs', 'pending'):
+        jobs.submit(qid, 'u1', '{}', {'qid': qid, 'status': 'QUEUED'})
+        jobs.claim('w1')
+    jobs.complete('mine', 'w1', {'qid': 'mine', 'status': 'COMPLETED'}, {'message': 'one'})
+    jobs.complete('theirs', 'w1', {'qid': 'theirs', 'status': 'COMPLETED'}, {'message': 'two'})
+    engine = FakeEngine()
+
+    work_queue._apply_all(engine, jobs.changes(0)[1], watched={'mine'})
+
+    assert list(engine.rays) == ['mine']
+    assert engine.rays['mine'].status.name == 'COMPLETED'
+    # Results of other front-ends' rays are stored all the same, so any front-end serves them
+    assert engine.store[('theirs', 'out')] == {'message': 'two'}
+    assert engine.store[('theirs', 'ray')]['status'] == 'COMPLETED'
+    assert ('pending', 'ray') not in engine.store
+
+
+def test_worker_limit_is_exact_across_threads():
+    claims = []
+
+    class Queue:
+        def claim(self, owner):
+            claims.append(owner)
+            return {'qid': str(len(claims))}
+
+        def heartbeat(self, owner):
+            return 0
+
+    class CountingWorker(Worker):
+        def _run(self, job):
+            time.sleep(0.001)
+
+    worker = CountingWorker(Queue(), execute=lambda model: None, threads=8)
+    runner = threading.Thread(target=worker.run, args=(25,))
+    runner.start()
+    runner.join(10)
+
+    assert worker.executed == 25
+    assert len(claims) == 25
+
+
+def test_configs_are_versioned(jobs):
+    assert jobs.configs() == (0, None)
+    jobs.publish_configs({'u1': {'default_model': 'llama3'}})
+    version, configs = jobs.configs()
+
+    assert configs == {'u1': {'default_model': 'llama3'}}
+    assert jobs.configs(version) == (version, None)
+
+
+# --------------------------------------------------------------------------
+def test_routes_require_the_secret(jobs):
+    flask = pytest.importorskip("flask")
+    app = flask.Flask(__name__)
+    install_routes(app, jobs, secret="s3cret")
+    client = app.test_client()
+    jobs.submit('a', 'u1', '{}', None)
+
+    assert client.post("/work/claim", json={"owner": "w1"}).status_code == 401
+    response = client.post("/work/claim", json={"owner": "w1"}, headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert response.get_json()["result"]["qid"] == 'a'
+
+
+def test_routes_are_not_served_without_a_secret(jobs):
+    flask = pytest.importorskip("flask")
+    app = flask.Flask(__name__)
+    install_routes(app, jobs, secret=None)
+
+    assert app.test_client().post("/work/claim", json={"owner": "w1"}).status_code == 404
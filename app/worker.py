@@ -0,0 +1,53 @@
+import argparse
+import importlib
+import logging
+import multiprocessing
+import os
+from typing import Callable
+
+from core.logs import install as install_logging
+from core.metrics import process_exited
+from core.work_queue import WORK_QUEUE_PATH, RemoteWorkQueue, Worker, WorkQueue
+
+# Threads per worker process; execute mostly waits on Ollama and the Openfabric apps
+THREADS = int(os.getenv("WORK_THREADS", 1))
+
+
+def load(name: str) -> Callable:
+    """Resolves a `module:function` reference."""
+    module, _, function = name.partition(":")
+    return getattr(importlib.import_module(module), function)
+
+
+def run(args: argparse.Namespace) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(processName)s - %(levelname)s - %(message)s")
+    install_logging()
+    queue = RemoteWorkQueue(args.url) if args.url else WorkQueue(args.queue)
+    configure = load(args.config) if args.config else None
+    Worker(queue, load(args.execute), configure, args.threads).run(args.limit)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Execute rays from the shared work queue (WORK_QUEUE=shared)")
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes to start")
+    parser.add_argument("--threads", type=int, default=THREADS, help="Jobs executed at once per process")
+    parser.add_argument("--queue", default=WORK_QUEUE_PATH, help="Queue database, for workers on the front-end host")
+    parser.add_argument("--url", help="Front-end URL (e.g. http://host:8888), for workers on other hosts; "
+                                      "they authenticate with WORK_QUEUE_SECRET")
+    parser.add_argument("--execute", default="main:execute", help="Execute callback as module:function")
+    parser.add_argument("--config", default="main:config", help="Config callback as module:function, '' for none")
+    parser.add_argument("--limit", type=int, help="Exit after executing this many jobs per process")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        run(args)
+    else:
+        processes = [
+            multiprocessing.Process(target=run, args=(args,), name=f"worker-{index}")
+            for index in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            process_exited(process.pid)